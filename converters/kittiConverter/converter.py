@@ -255,7 +255,7 @@ class KITTI_Tracking_reader():
         #########################################
         # LABELS
         #########################################
-        cam_right = scene.get_camera("CAM_RIGHT")
+        semantic_classes = set()
         for row in object_reader:
             frameNum = int(row[0])
             #trackID = int(row[1]) + 1  # VCD can't handle negative ids
@@ -264,6 +264,7 @@ class KITTI_Tracking_reader():
             #    continue  # Let's ignore DontCare labels
 
             semantic_class = row[2]
+            semantic_classes.add(semantic_class)
             truncated = utils.float_2dec(float(row[3]))
             occluded = int(row[4])
 
@@ -326,24 +327,13 @@ class KITTI_Tracking_reader():
             vcd.add_object_data(trackID, types.num(name="occluded", val=occluded), frameNum)
             vcd.add_object_data(trackID, types.num(name="alpha", val=alpha), frameNum)
 
-            
-            # Adding CAM_RIGHT data: KITTI GT does not include these boxes explictly, but we can obtain them projecting from the 3D box
-            # NOTE 1: cuboids are expressed with respect to the CAM_LEFT coordinate system
-            # NOTE 2: (see above) CAM_LEFT and CAM_RIGHT are the same coordinate systems, they just differ in the intrinsics, therefore, no need to convert the 3D boxes
-            # NOTE 3: Can't project DontCare objects as the 3D cuboids are absurd
-            #cuboid_vals_right = scene.transform_cuboid(cuboid_vals, "CAM_LEFT", "CAM_RIGHT", frameNum)
-            if trackID != -1:  # Don'tCare objects 
-                points3d_4x8 = utils.generate_cuboid_points_ref_4x8(cuboid_vals)                
-                points2d_4x8, idx_valid = cam_right.project_points3d(points3d_4x8)
-                points2d_4x8_valid = points2d_4x8[:, idx_valid]
-                bbox_right_vals = utils.bounding_rect(points2d_4x8_valid)
-
-                bounding_box_right = types.bbox(name=name_box + '_right',
-                                        val=bbox_right_vals,
-                                        coordinate_system='CAM_RIGHT')
-
-                vcd.add_object_data(str(trackID), bounding_box_right, frameNum)            
-            
+        # Adding CAM_RIGHT data: KITTI GT does not include these boxes explictly, but we can obtain them projecting from the 3D box
+        # NOTE 1: cuboids are expressed with respect to the CAM_LEFT coordinate system
+        # NOTE 2: (see above) CAM_LEFT and CAM_RIGHT are the same coordinate systems, they just differ in the intrinsics
+        # NOTE 3: Can't project DontCare objects as the 3D cuboids are absurd
+        # All the frames are projected at once, and boxes are clipped to the image
+        scene.add_bboxes_from_cuboids(["CAM_RIGHT"], bbox_names=["box2D_right"], data_name="box3D",
+                                      semantic_types=sorted(semantic_classes - {"DontCare"}))
 
         #########################################
         # Ego-vehicle
@@ -48,6 +48,9 @@ def convert_town_center_to_VCD():
 
     orig_file_name = "./etc/townCentreXVID_groundTruth.top"
     vcd = core.VCD()
+
+    # Gather the tracks of each person, so they are written in one call per track
+    persons = dict()
     with open(orig_file_name, newline='') as csvfile:
         my_reader = csv.reader(csvfile, delimiter=',')
         for row in my_reader:
@@ -72,22 +75,26 @@ def convert_town_center_to_VCD():
             bodyWidth = float((int(1000*bodyRight) - int(1000*bodyLeft))/1000)
             bodyHeight = float((int(1000*bodyBottom) - int(1000*bodyTop))/1000)
 
+            person = persons.setdefault(personNumber, {'first_frame': frameNumber,
+                                                       'body_frames': [], 'body': [],
+                                                       'head_frames': [], 'head': []})
+
             #Note: VCD 4.3.0 defines the bounding box using the center of the box, not the upper-left coordinate
-            body = types.bbox(name="body",
-                              val=((bodyLeft + bodyRight)/2, (bodyBottom + bodyTop)/2, bodyWidth, bodyHeight))
-            head = types.bbox("head", ((headLeft + headRight)/2, (headBottom + headTop)/2, headWidth, headHeight))
-            if not vcd.has(core.ElementType.object, personNumber):
-                vcd.add_object(name="", semantic_type="Pedestrian",
-                               uid=personNumber, frame_value=frameNumber)
-                if bodyValid:
-                        vcd.add_object_data(personNumber, body, frameNumber)
-                if headValid:
-                        vcd.add_object_data(personNumber, head, frameNumber)
-            else:
-                if bodyValid:
-                    vcd.add_object_data(personNumber, body, frameNumber)
-                if headValid:
-                    vcd.add_object_data(personNumber, head, frameNumber)
+            if bodyValid:
+                person['body_frames'].append(frameNumber)
+                person['body'].append(((bodyLeft + bodyRight)/2, (bodyBottom + bodyTop)/2, bodyWidth, bodyHeight))
+            if headValid:
+                person['head_frames'].append(frameNumber)
+                person['head'].append(((headLeft + headRight)/2, (headBottom + headTop)/2, headWidth, headHeight))
+
+    for personNumber, person in persons.items():
+        vcd.add_object(name="", semantic_type="Pedestrian", uid=personNumber, frame_value=person['first_frame'])
+        if person['body']:
+            vcd.add_object_data_series(personNumber, types.ObjectDataType.bbox, "body",
+                                       person['body_frames'], person['body'])
+        if person['head']:
+            vcd.add_object_data_series(personNumber, types.ObjectDataType.bbox, "head",
+                                       person['head_frames'], person['head'])
 
     #vcd_json_file_name = "./etc/vcd430_towncenter.json"
     vcd_json_file_name = './etc/' + vcd_version_name + '_towncenter.json'
@@ -308,6 +308,39 @@ class TestBasic(unittest.TestCase):
         self.assertTrue(check_openlabel(vcd, './etc/' + openlabel_version_name + '_' +
                                         inspect.currentframe().f_code.co_name + '.json'))
 
+    def test_compact_frames(self):
+        # Loading into a FrameStore must produce the same content as the default dict of frames
+        file_name = './etc/' + openlabel_version_name + '_kitti_tracking_0003.json'
+        vcd_dict = core.OpenLABEL(file_name)
+        vcd_compact = core.OpenLABEL(file_name, compact_frames=True)
+        self.assertIsInstance(vcd_compact.get_root()['frames'], core.FrameStore)
+        self.assertEqual(vcd_dict.stringify(validate=False), vcd_compact.stringify(validate=False))
+        self.assertEqual(vcd_dict.get_frame(10), vcd_compact.get_frame(10))
+        self.assertIsNone(vcd_compact.get_frame(100000))
+
+        # Add and remove frames in non-contiguous order
+        vcd = core.OpenLABEL(compact_frames=True)
+        uid = vcd.add_object('car1', 'car', frame_value=[(5, 10), (20, 22)])
+        vcd.add_object_data(uid, types.bbox('shape', (0, 0, 10, 10)), frame_value=2)
+        self.assertEqual(list(vcd.get_root()['frames'].keys()), [2, 5, 6, 7, 8, 9, 10, 20, 21, 22])
+        self.assertTrue(vcd.has_frame(21))
+        self.assertFalse(vcd.has_frame(15))
+
+        vcd.rm_object(uid)
+        self.assertFalse('frames' in vcd.get_root())
+        self.assertFalse(vcd.has_frame(2))
+
+    def test_intern_strings(self):
+        file_name = './etc/' + openlabel_version_name + '_kitti_tracking_0003.json'
+        vcd = core.OpenLABEL(file_name)
+        vcd_interned = core.OpenLABEL(file_name, intern_strings=True)
+        self.assertEqual(vcd.stringify(validate=False), vcd_interned.stringify(validate=False))
+
+        # Data names are shared across frames
+        name_a = vcd_interned.get_frame(0)['objects']['0']['object_data']['bbox'][0]['name']
+        name_b = vcd_interned.get_frame(1)['objects']['0']['object_data']['bbox'][0]['name']
+        self.assertIs(name_a, name_b)
+
 if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
     print("Running " + os.path.basename(__file__))
     unittest.main()
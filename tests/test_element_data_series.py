@@ -0,0 +1,161 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import os
+import unittest
+import numpy as np
+
+import vcd.core as core
+import vcd.types as types
+
+from test_config import openlabel_version_name
+
+
+class TestBasic(unittest.TestCase):
+    def test_get_element_data_series(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+
+        frames, values = vcd.get_object_data_series(0, 'box2D_left')
+        self.assertEqual(frames.tolist(), list(range(0, 76)))
+        self.assertEqual(values.shape, (76, 4))
+        for frame_num in (0, 33, 75):
+            self.assertEqual(values[frame_num].tolist(), vcd.get_object_data(0, 'box2D_left', frame_num)['val'])
+
+        frames, values = vcd.get_object_data_series('0', 'alpha')
+        self.assertEqual(values.shape, (76, 1))
+        self.assertEqual(values[0, 0], -2.16)
+
+        # Whole class
+        uids, offsets, frames, values = vcd.get_object_data_series_by_type('Car', 'box3D')
+        self.assertEqual(len(offsets), len(uids) + 1)
+        self.assertEqual(values.shape, (offsets[-1], 9))
+        i = uids.index('0')
+        self.assertEqual(frames[offsets[i]:offsets[i + 1]].tolist(), list(range(0, 76)))
+
+    def test_get_element_data_series_gaps(self):
+        vcd = core.OpenLABEL()
+        uid = vcd.add_object('car1', 'car', frame_value=(0, 10))
+        for frame_num in (2, 3, 7):
+            vcd.add_object_data(uid, types.bbox('shape', (frame_num, 0, 10, 10)), frame_value=frame_num)
+        vcd.add_object_data(uid, types.text('color', 'red'), frame_value=5)
+        vcd.add_object_data(uid, types.num('static', 1.0))
+
+        frames, values = vcd.get_object_data_series(uid, 'shape')
+        self.assertEqual(frames.tolist(), [2, 3, 7])
+        self.assertTrue(np.array_equal(values[:, 0], [2, 3, 7]))
+
+        frames, values = vcd.get_object_data_series(uid, 'static')
+        self.assertEqual(len(frames), 0)
+
+        with self.assertWarns(Warning):
+            self.assertIsNone(vcd.get_object_data_series(uid, 'color'))
+
+    def test_add_element_data_series(self):
+        frames = np.array([3, 4, 5, 9, 10, 20])
+        boxes = np.column_stack((frames * 10.0, frames + 0.5, np.full(6, 20.0), np.full(6, 40.0)))
+        occluded = np.array([0, 0, 1, 1, 0, 0])
+        visible = np.array([True, True, False, False, True, True])
+
+        # Per-frame reference
+        vcd_ref = core.OpenLABEL()
+        vcd_ref.add_coordinate_system('CAM', types.CoordinateSystemType.sensor_cs)
+        uid = vcd_ref.add_object('', 'Pedestrian', frame_value=3)
+        for i, frame_num in enumerate(frames.tolist()):
+            box = types.bbox('body', boxes[i].tolist(), coordinate_system='CAM')
+            box.add_attribute(types.num('occluded', int(occluded[i])))
+            box.add_attribute(types.boolean('visible', bool(visible[i])))
+            vcd_ref.add_object_data(uid, box, frame_num)
+
+        # Whole track in one call, with frames unsorted
+        order = np.array([5, 0, 3, 1, 4, 2])
+        vcd = core.OpenLABEL()
+        vcd.add_coordinate_system('CAM', types.CoordinateSystemType.sensor_cs)
+        uid = vcd.add_object('', 'Pedestrian', frame_value=3)
+        vcd.add_object_data_series(uid, types.ObjectDataType.bbox, 'body', frames[order], boxes[order],
+                                   coordinate_system='CAM',
+                                   attributes={'occluded': occluded[order], 'visible': visible[order]})
+
+        self.assertEqual(vcd.stringify(), vcd_ref.stringify())
+        self.assertEqual(vcd.get_object_data_frame_intervals(uid, 'body').get(), [(3, 5), (9, 10), (20, 20)])
+
+        # Round trip
+        frames_read, boxes_read = vcd.get_object_data_series(uid, 'body')
+        self.assertTrue(np.array_equal(frames_read, frames))
+        self.assertTrue(np.array_equal(boxes_read, boxes))
+
+    def test_interpolate_element_data(self):
+        vcd = core.OpenLABEL()
+        uid = vcd.add_object('car1', 'car', frame_value=(0, 10))
+        vcd.add_object_data(uid, types.bbox('box', (0, 0, 10, 10)), 0)
+        vcd.add_object_data(uid, types.bbox('box', (100, 50, 20, 10)), 10)
+        vcd.add_object_data(uid, types.cuboid('box3D', (0, 0, 0, 0, 0, 0, 1, 1, 1)), 0)
+        vcd.add_object_data(uid, types.cuboid('box3D', (10, 0, 0, 0, 0, np.pi / 2, 1, 1, 1)), 10)
+        vcd.add_object_data(uid, types.cuboid('box3D_q', (0, 0, 0, 0, 0, 0, 1, 1, 1, 1)), 0)
+        vcd.add_object_data(uid, types.cuboid('box3D_q', (0, 0, 0, 0, 0, np.sin(np.pi / 4), np.cos(np.pi / 4),
+                                                          1, 1, 1)), 10)
+        vcd.add_object_data(uid, types.text('state', 'parked'), 0)
+        vcd.add_object_data(uid, types.text('state', 'moving'), 6)
+        keyframes_only = vcd.stringify()
+
+        # Lazy, nothing written
+        frames, values = vcd.get_object_data_interpolated(uid, 'box', (0, 10))
+        self.assertEqual(values.shape, (11, 4))
+        self.assertTrue(np.allclose(values[5], (50, 25, 15, 10)))
+        self.assertEqual(vcd.stringify(), keyframes_only)
+
+        # Densify
+        for data_name in ('box', 'box3D', 'box3D_q', 'state'):
+            vcd.interpolate_object_data(uid, data_name)
+        self.assertEqual(vcd.get_object_data_frame_intervals(uid, 'box').get(), [(0, 10)])
+        self.assertTrue(np.allclose(vcd.get_object_data(uid, 'box', 5)['val'], (50, 25, 15, 10)))
+        self.assertTrue(np.allclose(vcd.get_object_data(uid, 'box3D', 5)['val'],
+                                    (5, 0, 0, 0, 0, np.pi / 4, 1, 1, 1)))
+        self.assertTrue(np.allclose(vcd.get_object_data(uid, 'box3D_q', 5)['val'],
+                                    (0, 0, 0, 0, 0, np.sin(np.pi / 8), np.cos(np.pi / 8), 1, 1, 1)))
+        self.assertEqual(vcd.get_object_data(uid, 'state', 5)['val'], 'parked')
+        self.assertEqual(vcd.get_object_data(uid, 'state', 7)['val'], 'moving')
+        frames, values = vcd.get_object_data_series(uid, 'box')
+        self.assertTrue(np.allclose(values, vcd.get_object_data_interpolated(uid, 'box', (0, 10))[1]))
+
+        # Reverse
+        for data_name in ('box', 'box3D', 'box3D_q', 'state'):
+            vcd.rm_interpolated_object_data(uid, data_name)
+        self.assertEqual(vcd.stringify(), keyframes_only)
+
+    def test_interpolate_element_data_frame_value(self):
+        vcd = core.OpenLABEL()
+        uid = vcd.add_object('car1', 'car', frame_value=(0, 4))
+        vcd.add_object_data(uid, types.bbox('box', (0, 0, 10, 10)), 0)
+        vcd.add_object_data(uid, types.bbox('box', (40, 0, 10, 10)), 4)
+        vcd.add_object_data(uid, types.num('speed', 10.0), 0)
+        vcd.add_object_data(uid, types.num('speed', 20.0), 2)
+        keyframes_only = vcd.stringify()
+
+        # Linear types are not extrapolated beyond the last keyframe, hold-last types extend the element
+        vcd.interpolate_object_data(uid, 'box', (0, 9))
+        self.assertEqual(vcd.get_object_data_frame_intervals(uid, 'box').get(), [(0, 4)])
+        self.assertEqual(vcd.get_element_frame_intervals(core.ElementType.object, uid).get(), [(0, 4)])
+        vcd.interpolate_object_data(uid, 'speed', (0, 9))
+        self.assertEqual(vcd.get_object_data(uid, 'speed', 9)['val'], 20.0)
+        self.assertEqual(vcd.get_element_frame_intervals(core.ElementType.object, uid).get(), [(0, 9)])
+        self.assertEqual(vcd.get_frame_intervals().get(), [(0, 9)])
+
+        # Reverse: frames added by the interpolation are removed
+        for data_name in ('box', 'speed'):
+            vcd.rm_interpolated_object_data(uid, data_name)
+        self.assertEqual(vcd.stringify(), keyframes_only)
+
+
+if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
+    print("Running " + os.path.basename(__file__))
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import os
+import unittest
+import numpy as np
+
+import vcd.core as core
+import vcd.types as types
+import vcd.evaluation as evaluation
+import vcd.overlap as overlap
+import vcd.scl as scl
+
+from test_config import openlabel_version_name
+
+
+def add_box(vcd, uid, frame_num, val, score=None):
+    box = types.bbox('box', val)
+    if score is not None:
+        box.add_attribute(types.num('score', score))
+    vcd.add_object_data(uid, box, frame_num)
+
+
+class TestBasic(unittest.TestCase):
+    def test_evaluate_synthetic(self):
+        vcd_gt = core.OpenLABEL()
+        car1 = vcd_gt.add_object('car1', 'Car', frame_value=(0, 9))
+        car2 = vcd_gt.add_object('car2', 'Car', frame_value=(0, 9))
+        for frame_num in range(0, 10):
+            add_box(vcd_gt, car1, frame_num, (100 + frame_num, 100, 40, 20))
+            add_box(vcd_gt, car2, frame_num, (300, 100 + frame_num, 40, 20))
+
+        # Track ids swapped from frame 5 on (2 switches), car1 missed at frame 9, one false positive per frame
+        vcd_pred = core.OpenLABEL()
+        track_a = vcd_pred.add_object('a', 'Car', frame_value=(0, 9))
+        track_b = vcd_pred.add_object('b', 'Car', frame_value=(0, 8))
+        track_c = vcd_pred.add_object('c', 'Car', frame_value=(0, 9))
+        for frame_num in range(0, 10):
+            box1 = (100 + frame_num + 2, 100, 40, 20)
+            box2 = (300, 100 + frame_num, 40, 20)
+            if frame_num >= 5:
+                box1, box2 = box2, box1
+            add_box(vcd_pred, track_a, frame_num, box1, 0.9)
+            if frame_num < 9:
+                add_box(vcd_pred, track_b, frame_num, box2, 0.8)
+            add_box(vcd_pred, track_c, frame_num, (600, 600, 10, 10), 0.3)
+
+        result = evaluation.evaluate(vcd_gt, vcd_pred, 'box', score_name='score', processes=1)
+        self.assertEqual(result.num_frames, 10)
+        self.assertEqual(result.get_classes(), ['Car'])
+        metrics = result.get_metrics('Car')
+        self.assertEqual((metrics['num_gt'], metrics['tp'], metrics['fp'], metrics['fn']), (20, 19, 10, 1))
+        self.assertEqual(metrics['id_switches'], 2)
+        self.assertAlmostEqual(metrics['mota'], 1.0 - (1 + 10 + 2) / 20)
+        self.assertAlmostEqual(metrics['recall'], 19 / 20)
+        # The false positives have the lowest score, so AP is the recall at score 0.8
+        self.assertAlmostEqual(metrics['ap'], 19 / 20)
+        self.assertLess(metrics['motp'], 1.0)
+        self.assertEqual(result.get_metrics(), metrics)
+
+        # Higher threshold: the shifted car1 boxes (IoU 38/42) are not matched
+        metrics = evaluation.evaluate(vcd_gt, vcd_pred, 'box', iou_threshold=0.95, processes=1).get_metrics()
+        self.assertEqual((metrics['tp'], metrics['fn']), (10, 10))
+
+    def test_evaluate_kitti(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        result = evaluation.evaluate(vcd, vcd, 'box2D_left', processes=1)
+        for class_name in result.get_classes():
+            metrics = result.get_metrics(class_name)
+            self.assertEqual(metrics['precision'], 1.0)
+            self.assertEqual(metrics['recall'], 1.0)
+            self.assertAlmostEqual(metrics['ap'], 1.0)
+            self.assertAlmostEqual(metrics['mota'], 1.0)
+            self.assertAlmostEqual(metrics['motp'], 1.0)
+            self.assertEqual(metrics['id_switches'], 0)
+
+        # Worker processes give the same result
+        result_pool = evaluation.evaluate(vcd, vcd, 'box2D_left', processes=2, chunksize=16)
+        self.assertEqual(result_pool.num_frames, result.num_frames)
+        self.assertEqual(result_pool.get_metrics(), result.get_metrics())
+
+    def test_evaluate_kitti_cuboids(self):
+        # KITTI cuboids are in CAM_LEFT (y pointing down, yaw in ry), compared in vehicle-iso8855 (z pointing up)
+        vcd_gt = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd_gt)
+        self.assertIsNone(evaluation.evaluate_frame(vcd_gt, vcd_gt, 0, 'box3D', 'cuboid'))  # cs is required
+
+        def evaluate_edited(edit, bev=False):
+            vcd_pred = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+            frame_start, frame_end = vcd_pred.get_frame_intervals().get()[0]
+            for frame_num in range(frame_start, frame_end + 1):
+                uids, cuboids = vcd_pred.get_object_data_at_frame(frame_num, 'box3D', 'Car')
+                for uid, cuboid in zip(uids, cuboids):
+                    val, cs = edit(frame_num, cuboid.copy())
+                    vcd_pred.add_object_data(uid, types.cuboid('box3D', val.tolist(), coordinate_system=cs),
+                                             frame_num)
+            return evaluation.evaluate(vcd_gt, vcd_pred, 'box3D', classes=['Car'], bev=bev, cs='vehicle-iso8855',
+                                       processes=1).get_metrics()
+
+        def rotate(frame_num, cuboid):
+            cuboid[4] += np.pi / 2  # Same center, footprint of length×width rotated 90º
+            return cuboid, 'CAM_LEFT'
+
+        def lift(frame_num, cuboid):
+            cuboid[1] -= cuboid[7]  # Moved up by its height: same footprint, no 3D overlap
+            return cuboid, 'CAM_LEFT'
+
+        def to_vehicle(frame_num, cuboid):
+            return scene.transform_cuboids([cuboid], 'CAM_LEFT', 'vehicle-iso8855', frame_num)[0], 'vehicle-iso8855'
+
+        # Predictions in another coordinate system
+        metrics = evaluate_edited(to_vehicle)
+        self.assertGreater(metrics['num_gt'], 0)
+        self.assertEqual(metrics['recall'], 1.0)
+        self.assertAlmostEqual(metrics['motp'], 1.0)
+
+        # IoU of the rotated footprints: width² / (2·length·width - width²), below 0.5 for all the cars
+        self.assertEqual(evaluate_edited(rotate, bev=True)['recall'], 0.0)
+        uids, cuboids = vcd_gt.get_object_data_at_frame(0, 'box3D', 'Car')
+        cuboids_rotated = cuboids.copy()
+        cuboids_rotated[:, 4] += np.pi / 2
+        cuboids = scene.transform_cuboids(cuboids, 'CAM_LEFT', 'vehicle-iso8855', 0)
+        cuboids_rotated = scene.transform_cuboids(cuboids_rotated, 'CAM_LEFT', 'vehicle-iso8855', 0)
+        length, width = cuboids[:, 6], cuboids[:, 8]
+        self.assertTrue(np.allclose(np.diag(overlap.iou_cuboid_bev(cuboids, cuboids_rotated)),
+                                    width ** 2 / (2 * length * width - width ** 2)))
+
+        self.assertEqual(evaluate_edited(lift)['recall'], 0.0)
+        self.assertEqual(evaluate_edited(lift, bev=True)['recall'], 1.0)
+
+
+if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
+    print("Running " + os.path.basename(__file__))
+    unittest.main()
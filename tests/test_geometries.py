@@ -201,6 +201,90 @@ class TestBasic(unittest.TestCase):
                                         inspect.currentframe().f_code.co_name + '.json'))
 
 
+    def test_rotations_batch(self):
+        rng = np.random.default_rng(0)
+        angles_Nx3 = rng.uniform(-np.pi, np.pi, (50, 3))
+        angles_Nx3[0] = (0.3, np.pi / 2, 0.2)  # singular for R2rvec
+
+        for seq in (utils.EulerSeq.ZYX, utils.EulerSeq.ZXZ, utils.EulerSeq.XYZ):
+            R_Nx3x3 = utils.euler2R_batch(angles_Nx3, seq=seq)
+            self.assertEqual(R_Nx3x3.shape, (50, 3, 3))
+            for i in (0, 1, 49):
+                self.assertTrue(np.allclose(R_Nx3x3[i], utils.euler2R(angles_Nx3[i].tolist(), seq=seq)))
+        self.assertTrue(np.all(utils.isR_batch(R_Nx3x3)))
+
+        R_Nx3x3 = utils.euler2R_batch(angles_Nx3)
+        rvec_Nx3 = utils.R2rvec_batch(R_Nx3x3)
+        for i in (0, 1, 49):
+            self.assertTrue(np.allclose(rvec_Nx3[i], utils.R2rvec(R_Nx3x3[i]).flatten()))
+
+        C_Nx3 = rng.uniform(-10.0, 10.0, (50, 3))
+        P_Nx4x4 = utils.create_pose_batch(R_Nx3x3, C_Nx3)
+        self.assertTrue(np.allclose(P_Nx4x4[7], utils.create_pose(R_Nx3x3[7], C_Nx3[7].reshape(3, 1))))
+
+        # Checks are only done in debug mode
+        R_Nx3x3[3] *= 2.0
+        utils.R2rvec_batch(R_Nx3x3)
+        utils.debug_checks = True
+        try:
+            self.assertRaises(AssertionError, utils.R2rvec_batch, R_Nx3x3)
+        finally:
+            utils.debug_checks = False
+
+    def test_convert_oxts_to_pose(self):
+        # (lat, lon, alt, roll, pitch, yaw) of a vehicle driving and turning
+        oxts = [[49.011 + 1e-5 * i, 8.423 + 2e-5 * i, 112.0 + 0.01 * i, 0.01, -0.02, 0.5 + 0.01 * i] for i in range(10)]
+        poses_4x4xN = utils.convert_oxts_to_pose(oxts)
+        self.assertEqual(poses_4x4xN.shape, (4, 4, 10))
+        self.assertTrue(np.allclose(poses_4x4xN[:, :, 0], np.identity(4)))
+
+        # Relative pose of each packet wrt the first one, one at a time
+        scale = utils.lat_to_scale(oxts[0][0])
+        poses_wrt_geo = []
+        for lat, lon, alt, rx, ry, rz in oxts:
+            x, y = utils.latlon_to_mercator(lat, lon, scale)
+            poses_wrt_geo.append(utils.create_pose(utils.euler2R([rz, ry, rx]), np.array([[x, y, alt]]).T))
+        for i in (1, 9):
+            pose = utils.inv(poses_wrt_geo[0]) @ poses_wrt_geo[i]
+            self.assertTrue(np.allclose(poses_4x4xN[:, :, i], pose))
+
+
+    def test_cuboids_batch(self):
+        rng = np.random.default_rng(0)
+        cuboids_9 = np.column_stack((rng.uniform(-20.0, 20.0, (20, 3)), rng.uniform(-np.pi, np.pi, (20, 3)),
+                                     rng.uniform(0.5, 5.0, (20, 3))))
+        q = rng.normal(size=(20, 4))
+        q /= np.linalg.norm(q, axis=1, keepdims=True)
+        cuboids_10 = np.column_stack((cuboids_9[:, 0:3], q, cuboids_9[:, 6:9]))
+        T_ref_to_dst = utils.create_pose(utils.euler2R([0.3, -0.1, 0.2]), np.array([[1.0], [2.0], [3.0]]))
+
+        for cuboids in (cuboids_9, cuboids_10):
+            points_4x8xN = utils.generate_cuboid_points_ref_4x8xN(cuboids)
+            self.assertEqual(points_4x8xN.shape, (4, 8, 20))
+            for i in (0, 19):
+                self.assertTrue(np.allclose(points_4x8xN[:, :, i],
+                                            utils.generate_cuboid_points_ref_4x8(cuboids[i].tolist())))
+
+            # Transformed cuboids have the transformed points
+            cuboids_dst = utils.transform_cuboids(cuboids, T_ref_to_dst)
+            self.assertEqual(cuboids_dst.shape, cuboids.shape)
+            self.assertTrue(np.allclose(utils.generate_cuboid_points_ref_4x8xN(cuboids_dst),
+                                        np.einsum('ij,jkn->ikn', T_ref_to_dst, points_4x8xN)))
+
+        cuboids_dst = utils.transform_cuboids(cuboids_9.tolist(), T_ref_to_dst)
+        self.assertTrue(np.allclose(cuboids_dst[5], utils.transform_cuboid(cuboids_9[5].tolist(), T_ref_to_dst)))
+        self.assertEqual(utils.transform_cuboids([], T_ref_to_dst).shape, (0, 9))
+
+        # Bounding rectangles of sets of points, ignoring invalid ones
+        points2d_3xKxN = np.ones((3, 3, 2))
+        points2d_3xKxN[0:2, :, 0] = [[10.0, 20.0, 1000.0], [5.0, 25.0, 1000.0]]
+        points2d_3xKxN[0:2, :, 1] = np.nan
+        idx_valid_KxN = np.array([[True, False], [True, False], [False, False]])
+        rects_Nx4, valid = utils.bounding_rects(points2d_3xKxN, idx_valid_KxN)
+        self.assertEqual(valid.tolist(), [True, False])
+        self.assertEqual(rects_Nx4[0].tolist(), [15, 15, 10, 20])
+
+
 if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
     print("Running " + os.path.basename(__file__))
     unittest.main()
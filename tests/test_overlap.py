@@ -0,0 +1,104 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import os
+import unittest
+import numpy as np
+import cv2 as cv
+
+import vcd.core as core
+import vcd.overlap as overlap
+
+from test_config import openlabel_version_name
+
+
+class TestBasic(unittest.TestCase):
+    def test_iou_bbox(self):
+        boxes_a = [(10, 10, 10, 10), (0, 0, 4, 2)]
+        boxes_b = [(15, 10, 10, 10), (10, 10, 10, 10), (100, 100, 5, 5)]
+        iou = overlap.iou_bbox(boxes_a, boxes_b)
+        self.assertEqual(iou.shape, (2, 3))
+        self.assertAlmostEqual(iou[0, 0], 50 / 150)
+        self.assertAlmostEqual(iou[0, 1], 1.0)
+        self.assertEqual(iou[1].tolist(), [0.0, 0.0, 0.0])
+        self.assertEqual(overlap.iou_bbox(boxes_a, []).shape, (2, 0))
+
+        # Chunked
+        rng = np.random.default_rng(0)
+        boxes_a = np.column_stack((rng.uniform(0, 100, (20, 2)), rng.uniform(5, 30, (20, 2))))
+        boxes_b = np.column_stack((rng.uniform(0, 100, (50, 2)), rng.uniform(5, 30, (50, 2))))
+        self.assertTrue(np.array_equal(overlap.iou_bbox(boxes_a, boxes_b),
+                                       overlap.iou_bbox(boxes_a, boxes_b, chunk_size=7)))
+
+    def test_iou_rbbox(self):
+        rng = np.random.default_rng(1)
+        rbboxes_a = np.column_stack((rng.uniform(0, 50, (15, 2)), rng.uniform(5, 30, (15, 2)),
+                                     rng.uniform(-3, 3, 15)))
+        rbboxes_b = np.column_stack((rng.uniform(0, 50, (20, 2)), rng.uniform(5, 30, (20, 2)),
+                                     rng.uniform(-3, 3, 20)))
+        rbboxes_b[0] = rbboxes_a[0]
+        iou = overlap.iou_rbbox(rbboxes_a, rbboxes_b)
+        self.assertAlmostEqual(iou[0, 0], 1.0)
+        self.assertTrue(np.array_equal(iou, overlap.iou_rbbox(rbboxes_a, rbboxes_b, chunk_size=3)))
+
+        # Compare with OpenCV (float32)
+        for i in range(rbboxes_a.shape[0]):
+            for j in range(rbboxes_b.shape[0]):
+                a, b = rbboxes_a[i], rbboxes_b[j]
+                ret, points = cv.rotatedRectangleIntersection(((a[0], a[1]), (a[2], a[3]), np.degrees(a[4])),
+                                                              ((b[0], b[1]), (b[2], b[3]), np.degrees(b[4])))
+                inter = 0.0 if points is None else cv.contourArea(cv.convexHull(points))
+                self.assertAlmostEqual(iou[i, j], inter / (a[2] * a[3] + b[2] * b[3] - inter), places=3)
+
+        # Not rotated, as bbox
+        rbboxes_b[:, 4] = 0.0
+        rbboxes_a[:, 4] = 0.0
+        self.assertTrue(np.allclose(overlap.iou_rbbox(rbboxes_a, rbboxes_b),
+                                    overlap.iou_bbox(rbboxes_a[:, 0:4], rbboxes_b[:, 0:4])))
+
+    def test_iou_cuboid(self):
+        cuboids = [(0, 0, 0, 0, 0, 0.3, 4, 2, 1.5), (0.5, 0, 0.2, 0, 0, 0.3, 4, 2, 1.5)]
+        # Second cuboid displaced 0.5 along x: (0.5 cos(0.3), -0.5 sin(0.3)) in the object frame
+        dx, dy = 0.5 * np.cos(0.3), 0.5 * np.sin(0.3)
+        inter = (4 - dx) * (2 - dy)
+        iou_bev = overlap.iou_cuboid_bev(cuboids, cuboids)
+        self.assertAlmostEqual(iou_bev[0, 1], inter / (16 - inter))
+        self.assertAlmostEqual(iou_bev[0, 0], 1.0)
+        iou_3d = overlap.iou_cuboid_3d(cuboids, cuboids)
+        self.assertAlmostEqual(iou_3d[0, 1], inter * 1.3 / (24 - inter * 1.3))
+
+        # Quaternion form, same yaw
+        q = (0, 0, np.sin(0.15), np.cos(0.15))
+        cuboids_q = [(0, 0, 0) + q + (4, 2, 1.5)]
+        self.assertAlmostEqual(overlap.iou_cuboid_3d(cuboids_q, cuboids)[0, 1], iou_3d[0, 1])
+        self.assertTrue(np.allclose(overlap.iou(cuboids, cuboids, 'cuboid', chunk_size=1), iou_3d))
+
+    def test_iou_frame(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        uids, boxes = vcd.get_object_data_at_frame(0, 'box2D_left')
+        self.assertEqual(boxes.shape, (len(uids), 4))
+        for uid, box in zip(uids, boxes):
+            self.assertEqual(box.tolist(), vcd.get_object_data(uid, 'box2D_left', 0)['val'])
+        uids_car, cuboids = vcd.get_object_data_at_frame(0, 'box3D', semantic_type='Car')
+        self.assertTrue(set(uids_car) <= set(uids))
+        self.assertEqual(cuboids.shape, (len(uids_car), 9))
+
+        iou = overlap.iou_bbox(boxes, boxes)
+        self.assertTrue(np.allclose(np.diag(iou), 1.0))
+        self.assertTrue(np.allclose(iou, iou.T))
+        self.assertEqual(vcd.get_object_data_at_frame(100000, 'box2D_left')[0], [])
+
+
+if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
+    print("Running " + os.path.basename(__file__))
+    unittest.main()
@@ -29,4 +29,9 @@ subprocess.check_call(["python.exe", "test_openlabel_labeling.py"])
 subprocess.check_call(["python.exe", "test_openlabel_tagging.py"])
 subprocess.check_call(["python.exe", "test_uuid.py"])
 subprocess.check_call(["python.exe", "test_bbox.py"])
-
+subprocess.check_call(["python.exe", "test_element_data_series.py"])
+subprocess.check_call(["python.exe", "test_scl.py"])
+subprocess.check_call(["python.exe", "test_overlap.py"])
+subprocess.check_call(["python.exe", "test_evaluation.py"])
+subprocess.check_call(["python.exe", "test_spatial.py"])
+subprocess.check_call(["python.exe", "test_visibility.py"])
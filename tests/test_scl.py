@@ -0,0 +1,488 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import os
+import tempfile
+import time
+import unittest
+import numpy as np
+
+import vcd.core as core
+import vcd.types as types
+import vcd.scl as scl
+import vcd.utils as utils
+
+from test_config import openlabel_version_name
+
+
+class TestBasic(unittest.TestCase):
+    def test_transform_chain(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+
+        # Chains going up and down the tree are consistent with each other
+        t_cam_to_velo, static = scene.get_transform('CAM_LEFT', 'VELO_TOP')
+        t_velo_to_imu, static = scene.get_transform('VELO_TOP', 'IMU')
+        t_cam_to_imu, static = scene.get_transform('CAM_LEFT', 'IMU')
+        self.assertTrue(np.allclose(t_cam_to_imu, t_velo_to_imu @ t_cam_to_velo))
+        t_imu_to_cam, static = scene.get_transform('IMU', 'CAM_LEFT')
+        self.assertTrue(np.allclose(t_imu_to_cam @ t_cam_to_imu, np.identity(4)))
+
+        # Frame-specific edge (vehicle-iso8855_to_odom)
+        t_cam_to_odom, static = scene.get_transform('CAM_LEFT', 'odom', 10)
+        self.assertFalse(static)
+        t_cam_to_vehicle, static = scene.get_transform('CAM_LEFT', 'vehicle-iso8855', 10)
+        self.assertTrue(static)
+        t_vehicle_to_odom = utils.get_transform_as_matrix4x4(
+            vcd.get_frame(10)['frame_properties']['transforms']['vehicle-iso8855_to_odom']['transform_src_to_dst'])
+        self.assertTrue(np.allclose(t_cam_to_odom, t_vehicle_to_odom @ t_cam_to_vehicle))
+
+        # Adding a coordinate system updates the tree
+        pose_rot = utils.create_pose(utils.Rz(np.pi / 2), np.zeros((3, 1)))
+        vcd.add_coordinate_system('CAM_LEFT_ROTATED', types.CoordinateSystemType.sensor_cs, parent_name='CAM_LEFT',
+                                  pose_wrt_parent=types.PoseData(val=pose_rot.flatten().tolist(),
+                                                                 type=types.TransformDataType.matrix_4x4))
+        t_rot_to_imu, static = scene.get_transform('CAM_LEFT_ROTATED', 'IMU')
+        self.assertTrue(np.allclose(t_rot_to_imu, t_cam_to_imu @ pose_rot))
+
+        # Coordinate systems in different trees are not connected
+        vcd.add_coordinate_system('OTHER', types.CoordinateSystemType.scene_cs)
+        t_other, static = scene.get_transform('OTHER', 'CAM_LEFT')
+        self.assertTrue(np.allclose(t_other, np.identity(4)))
+
+    def test_transform_cache(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd, transform_cache_size=8)
+
+        # Static chain: one single entry for all frames
+        t_0, static = scene.get_transform('CAM_LEFT', 'VELO_TOP', 0)
+        for frame_num in range(1, 20):
+            t, static = scene.get_transform('CAM_LEFT', 'VELO_TOP', frame_num)
+            self.assertIs(t, t_0)
+        info = scene.get_transform_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (19, 1, 1))
+        self.assertFalse(t_0.flags.writeable)
+
+        # Dynamic chain: one entry per frame, bounded by the LRU size
+        for frame_num in range(0, 20):
+            scene.get_transform('CAM_LEFT', 'odom', frame_num)
+        info = scene.get_transform_cache_info()
+        self.assertEqual((info.misses, info.currsize), (21, 8))
+
+        # New transforms invalidate the cache
+        t_before, static = scene.get_transform('vehicle-iso8855', 'odom', 19)
+        vcd.add_transform(19, types.Transform(src_name='vehicle-iso8855', dst_name='odom',
+                                              transform_src_to_dst=types.TransformData(
+                                                  val=np.identity(4).flatten().tolist(),
+                                                  type=types.TransformDataType.matrix_4x4)))
+        t_after, static = scene.get_transform('vehicle-iso8855', 'odom', 19)
+        self.assertFalse(np.allclose(t_before, t_after))
+        self.assertTrue(np.allclose(t_after, np.identity(4)))
+
+
+    def test_get_transforms(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        frames = np.arange(0, 76)
+
+        # Batch of transforms matches the per-frame ones (dynamic and static chains)
+        for cs_src, cs_dst in (('CAM_LEFT', 'odom'), ('odom', 'CAM_RIGHT'), ('CAM_LEFT', 'IMU')):
+            transforms = scene.get_transforms(cs_src, cs_dst, frames)
+            self.assertEqual(transforms.shape, (76, 4, 4))
+            for frame_num in (0, 40, 75):
+                t, static = scene.get_transform(cs_src, cs_dst, frame_num)
+                self.assertTrue(np.allclose(transforms[frame_num], t))
+
+        # Points broadcast over frames
+        points3d_4xN = np.array([[1.0, 2.0], [0.0, 1.0], [10.0, 20.0], [1.0, 1.0]])
+        points_frames = scene.transform_points3d_4xN_frames(points3d_4xN, 'CAM_LEFT', 'odom', frames)
+        self.assertEqual(points_frames.shape, (76, 4, 2))
+        self.assertTrue(np.allclose(points_frames[33],
+                                    scene.transform_points3d_4xN(points3d_4xN, 'CAM_LEFT', 'odom', 33)))
+
+        # Batched inverse keeps the 4x4xN layout
+        transforms_4x4xN = np.moveaxis(scene.get_transforms('CAM_LEFT', 'odom', frames), 0, 2)
+        self.assertTrue(np.allclose(utils.inv(transforms_4x4xN)[:, :, 5], utils.inv(transforms_4x4xN[:, :, 5])))
+
+
+    def test_pose_timeline(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        frames = np.arange(0, 76)
+        poses = scene.get_transforms('vehicle-iso8855', 'odom', frames)
+        timestamps = frames * 0.1  # e.g. 10 Hz odometry
+        timeline = utils.PoseTimeline(timestamps[::-1], poses[::-1])
+        self.assertEqual(len(timeline), 76)
+
+        # Poses are recovered at the timestamps of the timeline
+        self.assertTrue(np.allclose(timeline.interpolate(timestamps), poses))
+
+        # Queries in between (e.g. a camera at another rate) are rigid transforms
+        queries = np.arange(0.0, 7.5, 1.0 / 30.0)
+        poses_q = timeline.interpolate(queries)
+        R = poses_q[:, 0:3, 0:3]
+        self.assertTrue(np.allclose(R @ np.transpose(R, (0, 2, 1)), np.identity(3)))
+        self.assertTrue(np.allclose(np.linalg.det(R), 1.0))
+        pose_mid = timeline.interpolate(0.55)[0]  # halfway between frames 5 and 6
+        self.assertTrue(np.allclose(pose_mid[0:3, 3], (poses[5, 0:3, 3] + poses[6, 0:3, 3]) / 2))
+
+        # Same as interpolate_pose, one timestamp at a time
+        poses_dict = dict(zip(timestamps.tolist(), poses))
+        for i in (1, 31, 100):
+            self.assertTrue(np.allclose(utils.interpolate_pose(poses_dict, queries[i]), poses_q[i]))
+
+        # Outside the timeline
+        poses_out = timeline.interpolate([-1.0, 8.0])
+        self.assertTrue(np.all(np.isnan(poses_out)))
+        poses_out = timeline.interpolate([-1.0, 8.0], extrapolate=True)
+        self.assertTrue(np.allclose(poses_out, poses[[0, -1]]))
+
+
+    def test_camera_cache(self):
+        def intrinsics(f):
+            return types.IntrinsicsPinhole(width_px=640, height_px=480,
+                                           camera_matrix_3x4=[f, 0.0, 320.0, 0.0, 0.0, f, 240.0, 0.0, 0.0, 0.0, 1.0, 0.0],
+                                           distortion_coeffs_1xN=[-0.2, 0.05, 0.0, 0.0, 0.0])
+
+        vcd = core.OpenLABEL()
+        vcd.add_stream(stream_name='CAM', uri='', description='Camera', stream_type=core.StreamType.camera)
+        vcd.add_stream_properties(stream_name='CAM', intrinsics=intrinsics(1000.0))
+        for frame_num in range(0, 10):
+            # Frames 0-4 only have sync info, 5-7 repeat the static intrinsics, and 8-9 have their own
+            vcd.add_stream_properties(stream_name='CAM',
+                                      stream_sync=types.StreamSync(frame_vcd=frame_num, frame_stream=frame_num + 1),
+                                      intrinsics=None if frame_num < 5 else intrinsics(
+                                          1000.0 if frame_num < 8 else 1001.0))
+        scene = scl.Scene(vcd, camera_cache_size=1)
+
+        cam_static = scene.get_camera('CAM')
+        for frame_num in range(0, 8):
+            self.assertIs(scene.get_camera('CAM', frame_num), cam_static)
+        cam_8 = scene.get_camera('CAM', 8)
+        self.assertIsNot(cam_8, cam_static)
+        self.assertEqual(cam_8.K_3x3[0, 0], 1001.0)
+        self.assertIs(scene.get_camera('CAM', 9), cam_8)
+        info = scene.get_camera_cache_info()
+        self.assertEqual((info.hits, info.misses, info.maxsize, info.currsize), (9, 2, 1, 2))
+
+        # Remaps are computed on demand for the shared camera
+        self.assertIs(scene.get_camera('CAM', 3, compute_remaps=True), cam_static)
+        self.assertIsNotNone(cam_static.mapX_to_und_16SC2)
+
+        # Changes in the intrinsics are detected
+        vcd.add_stream_properties(stream_name='CAM', intrinsics=intrinsics(900.0))
+        self.assertEqual(scene.get_camera('CAM', 2).K_3x3[0, 0], 900.0)
+
+
+    def test_remap_cache(self):
+        vcd = core.OpenLABEL()
+        vcd.add_stream(stream_name='CAM_PINHOLE', uri='', description='', stream_type=core.StreamType.camera)
+        vcd.add_stream_properties(stream_name='CAM_PINHOLE', intrinsics=types.IntrinsicsPinhole(
+            width_px=320, height_px=240, camera_matrix_3x4=[300.0, 0.0, 160.0, 0.0, 0.0, 300.0, 120.0, 0.0,
+                                                            0.0, 0.0, 1.0, 0.0],
+            distortion_coeffs_1xN=[-0.2, 0.05, 0.0, 0.0, 0.0]))
+        img = np.random.default_rng(0).integers(0, 255, (240, 320, 3), dtype=np.uint8)
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # First process computes and stores the remaps
+            cam = scl.Scene(vcd, remap_cache_dir=cache_dir).get_camera('CAM_PINHOLE', compute_remaps=True)
+            self.assertFalse(isinstance(cam.mapX_to_und_16SC2, np.memmap))
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            # Others load them (memory-mapped)
+            cam_loaded = scl.Scene(vcd, remap_cache_dir=cache_dir).get_camera('CAM_PINHOLE', compute_remaps=True)
+            self.assertTrue(isinstance(cam_loaded.mapX_to_und_16SC2, np.memmap))
+            self.assertTrue(np.array_equal(cam_loaded.mapX_to_und_16SC2, cam.mapX_to_und_16SC2))
+            self.assertTrue(np.array_equal(cam_loaded.mapY_to_und_16SC2, cam.mapY_to_und_16SC2))
+            self.assertTrue(np.array_equal(cam_loaded.undistort_image(img), cam.undistort_image(img)))
+
+
+    def test_fisheye_projection(self):
+        cam = scl.CameraFisheye({'width_px': 1280, 'height_px': 1080, 'center_x': 0.0, 'center_y': 0.0,
+                                 'aspect_ratio': 1.0,
+                                 'lens_coeffs_1x4': [333.437012, 0.307729989, 2.4235599, 11.0495005]},
+                                'CAM_FISHEYE', '', '')
+
+        # Points around the camera (e.g. a lidar sweep), some of them behind it or on the optical axis
+        n = 100000
+        rng = np.random.default_rng(0)
+        points3d_4xN = np.vstack((rng.uniform(-20.0, 20.0, (3, n)), np.ones((1, n))))
+        points3d_4xN[0:2, 0:2] = 0.0
+        start = time.time()
+        points2d_3xN, idx_valid = cam.project_points3d(points3d_4xN)
+        end = time.time()
+        print("CameraFisheye.project_points3d: {:.0f} points/s".format(n / max(end - start, 1e-9)))
+        self.assertTrue(np.array_equal(idx_valid, points3d_4xN[2, :] > 1e-8))
+
+        # Per-point model (rp = k1*a + k2*a^2 + k3*a^3 + k4*a^4, with a the angle of incidence)
+        k = cam.d_1x4[0]
+        for i in np.flatnonzero(idx_valid)[0:20]:
+            x, y, z = points3d_4xN[0:3, i]
+            a = np.arctan2(np.sqrt(x * x + y * y), z)
+            rp = k[0] * a + k[1] * a ** 2 + k[2] * a ** 3 + k[3] * a ** 4
+            r = np.sqrt(x * x + y * y) + 1e-300
+            expected = (x * rp / r + cam.K_3x3[0, 2], y * rp / r + cam.K_3x3[1, 2])
+            self.assertTrue(np.allclose(points2d_3xN[0:2, i], expected))
+
+        # Points on the optical axis go to the principal point, in both directions
+        rays3d_3xN = np.array([[0.0, 1e-9], [0.0, 0.0], [1.0, 1.0]])
+        self.assertTrue(np.array_equal(cam.distort_rays3d(rays3d_3xN), np.array([[0, 0], [0, 0], [1, 1]])))
+        self.assertTrue(np.array_equal(cam.undistort_rays3d(rays3d_3xN), np.array([[0, 0], [0, 0], [1, 1]])))
+
+        # Undistortion inverts the distortion (up to the polynomial fit of the inverse)
+        rays3d_3xN = points3d_4xN[0:3, idx_valid] / points3d_4xN[2, idx_valid]
+        rays3d_3xN = rays3d_3xN[:, np.arctan(np.linalg.norm(rays3d_3xN[0:2], axis=0)) < np.pi / 2 * 0.9]
+        rays3d_rep_3xN = cam.undistort_rays3d(cam.distort_rays3d(rays3d_3xN))
+        error_deg = np.degrees(np.abs(np.arctan(np.linalg.norm(rays3d_rep_3xN[0:2], axis=0)) -
+                                      np.arctan(np.linalg.norm(rays3d_3xN[0:2], axis=0))))
+        self.assertLess(np.max(error_deg), 1.0)
+
+
+    def test_project_points3d_compact(self):
+        cam = scl.CameraPinhole({'width_px': 1920, 'height_px': 1080,
+                                 'camera_matrix_3x4': [1000.0, 0.0, 960.0, 0.0, 0.0, 1000.0, 540.0, 0.0,
+                                                       0.0, 0.0, 1.0, 0.0],
+                                 'distortion_coeffs_1xN': [-0.4, 0.2, 0.0, 0.0, -0.05]}, 'CAM', '', '')
+        self.assertIsNotNone(cam.r_limit)
+        rng = np.random.default_rng(0)
+        points3d_4xN = np.vstack((rng.uniform(-20.0, 20.0, (3, 1000)), np.ones((1, 1000))))
+
+        for apply_distortion in (True, False):
+            points2d_3xN, idx_valid = cam.project_points3d(points3d_4xN, apply_distortion, remove_outside=True)
+            points2d_3xM, idx = cam.project_points3d(points3d_4xN, apply_distortion, remove_outside=True,
+                                                     compact=True)
+            self.assertTrue(np.array_equal(idx, np.flatnonzero(idx_valid)))
+            self.assertTrue(np.array_equal(points2d_3xM, points2d_3xN[:, idx]))
+            self.assertTrue(np.all(np.isnan(points2d_3xN[:, ~idx_valid])))
+
+            # Valid points are in front of the camera, inside the radius limit and inside the image
+            rays = points3d_4xN[0:2, idx] / points3d_4xN[2, idx]
+            self.assertTrue(np.all(points3d_4xN[2, idx] > 0))
+            self.assertTrue(np.all(np.linalg.norm(rays, axis=0) < cam.r_limit * 0.8))
+            self.assertTrue(np.all((points2d_3xM[0] >= 0) & (points2d_3xM[0] < 1920)))
+            self.assertTrue(np.all((points2d_3xM[1] >= 0) & (points2d_3xM[1] < 1080)))
+
+        # filter_outside keeps already invalid points untouched
+        points2d_3xN = np.array([[-1.0, 10.0, 10.0, 2000.0], [5.0, 5.0, 5.0, 5.0], [1.0, 1.0, 1.0, 1.0]])
+        idx_valid = np.array([True, True, False, True])
+        points2d_3xN, idx_valid = utils.filter_outside(points2d_3xN, (1920, 1080), idx_valid)
+        self.assertEqual(idx_valid.tolist(), [False, True, False, False])
+        self.assertTrue(np.array_equal(np.isnan(points2d_3xN[0]), [True, False, False, True]))
+
+
+    def test_reproject_points2d(self):
+        cam_pinhole = scl.CameraPinhole({'width_px': 1920, 'height_px': 1080,
+                                         'camera_matrix_3x4': [1000.0, 0.0, 960.0, 0.0, 0.0, 1000.0, 540.0, 0.0,
+                                                               0.0, 0.0, 1.0, 0.0],
+                                         'distortion_coeffs_1xN': [-0.2, 0.05, 0.0, 0.0, 0.0]}, 'CAM', '', '')
+        cam_fisheye = scl.CameraFisheye({'width_px': 1280, 'height_px': 1080, 'center_x': 0.0, 'center_y': 0.0,
+                                         'aspect_ratio': 1.0,
+                                         'lens_coeffs_1x4': [333.437012, 0.307729989, 2.4235599, 11.0495005]},
+                                        'CAM', '', '')
+
+        # Points of the ground, 1.5 meters below the camera (Y pointing down)
+        rng = np.random.default_rng(0)
+        ground = (0.0, 1.0, 0.0, -1.5)
+        points3d_4xN = np.vstack((rng.uniform(-3.0, 3.0, 100), np.full(100, 1.5), rng.uniform(4.0, 20.0, 100),
+                                  np.ones(100)))
+        for cam, atol in ((cam_pinhole, 1e-3), (cam_fisheye, 0.5)):
+            points2d_3xN, idx_valid = cam.project_points3d(points3d_4xN)
+            points3d_rep_4xN, idx_valid_rep = cam.reproject_points2d(points2d_3xN, ground)
+            self.assertTrue(np.all(idx_valid_rep))
+            self.assertTrue(np.allclose(points3d_rep_4xN[1], 1.5))
+            self.assertTrue(np.allclose(points3d_rep_4xN, points3d_4xN, atol=atol))
+
+        # The principal point looks parallel to the ground: infinite point, returned as a direction
+        point2d_3x1 = np.array([[960.0], [540.0], [1.0]])
+        point3d_4x1, idx_valid = cam_pinhole.reproject_points2d(point2d_3x1, ground)
+        self.assertFalse(idx_valid[0])
+        self.assertTrue(np.allclose(point3d_4x1[:, 0], (0, 0, 1, 0)))
+
+
+    def test_project_points3d_multi(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        rng = np.random.default_rng(0)
+        points3d_4xN = np.vstack((rng.uniform(0.0, 40.0, 5000), rng.uniform(-10.0, 10.0, 5000),
+                                  rng.uniform(-2.0, 1.0, 5000), np.ones(5000)))
+        cameras = ['CAM_LEFT', 'CAM_RIGHT']
+
+        for max_workers in (None, 1):
+            projections = scene.project_points3d_multi(points3d_4xN, 'VELO_TOP', cameras, 10,
+                                                       remove_outside=True, max_workers=max_workers)
+            self.assertEqual(list(projections.keys()), cameras)
+            for cam_name in cameras:
+                points2d_3xN, idx_valid = scene.project_points3d_4xN(points3d_4xN, 'VELO_TOP', cam_name, 10,
+                                                                     remove_outside=True)
+                self.assertTrue(np.array_equal(projections[cam_name][1], idx_valid))
+                self.assertTrue(np.allclose(projections[cam_name][0], points2d_3xN, equal_nan=True))
+                self.assertGreater(np.count_nonzero(idx_valid), 0)
+
+
+    def test_cuboids_batch(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        frame = vcd.get_frame(10)
+        cuboids = [object_content['object_data']['cuboid'][0]['val'] for object_content in frame['objects'].values()
+                   if 'cuboid' in object_content.get('object_data', {})]
+
+        cuboids_velo = scene.transform_cuboids(cuboids, 'CAM_LEFT', 'VELO_TOP', 10)
+        for i, cuboid in enumerate(cuboids):
+            self.assertTrue(np.allclose(cuboids_velo[i], scene.transform_cuboid(cuboid, 'CAM_LEFT', 'VELO_TOP', 10)))
+
+        points2d_3x8xN, idx_valid_8xN = scene.project_cuboids(cuboids, 'CAM_LEFT', 'CAM_RIGHT', 10)
+        self.assertEqual(points2d_3x8xN.shape, (3, 8, len(cuboids)))
+        for i, cuboid in enumerate(cuboids):
+            points2d_3x8, idx_valid = scene.project_points3d_4xN(utils.generate_cuboid_points_ref_4x8(cuboid),
+                                                                 'CAM_LEFT', 'CAM_RIGHT', 10)
+            self.assertTrue(np.array_equal(idx_valid_8xN[:, i], idx_valid))
+            self.assertTrue(np.allclose(points2d_3x8xN[:, :, i], points2d_3x8, equal_nan=True))
+
+
+    def test_camera_pose_cache(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+
+        # Static rig: computed once for all the frames
+        roi = scene.camera_roi_z0('CAM_LEFT', 'vehicle-iso8855', 0)
+        self.assertEqual(roi.shape, (3, 4))
+        self.assertTrue(np.array_equal(scene.camera_roi_z0('CAM_LEFT', 'vehicle-iso8855', 100), roi))
+        line, points = scene.compute_horizon_line('CAM_LEFT', 'vehicle-iso8855')
+        line_50, points_50 = scene.compute_horizon_line('CAM_LEFT', 'vehicle-iso8855', 50)
+        self.assertTrue(np.array_equal(line_50, line))
+        self.assertEqual(points_50, points)
+        self.assertEqual(len(points), 2)
+        for point in points:
+            self.assertAlmostEqual(line[0] * point[0] + line[1] * point[1] + line[2], 0.0)
+
+        # The camera moves with respect to odom
+        self.assertFalse(np.allclose(scene.compute_horizon_line('CAM_LEFT', 'odom', 0)[1],
+                                     scene.compute_horizon_line('CAM_LEFT', 'odom', 100)[1]))
+
+        # Callers get copies, the cache is not altered by them
+        roi[:] = 0
+        line_50[:] = 0
+        points_50.clear()
+        self.assertNotEqual(np.count_nonzero(scene.camera_roi_z0('CAM_LEFT', 'vehicle-iso8855', 1)), 0)
+        line_1, points_1 = scene.compute_horizon_line('CAM_LEFT', 'vehicle-iso8855', 1)
+        self.assertTrue(np.array_equal(line_1, line))
+        self.assertEqual(points_1, points)
+        roi = scene.camera_roi_z0('CAM_LEFT', 'vehicle-iso8855', 0)
+
+        # Different intrinsics at a frame
+        sp = vcd.get_root()['streams']['CAM_LEFT']['stream_properties']['intrinsics_pinhole']
+        vcd.add_stream_properties('CAM_LEFT', intrinsics=types.IntrinsicsPinhole(
+            width_px=sp['width_px'], height_px=sp['height_px'],
+            camera_matrix_3x4=(np.array(sp['camera_matrix_3x4']) * [1, 1, 1, 1, 1, 1, 0.5, 1, 1, 1, 1, 1]).tolist(),
+            distortion_coeffs_1xN=None), stream_sync=types.StreamSync(frame_vcd=10))
+        line_10, points_10 = scene.compute_horizon_line('CAM_LEFT', 'vehicle-iso8855', 10)
+        self.assertFalse(np.allclose(points_10, points))
+        self.assertTrue(np.array_equal(scene.camera_roi_z0('CAM_LEFT', 'vehicle-iso8855', 11), roi))
+
+
+    def test_bboxes_from_cuboids(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        classes = ['Car', 'Cyclist', 'Pedestrian', 'Van']
+
+        # Same as projecting each cuboid, and clipping its bounding rect to the image
+        for frame_num in (0, 50, 100):
+            uids, rects = scene.compute_bboxes_from_cuboids('CAM_RIGHT', frame_num, semantic_types=classes)
+            self.assertEqual(rects.shape, (len(uids), 4))
+            for uid, object_in_frame in vcd.get_frame(frame_num)['objects'].items():
+                if vcd.get_object(uid)['type'] not in classes:
+                    self.assertNotIn(uid, uids)
+                    continue
+                cuboid = vcd.get_object_data(uid, 'box3D', frame_num)
+                points2d_3x8, idx_valid = scene.project_points3d_4xN(
+                    utils.generate_cuboid_points_ref_4x8(cuboid['val']), cuboid['coordinate_system'], 'CAM_RIGHT',
+                    frame_num)
+                points2d_3x8 = points2d_3x8[:, idx_valid]
+                x_min, x_max = np.clip((points2d_3x8[0].min(), points2d_3x8[0].max()), 0, 1242)
+                y_min, y_max = np.clip((points2d_3x8[1].min(), points2d_3x8[1].max()), 0, 375)
+                if x_max <= x_min or y_max <= y_min:
+                    self.assertNotIn(uid, uids)
+                    continue
+                expected = utils.bounding_rect(np.array([[x_min, x_max], [y_min, y_max], [1, 1]]))
+                self.assertEqual(rects[uids.index(uid)].tolist(), expected)
+
+        # Written as bbox series, the same with worker processes
+        vcd_pool = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        count = scene.add_bboxes_from_cuboids(['CAM_LEFT', 'CAM_RIGHT'], bbox_names=['proj_left', 'proj_right'],
+                                              semantic_types=classes, processes=1)
+        count_pool = scl.Scene(vcd_pool).add_bboxes_from_cuboids(['CAM_LEFT', 'CAM_RIGHT'],
+                                                                 bbox_names=['proj_left', 'proj_right'],
+                                                                 semantic_types=classes, processes=2, chunksize=8)
+        self.assertEqual(count, count_pool)
+        self.assertEqual(vcd.stringify(False), vcd_pool.stringify(False))
+        uids, rects = scene.compute_bboxes_from_cuboids('CAM_RIGHT', 100, semantic_types=classes)
+        self.assertGreater(count, 2 * len(uids))
+        for uid, rect in zip(uids, rects.tolist()):
+            bbox = vcd.get_object_data(uid, 'proj_right', 100)
+            self.assertEqual((bbox['val'], bbox['coordinate_system']), (rect, 'CAM_RIGHT'))
+        self.assertIsNone(scene.compute_bboxes_from_cuboids('CAM_LEFT', 100000))
+
+
+    def test_lidar(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        vcd.add_stream_properties('VELO_TOP', intrinsics=types.IntrinsicsCustom(
+            width_px=2048, vertical_fov_deg=[-24.9, 2.0], height_px=64, max_range=120.0))
+        scene = scl.Scene(vcd)
+        self.assertIsNone(scene.get_camera('VELO_TOP'))
+        self.assertIsNone(scene.get_lidar('CAM_LEFT'))
+        lidar = scene.get_lidar('VELO_TOP')
+        self.assertTrue(lidar.is_lidar())
+        self.assertEqual((lidar.height, lidar.width), (64, 2048))
+
+        # Points along the pixel centers are projected onto integer coordinates, and reprojected back
+        rng = np.random.default_rng(0)
+        range_HxW = rng.uniform(2.0, 100.0, (64, 2048))
+        range_HxW[rng.random((64, 2048)) < 0.3] = np.inf
+        points3d_4xM, idx = lidar.reproject_range_image(range_HxW)
+        self.assertEqual(idx.shape[0], np.count_nonzero(np.isfinite(range_HxW)))
+        points2d_3xM, idx_valid = lidar.project_points3d(points3d_4xM, remove_outside=True)
+        self.assertTrue(np.all(idx_valid))
+        self.assertTrue(np.allclose(points2d_3xM[1] * 2048 + points2d_3xM[0], idx, atol=1e-6))
+        range_rep_HxW, intensity_HxW, index_HxW = lidar.range_image(points3d_4xM, intensities_N=idx)
+        self.assertTrue(np.allclose(range_rep_HxW, range_HxW))
+        self.assertTrue(np.array_equal(index_HxW.reshape(-1)[idx], np.arange(idx.shape[0])))
+        self.assertTrue(np.array_equal(intensity_HxW.reshape(-1)[idx], idx))
+
+        # The nearest point is kept, farther points at the same pixel are occluded
+        points3d_4xN = np.hstack((points3d_4xM[:, 0:1] * np.array([[2.0], [2.0], [2.0], [1.0]]), points3d_4xM[:, 0:1],
+                                  np.array([[0.0], [0.0], [-200.0], [1.0]])))
+        range_HxW, _, index_HxW = lidar.range_image(points3d_4xN)
+        self.assertEqual(np.count_nonzero(index_HxW >= 0), 1)
+        self.assertEqual(index_HxW.reshape(-1)[idx[0]], 1)
+        self.assertEqual(lidar.get_visibility(points3d_4xN, range_HxW).tolist(), [False, True, False])
+
+        # Scene: points from another coordinate system
+        points3d_4xN = np.vstack((rng.uniform(-50.0, 50.0, (2, 5000)), rng.uniform(-2.0, 2.0, 5000),
+                                  np.ones(5000)))
+        range_HxW, intensity_HxW, index_HxW = scene.project_points3d_range_image(
+            points3d_4xN, 'vehicle-iso8855', 'VELO_TOP', intensities_N=np.arange(5000))
+        points3d_velo_4xN = scene.transform_points3d_4xN(points3d_4xN, 'vehicle-iso8855', 'VELO_TOP')
+        expected = lidar.range_image(points3d_velo_4xN)
+        self.assertTrue(np.array_equal(range_HxW, expected[0]))
+        self.assertTrue(np.array_equal(index_HxW, intensity_HxW.astype(int) * (index_HxW >= 0) - (index_HxW < 0)))
+        points3d_rep_4xM, idx = scene.reproject_range_image(range_HxW, 'VELO_TOP', 'vehicle-iso8855')
+        # Reprojected points lie on the rays of the pixel centers, close to the original points
+        distances = np.linalg.norm(points3d_rep_4xM[0:3] - points3d_4xN[0:3, index_HxW.reshape(-1)[idx]], axis=0)
+        ranges = range_HxW.reshape(-1)[idx]
+        self.assertTrue(np.all(distances <= ranges * np.radians(0.5)))
+        self.assertIsNone(scene.project_points3d_range_image(points3d_4xN, 'vehicle-iso8855', 'CAM_LEFT'))
+
+
+if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
+    print("Running " + os.path.basename(__file__))
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import os
+import unittest
+import numpy as np
+
+import vcd.core as core
+import vcd.types as types
+import vcd.scl as scl
+import vcd.spatial as spatial
+
+from test_config import openlabel_version_name
+
+
+class TestBasic(unittest.TestCase):
+    def test_grid_index(self):
+        rng = np.random.default_rng(0)
+        corners = rng.uniform(0, 1000, (300, 2))
+        extents = np.hstack((corners, corners + rng.uniform(1, 80, (300, 2))))
+        extents[0] = (0, 0, 1000, 1000)  # Covers many cells
+        grid = spatial.GridIndex(extents)
+
+        points = rng.uniform(-50, 1050, (200, 2))
+        offsets, indices = grid.query_points(points)
+        self.assertEqual(offsets.shape, (201,))
+        for k in range(points.shape[0]):
+            p = points[k]
+            expected = np.flatnonzero((extents[:, 0] <= p[0]) & (p[0] <= extents[:, 2]) &
+                                      (extents[:, 1] <= p[1]) & (p[1] <= extents[:, 3]))
+            self.assertEqual(indices[offsets[k]:offsets[k + 1]].tolist(), expected.tolist())
+
+        queries = np.hstack((corners[:50], corners[:50] + rng.uniform(1, 200, (50, 2))))
+        queries[0] = (-100, -100, 2000, 2000)  # Covers all the grid
+        offsets, indices = grid.query_extents(queries)
+        for k in range(queries.shape[0]):
+            q = queries[k]
+            expected = np.flatnonzero((q[0] <= extents[:, 2]) & (q[2] >= extents[:, 0]) &
+                                      (q[1] <= extents[:, 3]) & (q[3] >= extents[:, 1]))
+            self.assertEqual(indices[offsets[k]:offsets[k + 1]].tolist(), expected.tolist())
+
+        offsets, indices = spatial.GridIndex(np.zeros((0, 4))).query_points([(1, 1), (2, 2)])
+        self.assertEqual((offsets.tolist(), indices.tolist()), ([0, 0, 0], []))
+
+    def test_frame_spatial_index(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        index = vcd.get_frame_spatial_index(0, data_names=['box2D_left'])
+        uids, boxes = vcd.get_object_data_at_frame(0, 'box2D_left')
+        self.assertEqual(len(index), len(uids))
+        for uid, result in zip(uids, index.query_points(boxes[:, 0:2])):
+            self.assertIn(uid, result)
+        self.assertEqual(sorted(index.query_rect((600, 200, 2000, 1000))), sorted(uids))
+        self.assertEqual(index.query_point(-1000, -1000), [])
+        self.assertIsNone(vcd.get_frame_spatial_index(100000))
+
+        # Cached until the frame changes
+        self.assertIs(vcd.get_frame_spatial_index(0, data_names=['box2D_left']), index)
+        version = vcd.get_frame_data_version()
+        changes = vcd.track_frame_data_changes()
+        uid = vcd.add_object('new', 'Car', frame_value=0)
+        vcd.add_object_data(uid, types.bbox('box2D_left', (5000, 5000, 10, 10)), frame_value=0)
+        self.assertGreater(vcd.get_frame_data_version(), version)
+        self.assertEqual(changes, {0})
+        self.assertIs(vcd.get_frame_spatial_index(1, data_names=['box2D_left']),
+                      vcd.get_frame_spatial_index(1, data_names=['box2D_left']))
+        index = vcd.get_frame_spatial_index(0, data_names=['box2D_left'])
+        self.assertEqual(index.query_point(5002, 4998), [str(uid)])
+        vcd.rm_object(uid)
+        self.assertEqual(vcd.get_frame_spatial_index(0, data_names=['box2D_left']).query_point(5002, 4998), [])
+
+    def test_frame_spatial_index_geometries(self):
+        vcd = core.OpenLABEL()
+        uid = vcd.add_object('car', 'Car', frame_value=0)
+        vcd.add_object_data(uid, types.rbbox('rbox', (100, 100, 40, 20, np.pi / 2)), frame_value=0)
+        coords = [5, 5, 10, 5, 11, 6, 11, 8, 9, 10, 5, 10, 3, 8]
+        uid_poly = vcd.add_object('region', 'Road', frame_value=0)
+        vcd.add_object_data(uid_poly, types.poly2d('contour', coords, types.Poly2DType.MODE_POLY2D_SRF6DCC, False),
+                            frame_value=0)
+
+        index = vcd.get_frame_spatial_index(0)
+        self.assertEqual(index.query_points([(105, 115), (115, 105)]), [[str(uid)], []])
+        element_data = vcd.get_object_data(uid_poly, 'contour', 0)
+        self.assertEqual(spatial.poly2d_extent(element_data).tolist(), [3, 5, 11, 10])
+        self.assertEqual(index.query_point(4, 9), [str(uid_poly)])
+        self.assertEqual(index.query_rects([(8, 8, 2, 2), (100, 80, 4, 4)]), [[str(uid_poly)], [str(uid)]])
+
+    def test_point_index_3d(self):
+        rng = np.random.default_rng(0)
+        points = rng.uniform(-100, 100, (2000, 3))
+        frames = rng.integers(0, 50, 2000)
+        index = spatial.PointIndex3D(points, frames, cell_size=10.0)
+        for center, radius, frame_start, frame_end in (((0, 0, 0), 30, 10, 20), ((50, -20, 5), 15, None, None),
+                                                       ((0, 0, 0), 500, 3, 3), ((0, 0, 0), 30, 60, 70)):
+            indices, distances = index.query_radius(center, radius, frame_start, frame_end)
+            d = np.linalg.norm(points - center, axis=1)
+            mask = d <= radius
+            if frame_start is not None:
+                mask &= (frames >= frame_start) & (frames <= frame_end)
+            self.assertEqual(sorted(indices.tolist()), np.flatnonzero(mask).tolist())
+            self.assertTrue(np.all(np.diff(distances) >= 0))
+
+        indices, distances = index.query_knn((10, 10, 10), 5, 7, 7)
+        candidates = np.flatnonzero(frames == 7)
+        expected = candidates[np.argsort(np.linalg.norm(points[candidates] - (10, 10, 10), axis=1))[:5]]
+        self.assertEqual(indices.tolist(), expected.tolist())
+        self.assertEqual(len(index.query_knn((1000, 0, 0), 10000)[0]), 2000)
+
+    def test_scene_index_3d(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        index = spatial.SceneIndex3D(scene, 'vehicle-iso8855', data_names=['box3D'])
+
+        # All objects within 30 m of the ego vehicle between frames 10 and 20
+        result = index.query_radius((0, 0, 0), 30, 10, 20)
+        expected = []
+        for frame_num in range(10, 21):
+            uids, cuboids = vcd.get_object_data_at_frame(frame_num, 'box3D')
+            for uid, cuboid in zip(uids, cuboids):
+                cs = vcd.get_object_data(uid, 'box3D', frame_num)['coordinate_system']
+                point = scene.transform_points3d_4xN(np.append(cuboid[0:3], 1).reshape(4, 1), cs,
+                                                     'vehicle-iso8855', frame_num)
+                if np.linalg.norm(point[0:3, 0]) <= 30:
+                    expected.append((frame_num, uid))
+        self.assertEqual(sorted(zip(result.frames.tolist(), result.uids.tolist())), sorted(expected))
+        self.assertTrue(np.all(result.distances <= 30))
+
+        # Nearest objects at a frame: the ego vehicle first (static cuboid)
+        result = index.query_knn((0, 0, 0), 3, 0)
+        self.assertEqual(result.uids[0], vcd.get_object_uid_by_name('Egocar'))
+        self.assertEqual(len(result.uids), 3)
+
+        # Incremental rebuild
+        self.assertEqual(index.update(), 0)
+        uid = result.uids[1]
+        cuboid = list(vcd.get_object_data(uid, 'box3D', 0)['val'])
+        cs = vcd.get_object_data(uid, 'box3D', 0)['coordinate_system']
+        cuboid[0:3] = scene.transform_points3d_4xN(np.array([[0.0], [0.0], [200.0], [1.0]]), 'vehicle-iso8855', cs,
+                                                   0)[0:3, 0].tolist()
+        vcd.add_object_data(uid, types.cuboid('box3D', cuboid, coordinate_system=cs), frame_value=0)
+        self.assertEqual(index.update(), 1)
+        result = index.query_knn((0, 0, 200), 1, 0)
+        self.assertEqual(result.uids.tolist(), [uid])
+        self.assertTrue(np.allclose(result.points[0], (0, 0, 200)))
+
+        # A frame-specific transform only changes its frame
+        index_odom = spatial.SceneIndex3D(scene, 'odom', data_names=['box3D'])
+        uids_5 = sorted(index_odom.query_radius((0, 0, 0), 100, 5, 5).uids.tolist())
+        vcd.add_transform(5, types.Transform(src_name='vehicle-iso8855', dst_name='odom',
+                                             transform_src_to_dst=types.TransformData(
+                                                 val=[1, 0, 0, 1000, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1],
+                                                 type=types.TransformDataType.matrix_4x4)))
+        self.assertEqual(index_odom.update(), 1)
+        self.assertEqual(index.update(), 1)
+        result = index_odom.query_radius((1000, 0, 0), 100, 0, 143)
+        self.assertEqual(set(result.frames.tolist()), {5})
+        self.assertEqual(sorted(result.uids.tolist()), uids_5)
+
+    def test_scene_index_3d_static(self):
+        vcd = core.OpenLABEL()
+        vcd.add_coordinate_system('odom', types.CoordinateSystemType.scene_cs)
+        uid = vcd.add_object('pole', 'Pole', frame_value=(0, 2))
+        vcd.add_object_data(uid, types.point3d('position', (0, 0, 0), coordinate_system='odom'))
+        index = spatial.SceneIndex3D(scl.Scene(vcd), 'odom')
+        self.assertEqual(len(index.query_radius((0, 0, 0), 0.5, 1, 1).uids), 1)
+
+        # Editing static element_data re-reads the frames of the element
+        vcd.add_object_data(uid, types.point3d('position', (100, 0, 0), coordinate_system='odom'))
+        self.assertEqual(index.update(), 3)
+        self.assertEqual(len(index.query_radius((0, 0, 0), 0.5, 1, 1).uids), 0)
+        self.assertEqual(index.query_radius((100, 0, 0), 0.5, 1, 1).uids.tolist(), [str(uid)])
+        self.assertEqual(index.update(), 0)
+
+        vcd.rm_object(uid)
+        index.update()
+        self.assertEqual(len(index), 0)
+
+if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
+    print("Running " + os.path.basename(__file__))
+    unittest.main()
@@ -0,0 +1,135 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import os
+import unittest
+import numpy as np
+
+import vcd.core as core
+import vcd.types as types
+import vcd.scl as scl
+import vcd.visibility as visibility
+
+from test_config import openlabel_version_name
+
+
+def create_scene():
+    # Camera looking along z (x right, y down), 500 px of focal length, with (at frames 0 and 1):
+    # A: cube of 2 m at 10 m, in front of B (moved out of the image at frame 1)
+    # B: cube of 4 m at 20 m, 2 m to the right, the left half of its front face behind A
+    # C: behind the camera, D: around the camera, wall: mesh quad at 30 m covering all the image
+    vcd = core.OpenLABEL()
+    vcd.add_stream('CAM', '', 'Camera', core.StreamType.camera)
+    vcd.add_stream_properties('CAM', intrinsics=types.IntrinsicsPinhole(
+        width_px=640, height_px=480, camera_matrix_3x4=[500.0, 0.0, 320.0, 0.0, 0.0, 500.0, 240.0, 0.0,
+                                                        0.0, 0.0, 1.0, 0.0],
+        distortion_coeffs_1xN=None))
+    vcd.add_coordinate_system('CAM', types.CoordinateSystemType.sensor_cs)
+
+    uids = {}
+    for name, cuboid in (('A', (0, 0, 10, 0, 0, 0, 2, 2, 2)), ('B', (2, 0, 20, 0, 0, 0, 4, 4, 4)),
+                         ('C', (0, 0, -10, 0, 0, 0, 2, 2, 2)), ('D', (0, 0, 0, 0, 0, 0, 6, 6, 6))):
+        uids[name] = vcd.add_object(name, 'Box', frame_value=(0, 1))
+        for frame_num in (0, 1):
+            val = list(cuboid)
+            if name == 'A' and frame_num == 1:
+                val[0] = 50
+            vcd.add_object_data(uids[name], types.cuboid('box3D', val, coordinate_system='CAM'), frame_num)
+
+    wall = types.mesh('wall', coordinate_system='CAM')
+    for point in ((-100, -100, 30), (100, -100, 30), (100, 100, 30), (-100, 100, 30)):
+        wall.add_vertex(types.point3d('vertex', point))
+    for k in range(0, 4):
+        wall.add_edge(types.lineReference('edge', [k, (k + 1) % 4], types.ObjectDataType.point3d))
+    wall.add_area(types.areaReference('face', [0, 1, 2, 3], types.ObjectDataType.line_reference))
+    uids['wall'] = vcd.add_object('wall', 'Wall', frame_value=(0, 1))
+    vcd.add_object_data(uids['wall'], wall)
+    return vcd, uids
+
+
+class TestBasic(unittest.TestCase):
+    def test_pixel_rays3d(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        cam = scl.Scene(vcd).get_camera('CAM_LEFT')
+        rays_3xHxW = cam.get_pixel_rays3d(0.25)
+        self.assertEqual(rays_3xHxW.shape, (3, int(np.ceil(cam.height / 4)), int(np.ceil(cam.width / 4))))
+        self.assertIs(cam.get_pixel_rays3d(0.25), rays_3xHxW)
+        points2d_3xN, idx_valid = cam.project_points3d(np.vstack((rays_3xHxW.reshape(3, -1) * 1e4,
+                                                                   np.ones(rays_3xHxW[0].size))))
+        cols = points2d_3xN[0].reshape(rays_3xHxW.shape[1:])
+        self.assertTrue(np.allclose(cols[0, 0:3], (1.5, 5.5, 9.5), atol=1e-2))  # Centers of 4x4 blocks
+
+        cam_fisheye = scl.CameraFisheye({'width_px': 1280, 'height_px': 1080, 'center_x': 0.0, 'center_y': 0.0,
+                                         'aspect_ratio': 1.0,
+                                         'lens_coeffs_1x4': [333.437012, 0.307729989, 2.4235599, 11.0495005]},
+                                        'CAM', '', '')
+        rays_3xHxW = cam_fisheye.get_pixel_rays3d(0.1)
+        valid = ~np.isnan(rays_3xHxW[0])
+        self.assertTrue(valid[54, 64])
+        self.assertFalse(valid[0, 0])  # Outside the image circle of the lens
+
+    def test_visibility_synthetic(self):
+        vcd, uids = create_scene()
+        scene = scl.Scene(vcd)
+
+        uids_rendered, depth, index, num_pixels = visibility.render_depth(scene, 'CAM', 0, scale=0.5)
+        self.assertEqual(depth.shape, (240, 320))
+        self.assertAlmostEqual(depth[120, 160], 9.0)
+        self.assertEqual(uids_rendered[index[120, 160]], str(uids['A']))
+        self.assertAlmostEqual(depth[0, 0], 30.0)
+
+        results = scene.compute_visibility('CAM', num_name='visibility', processes=1)
+        self.assertEqual([result.frame_num for result in results], [0, 1])
+        ratios = dict(zip(results[0].uids, results[0].ratios))
+        area_a = (2 * 500 / 9) ** 2
+        area_b = (4 * 500 / 18) ** 2  # Front face, its left half behind A
+        self.assertAlmostEqual(ratios[str(uids['A'])], 1.0)
+        self.assertAlmostEqual(ratios[str(uids['B'])], 1 - area_a / 2 / area_b, delta=0.02)
+        self.assertEqual(ratios[str(uids['C'])], 0.0)
+        self.assertEqual(ratios[str(uids['D'])], 0.0)
+        self.assertAlmostEqual(ratios[str(uids['wall'])], 1 - (area_a + area_b - area_a / 2) / (640 * 480),
+                               delta=0.01)
+
+        ratios = dict(zip(results[1].uids, results[1].ratios))
+        self.assertEqual(ratios[str(uids['A'])], 0.0)
+        self.assertAlmostEqual(ratios[str(uids['B'])], 1.0)
+
+        # Written into the VCD
+        self.assertEqual(vcd.get_object_data(uids['B'], 'visibility', 1)['val'], 1.0)
+        self.assertAlmostEqual(vcd.get_object_data(uids['B'], 'visibility', 0)['val'], results[0].ratios[1])
+
+        # Only some object_data
+        result = visibility.compute_frame_visibility(scene, 'CAM', 0, data_names=['box3D'])
+        self.assertNotIn(str(uids['wall']), result.uids)
+        self.assertIsNone(visibility.compute_frame_visibility(scene, 'CAM', 5))
+
+    def test_visibility_kitti(self):
+        vcd = core.OpenLABEL('./etc/' + openlabel_version_name + '_kitti_tracking_0003.json')
+        scene = scl.Scene(vcd)
+        results = scene.compute_visibility('CAM_LEFT', frame_nums=range(0, 20), data_names=['box3D'], processes=1)
+        self.assertEqual(len(results), 20)
+        for result in results:
+            self.assertTrue(np.all((result.ratios >= 0) & (result.ratios <= 1)))
+            self.assertTrue(np.all(result.num_visible <= result.num_pixels))
+
+        # Worker processes give the same result
+        results_pool = visibility.compute_visibility(scene, 'CAM_LEFT', frame_nums=range(0, 20),
+                                                     data_names=['box3D'], processes=2, chunksize=4)
+        for result, result_pool in zip(results, results_pool):
+            self.assertEqual(result.uids, result_pool.uids)
+            self.assertTrue(np.array_equal(result.ratios, result_pool.ratios))
+
+
+if __name__ == '__main__':  # This changes the command-line entry point to call unittest.main()
+    print("Running " + os.path.basename(__file__))
+    unittest.main()
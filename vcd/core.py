@@ -15,15 +15,20 @@ VCD is distributed under MIT License. See LICENSE.
 import copy
 import json
 import warnings
+import weakref
 from jsonschema import validate
 from enum import Enum
+from collections import OrderedDict
+from collections.abc import MutableMapping
 
 import re
 import uuid
+import numpy as np
 
 import vcd.types as types
 import vcd.utils as utils
 import vcd.schema as schema
+import vcd.spatial as spatial
 
 
 class TagType(Enum):
@@ -204,6 +209,97 @@ class FrameIntervals:
         return text
 
 
+class FrameStore(MutableMapping):
+    """
+    FrameStore is a compact alternative to the dictionary of frames (data['openlabel']['frames']).
+    Frames are kept in a list indexed by (frame_num - first frame), which for contiguous sequences
+    avoids the per-entry overhead of a dict keyed by int (hash slot, index and key object).
+    It behaves as a mapping {frame_num: frame_dict}, so existing callers need no changes.
+    Iteration follows ascending frame number. Gaps are allowed, and cost one empty slot per missing frame.
+    """
+    def __init__(self, frames=None):
+        self.__first = 0
+        self.__slots = []
+        self.__count = 0
+        if frames is not None:
+            # Pre-allocate the full range, so loading does not grow the list frame by frame
+            frame_nums = [int(key) for key in frames]
+            if frame_nums:
+                self.__first = min(frame_nums)
+                self.__slots = [None] * (max(frame_nums) - self.__first + 1)
+                for frame_num, frame in zip(frame_nums, frames.values()):
+                    self[frame_num] = frame
+
+    def __getitem__(self, frame_num):
+        idx = frame_num - self.__first
+        if 0 <= idx < len(self.__slots):
+            frame = self.__slots[idx]
+            if frame is not None:
+                return frame
+        raise KeyError(frame_num)
+
+    def __setitem__(self, frame_num, frame):
+        assert(frame is not None)
+        if not self.__slots:
+            self.__first = frame_num
+            self.__slots.append(None)
+        idx = frame_num - self.__first
+        if idx < 0:
+            self.__slots[0:0] = [None] * -idx
+            self.__first = frame_num
+            idx = 0
+        elif idx >= len(self.__slots):
+            self.__slots.extend([None] * (idx + 1 - len(self.__slots)))
+        if self.__slots[idx] is None:
+            self.__count += 1
+        self.__slots[idx] = frame
+
+    def __delitem__(self, frame_num):
+        idx = frame_num - self.__first
+        if not 0 <= idx < len(self.__slots) or self.__slots[idx] is None:
+            raise KeyError(frame_num)
+        self.__slots[idx] = None
+        self.__count -= 1
+
+        # Trim empty slots at both ends
+        if self.__count == 0:
+            self.__slots = []
+            self.__first = 0
+        else:
+            while self.__slots[-1] is None:
+                self.__slots.pop()
+            start = 0
+            while self.__slots[start] is None:
+                start += 1
+            if start > 0:
+                del self.__slots[0:start]
+                self.__first += start
+
+    def __contains__(self, frame_num):
+        idx = frame_num - self.__first
+        return 0 <= idx < len(self.__slots) and self.__slots[idx] is not None
+
+    def __iter__(self):
+        first = self.__first
+        for idx, frame in enumerate(self.__slots):
+            if frame is not None:
+                yield first + idx
+
+    def __len__(self):
+        return self.__count
+
+    def get(self, frame_num, default=None):
+        idx = frame_num - self.__first
+        if 0 <= idx < len(self.__slots):
+            frame = self.__slots[idx]
+            if frame is not None:
+                return frame
+        return default
+
+    def __repr__(self):
+        return "FrameStore(" + repr(dict(self.items())) + ")"
+
+
 class UID:
     """
     This is a helper class that simplifies management of UIDs.
@@ -257,6 +353,14 @@ class UID:
             return False
 
 
+class FrameChanges(set):
+    """
+    Set of the frame numbers whose element_data changed since it was created or cleared, filled by the VCD while
+    it is referenced (see VCD.track_frame_data_changes).
+    """
+    pass
+
+
 class SetMode(Enum):
     """
     The SetMode specifies how added content is inserted.
@@ -279,16 +383,33 @@ class VCD:
     add Elements, to get information and to remove data.
     Internally manages all information as Python dictionaries, and can map
     data into JSON strings.
+    If compact_frames is True, frames are stored in a FrameStore (list-indexed) instead of a dictionary.
+    If intern_strings is True, keys and short string values are interned when loading from file.
     """
     ##################################################
     # Constructor
     ##################################################
-    def __init__(self, file_name=None, validation=False):        
+    def __init__(self, file_name=None, validation=False, compact_frames=False, intern_strings=False):
         self.use_uuid = False
+        self.compact_frames = compact_frames
+        self.__coordinate_systems_version = 0  # Counts modifications, so caches (e.g. at scl.Scene) can be invalidated
+        self.__transforms_version = 0
+        self.__frame_data_version = 0  # Counts modifications of element_data at frames (any frame)
+        self.__static_data_version = 0  # Counts modifications of static element_data (any element)
+        self.__frame_data_changes = weakref.WeakValueDictionary()  # {id: FrameChanges} of the consumers
+        self.__spatial_indexes = OrderedDict()  # {frame_num: {key: spatial.FrameSpatialIndex}}, LRU
+        self.spatial_index_cache_size = 256
+        # Frames added to elements and to the VCD by interpolate_element_data, so rm_interpolated_element_data can
+        # remove them: {(element_type_name, uid_str, data_name): (frames added to the element, to the VCD)}
+        self.__interpolation_frames = dict()
         if file_name is not None:
             # Load from file
             json_file = open(file_name, encoding='utf-8')
-            read_data = json.load(json_file)  # Open without converting strings to integers
+            if intern_strings:
+                # Repeated keys and short values (names, types, coordinate systems...) share one string object
+                read_data = json.load(json_file, object_pairs_hook=utils.intern_object_pairs)
+            else:
+                read_data = json.load(json_file)  # Open without converting strings to integers
             
             # Check VERSION and call converters if needed
             if 'vcd' in read_data:
@@ -336,7 +457,7 @@ class VCD:
                             if 'frames' in self.data['openlabel']:
                                 frames = self.data['openlabel']['frames']
                                 if frames:  # So frames is not empty
-                                    self.data['openlabel']['frames'] = {int(key): value for key, value in frames.items()}
+                                    self.data['openlabel']['frames'] = self.__new_frames(frames)
                         else:
                             raise Exception("ERROR: This vcd file does not seem to be 4.3.0, 4.3.1 nor 4.2.0")
                     else:
@@ -358,7 +479,7 @@ class VCD:
                     if 'frames' in self.data['openlabel']:
                         frames = self.data['openlabel']['frames']
                         if frames:  # So frames is not empty
-                            self.data['openlabel']['frames'] = {int(key): value for key, value in frames.items()}
+                            self.data['openlabel']['frames'] = self.__new_frames(frames)
                 else:
                     Exception(
                         "ERROR: This OpenLABEL file has version different than 1.0.0. This API is incompatible.")                
@@ -377,6 +498,11 @@ class VCD:
         self.use_uuid = val
 
     def reset(self):
+        # Frames of the previous content, for the consumers of frame changes
+        frames_old = []
+        if len(self.__frame_data_changes) > 0 and hasattr(self, 'data'):
+            frames_old = list(self.data['openlabel'].get('frames', {}).keys())
+
         # Main VCD data
         self.data = {'openlabel': {}}
         self.data['openlabel']['metadata'] = {}
@@ -394,6 +520,16 @@ class VCD:
         self.__lastUID[ElementType.relation] = -1
         self.__lastUID[ElementType.tag] = -1
 
+        # Content-related records (see __init__)
+        self.__interpolation_frames.clear()
+
+        # Derived information of previous content
+        for frame_num in frames_old:
+            self.__touch_frame(frame_num)
+        self.__frame_data_version += 1
+        self.__static_data_version += 1
+        self.__spatial_indexes.clear()
+
     ##################################################
     # Private API: inner functions
     ##################################################
@@ -440,9 +576,38 @@ class VCD:
             fis_union = fis_current.union(frame_intervals)
             self.__set_vcd_frame_intervals(fis_union)
 
+    def __new_frames(self, frames=None):
+        # Creates the container of frames, converting frame numbers into int
+        if self.compact_frames:
+            return FrameStore(frames)
+        if frames is None:
+            return {}
+        return {int(key): value for key, value in frames.items()}
+
+    def __touch_frame(self, frame_num):
+        # Marks a change of the element_data at a frame, so derived information (e.g. spatial indexes) is rebuilt
+        self.__frame_data_version += 1
+        self.__spatial_indexes.pop(frame_num, None)
+        for changes in self.__frame_data_changes.values():
+            changes.add(frame_num)
+
+    def __touch_static(self, element):
+        # Marks a change of the static element_data of an element, which are part of the element_data of all the
+        # frames of the element (all the frames of the VCD if the element is static)
+        self.__static_data_version += 1
+        if len(self.__frame_data_changes) == 0:
+            return
+        if element.get('frame_intervals'):
+            fis = FrameIntervals(element['frame_intervals']).get()
+        else:
+            fis = self.get_frame_intervals().get()
+        for changes in self.__frame_data_changes.values():
+            for fi in fis:
+                changes.update(range(fi[0], fi[1] + 1))
+
     def __add_frame(self, frame_num):
         if 'frames' not in self.data['openlabel']:
-            self.data['openlabel']['frames'] = {}
+            self.data['openlabel']['frames'] = self.__new_frames()
         if frame_num not in self.data['openlabel']['frames']:
             self.data['openlabel']['frames'][frame_num] = {}
 
@@ -620,6 +785,7 @@ class VCD:
                                     elements_in_frame = self.data['openlabel']['frames'][f][element_type.name + 's']
                                     if uidstr in elements_in_frame:
                                         del elements_in_frame[uidstr]
+                                        self.__touch_frame(f)
                                         if len(elements_in_frame) == 0:
                                             del self.data['openlabel']['frames'][f][element_type.name + 's']
                                             if len(self.data['openlabel']['frames'][f]) == 0:
@@ -633,6 +799,7 @@ class VCD:
                             # Old frame not inside new ones -> let's remove this frame
                             elements_in_frame = self.data['openlabel']['frames'][f][element_type.name + 's']
                             del elements_in_frame[uidstr]
+                            self.__touch_frame(f)
                             if len(elements_in_frame) == 0:
                                 del self.data['openlabel']['frames'][f][element_type.name + 's']
                                 if len(self.data['openlabel']['frames'][f]) == 0:
@@ -656,6 +823,7 @@ class VCD:
                     for f in range(fi[0], fi[1] + 1):
                         elements_in_frame = self.data['openlabel']['frames'][f][element_type.name + 's']
                         del elements_in_frame[uidstr]
+                        self.__touch_frame(f)
                         # Clean-up
                         if len(elements_in_frame) == 0:
                             del self.data['openlabel']['frames'][f][element_type.name + 's']
@@ -713,6 +881,7 @@ class VCD:
                     if not fis_old.empty():
                         self.rm_element_data_from_frames_by_name(element_type, uid, element_data.data['name'], fis_old)
                 self.__set_element_data_content(element_type, element, element_data)
+                self.__touch_static(element)
             # Set the pointers
             self.__set_element_data_pointers(element_type, uid, element_data, frame_intervals)
         else:  # set_mode = SetMode.union
@@ -745,6 +914,7 @@ class VCD:
                 # This is only for mesh case that can have this static part
                 # (because it is an object data type which is both static and dynamic)
                 self.__set_element_data_content(element_type, element, element_data)
+                self.__touch_static(element)
 
     def __set_element_data_content_at_frames(self, element_type, uid, element_data, frame_intervals):
         # Loop over the specified frame_intervals to create or substitute the content
@@ -762,6 +932,7 @@ class VCD:
                 frame[element_type.name + 's'].setdefault(uid.as_str(), {})
                 element = frame[element_type.name + 's'][uid.as_str()]
                 self.__set_element_data_content(element_type, element, element_data)
+                self.__touch_frame(f)
 
     @staticmethod
     def __set_tag_data_content(tag, tag_data):
@@ -779,23 +950,28 @@ class VCD:
     def __set_element_data_content(element_type, element, element_data):
         # Adds the element_data to the corresponding container
         # If an element_data with same name exists, it is substituted
+        VCD.__set_element_data_content_dict(element_type, element, element_data.type.name, element_data.data)
+
+    @staticmethod
+    def __set_element_data_content_dict(element_type, element, data_type_name, data):
+        # Same as __set_element_data_content, but receiving the type name and the dict of the element_data
         element.setdefault(element_type.name + '_data', {})
-        element[element_type.name + '_data'].setdefault(element_data.type.name, [])
+        element[element_type.name + '_data'].setdefault(data_type_name, [])
 
         # Find if element_data already there
-        if 'name' in element_data.data:
-            list_aux = element[element_type.name + '_data'][element_data.type.name]
-            pos_list = [idx for idx, val in enumerate(list_aux) if val['name'] == element_data.data['name']]
+        if 'name' in data:
+            list_aux = element[element_type.name + '_data'][data_type_name]
+            pos_list = [idx for idx, val in enumerate(list_aux) if val['name'] == data['name']]
         else:
             pos_list = []
 
         if len(pos_list) == 0:
             # Not found, then just push this new element data
-            element[element_type.name + '_data'][element_data.type.name].append(element_data.data)
+            element[element_type.name + '_data'][data_type_name].append(data)
         else:
             # Found: let's substitute
             pos = pos_list[0]
-            element[element_type.name + '_data'][element_data.type.name][pos] = element_data.data
+            element[element_type.name + '_data'][data_type_name][pos] = data
 
     def __set_element_data_pointers(self, element_type, uid, element_data, frame_intervals):
         # For Tags, let's ignore element_data_pointers
@@ -819,6 +995,7 @@ class VCD:
 
     def __rm_frame(self, frame_num):
         # This function deletes a frame entry from frames, and updates VCD accordingly
+        self.__touch_frame(frame_num)
         if 'frames' in self.data['openlabel']:
             if frame_num in self.data['openlabel']['frames']:
                 del self.data['openlabel']['frames'][frame_num]
@@ -942,6 +1119,7 @@ class VCD:
         assert(isinstance(cs_type, types.CoordinateSystemType))
 
         # Create entry
+        self.__coordinate_systems_version += 1
         self.data['openlabel'].setdefault('coordinate_systems', {})
         self.data['openlabel']['coordinate_systems'][name] = {'type': cs_type.name,
                                                         'parent': parent_name,
@@ -967,10 +1145,12 @@ class VCD:
         assert(isinstance(frame_num, int))
         assert(isinstance(transform, types.Transform))
 
+        self.__transforms_version += 1
         self.__add_frame(frame_num)  # this function internally checks if the frame already exists
         self.data['openlabel']['frames'][frame_num].setdefault('frame_properties', dict())
         self.data['openlabel']['frames'][frame_num]['frame_properties'].setdefault('transforms', dict())
         self.data['openlabel']['frames'][frame_num]['frame_properties']['transforms'].update(transform.data)
+        self.__touch_frame(frame_num)  # element_data of this frame may be expressed through this transform
 
     def add_stream(self, stream_name, uri, description, stream_type):
         assert(isinstance(stream_name, str))
@@ -1084,14 +1264,23 @@ class VCD:
 
     def stringify(self, pretty=True, validate=True):
         if pretty:
-            stringified_vcd = json.dumps(self.data, indent=4, sort_keys=False, ensure_ascii=False)
+            stringified_vcd = json.dumps(self.data, indent=4, sort_keys=False, ensure_ascii=False,
+                                         default=self.__json_default)
 
         else:
-            stringified_vcd = json.dumps(self.data, separators=(',', ':'), sort_keys=False, ensure_ascii=False)
+            stringified_vcd = json.dumps(self.data, separators=(',', ':'), sort_keys=False, ensure_ascii=False,
+                                         default=self.__json_default)
         if validate:
             self.validate(stringified_vcd)
         return stringified_vcd
 
+    @staticmethod
+    def __json_default(obj):
+        # Containers not natively serializable by json (e.g. FrameStore) are written as dictionaries
+        if isinstance(obj, FrameStore):
+            return dict(obj.items())
+        raise TypeError("Object of type " + type(obj).__name__ + " is not JSON serializable")
+
     def stringify_frame(self, frame_num, dynamic_only=True, pretty=False):
         if frame_num not in self.data['openlabel']['frames']:
             warnings.warn("WARNING: Trying to stringify a non-existing frame.")
@@ -1296,6 +1485,168 @@ class VCD:
         return self.__set_element_data(element_type, UID(uid), element_data, FrameIntervals(frame_value),
                                        set_mode)
 
+    def add_element_data_series(self, element_type, uid, data_type, name, frames, values, coordinate_system=None,
+                                attributes=None):
+        """
+        Writes a whole track of a dynamic element_data in one call (the mirror of get_element_data_series).
+        :param element_type: ElementType of an existing element
+        :param uid: uid of the element
+        :param data_type: types.ObjectDataType of the element_data (e.g. bbox, cuboid, num)
+        :param name: name of the element_data (e.g. 'box2D')
+        :param frames: array [N] of unique frame numbers
+        :param values: array [N×k] with one row per frame (e.g. k=4 for bbox, 9 or 10 for cuboid), or [N] for num
+        :param coordinate_system: optional coordinate system of the element_data
+        :param attributes: optional dict {attribute_name: array [N]}, typed as boolean, num or text from the array
+        Existing element_data with the same name at these frames is substituted, as with SetMode.union.
+        """
+        assert(isinstance(data_type, types.ObjectDataType))
+        uid = UID(uid)
+        if not self.has(element_type, uid.as_str()):
+            warnings.warn("WARNING: Trying to set element_data for a non-existing element.")
+            return
+        if coordinate_system is not None and not self.has_coordinate_system(coordinate_system):
+            warnings.warn("WARNING: Trying to set element_data with a non-declared coordinate system.")
+            return
+
+        frames = np.asarray(frames, dtype=int)
+        values = np.asarray(values)
+        if data_type == types.ObjectDataType.num and values.ndim == 2:
+            values = values[:, 0]  # e.g. [N×1] as returned by get_element_data_series
+        assert(frames.ndim == 1 and values.shape[0] == frames.shape[0])
+        if frames.size == 0:
+            return
+        order = np.argsort(frames, kind='stable')
+        frames = frames[order]
+        if np.any(np.diff(frames) == 0):
+            warnings.warn("WARNING: Trying to set element_data series with repeated frames.")
+            return
+
+        # Attribute columns, typed by their dtype
+        attribute_columns = []
+        if attributes is not None:
+            for attr_name, column in attributes.items():
+                column = np.asarray(column)
+                assert(column.shape[0] == frames.shape[0])
+                if column.dtype.kind == 'b':
+                    attr_type = types.ObjectDataType.boolean.name
+                elif column.dtype.kind in 'iuf':
+                    attr_type = types.ObjectDataType.num.name
+                else:
+                    attr_type = types.ObjectDataType.text.name
+                attribute_columns.append((attr_name, attr_type, column[order].tolist()))
+
+        # Extend the element with these frames (creates frames if needed)
+        fis_new = FrameIntervals(utils.frame_intervals_from_frames(frames))
+        element = self.get_element(element_type, uid.as_str())
+        ont_uid = UID(element.get('ontology_uid'))
+        res_uid = None
+        if 'resource_uid' in element:
+            res_uid = ResourceUID(list(element['resource_uid'].keys())[0],
+                                  list(element['resource_uid'].values())[0])
+        self.__set_element(element_type, element.get('name'), element['type'], fis_new, uid, ont_uid,
+                           element.get('coordinate_system'), SetMode.union, res_uid)
+
+        # Content at frames
+        uid_str = uid.as_str()
+        vals = values[order].tolist()
+        frames_container = self.data['openlabel']['frames']
+        for i, frame_num in enumerate(frames.tolist()):
+            data = {'name': name}
+            if coordinate_system is not None:
+                data['coordinate_system'] = coordinate_system
+            data['val'] = vals[i]
+            if attribute_columns:
+                data['attributes'] = {}
+                for attr_name, attr_type, column in attribute_columns:
+                    data['attributes'].setdefault(attr_type, []).append({'name': attr_name, 'val': column[i]})
+            element_in_frame = frames_container[frame_num].setdefault(element_type.name + 's', {}).\
+                setdefault(uid_str, {})
+            self.__set_element_data_content_dict(element_type, element_in_frame, data_type.name, data)
+            self.__touch_frame(frame_num)
+
+        # Pointers
+        if element_type == ElementType.tag:
+            return
+        edps = element.setdefault(element_type.name + '_data_pointers', {})
+        fis_existing = FrameIntervals()
+        if name in edps:
+            fis_existing = FrameIntervals(edps[name]['frame_intervals'])
+        attributes_existing = edps.get(name, {}).get('attributes', {})
+        edps[name] = {'type': data_type.name, 'frame_intervals': fis_existing.union(fis_new).get_dict()}
+        if attribute_columns or attributes_existing:
+            edps[name]['attributes'] = attributes_existing
+            for attr_name, attr_type, _ in attribute_columns:
+                edps[name]['attributes'][attr_name] = attr_type
+
+    def add_object_data_series(self, uid, data_type, name, frames, values, coordinate_system=None, attributes=None):
+        return self.add_element_data_series(ElementType.object, uid, data_type, name, frames, values,
+                                            coordinate_system, attributes)
+
+    def interpolate_element_data(self, element_type, uid, data_name, frame_value=None):
+        """
+        Fills the frames where a dynamic element_data is missing with values interpolated from its keyframes,
+        in one batched write. Linear for bbox, rbbox, point2d, point3d and vec, slerp for the rotation of cuboids,
+        and hold-last for num, text and boolean.
+        Interpolated entries carry the boolean attribute 'interpolated', so rm_interpolated_element_data can remove
+        them and leave only the keyframes (see also get_element_data_interpolated, to interpolate on read).
+        :param frame_value: frames to fill (default: the frames of the element between the first and last keyframe,
+        or until the end of the element for hold-last types). Values are never extrapolated: frames before the first
+        keyframe are skipped, and also frames after the last one for all but hold-last types. Frames added to the
+        element or to the VCD are removed again by rm_interpolated_element_data.
+        """
+        if not self.has(element_type, uid):
+            warnings.warn("WARNING: Trying to interpolate element_data of a non-existing element.")
+            return
+        edp = self.get_element_data_pointer(element_type, uid, data_name)
+        if edp is None:
+            warnings.warn("WARNING: Trying to interpolate a non-existing element_data.")
+            return
+        frames_key, element_datas = self.__get_element_data_keyframes(element_type, UID(uid).as_str(), data_name)
+        if not frames_key:
+            return
+
+        if frame_value is None:
+            fis = self.get_element_frame_intervals(element_type, uid)
+            frame_end = frames_key[-1]
+            if edp['type'] in ('num', 'text', 'boolean') and not fis.empty():
+                frame_end = max(frame_end, fis.get_outer()['frame_end'])  # hold the last value until the end
+            fis = fis.intersection(FrameIntervals((frames_key[0], frame_end)))
+        else:
+            fis = FrameIntervals(frame_value)
+        frames = np.concatenate([np.arange(fi[0], fi[1] + 1) for fi in fis.get()] + [np.array([], dtype=int)])
+        frames = np.setdiff1d(frames, frames_key)
+        frames = frames[frames > frames_key[0]]
+        if edp['type'] not in ('num', 'text', 'boolean'):
+            frames = frames[frames < frames_key[-1]]
+        if frames.size == 0:
+            return
+
+        values = self.__interpolate_element_data_values(edp['type'], frames_key, element_datas, frames)
+        if values is None:
+            return
+        uid_str = UID(uid).as_str()
+        frames_new_element = frames[~self.__frames_in(frames, self.get_element_frame_intervals(element_type, uid_str))]
+        frames_new_vcd = frames[~self.__frames_in(frames, self.get_frame_intervals())]
+        self.add_element_data_series(element_type, uid, types.ObjectDataType[edp['type']], data_name, frames, values,
+                                     coordinate_system=element_datas[0].get('coordinate_system'),
+                                     attributes={'interpolated': np.ones(frames.size, dtype=bool)})
+        if frames_new_element.size > 0:
+            key = (element_type.name, uid_str, data_name)
+            frames_element, frames_vcd = self.__interpolation_frames.get(key, (frames[0:0], frames[0:0]))
+            self.__interpolation_frames[key] = (np.union1d(frames_element, frames_new_element),
+                                                np.union1d(frames_vcd, frames_new_vcd))
+
+    @staticmethod
+    def __frames_in(frames, frame_intervals):
+        # Boolean mask of the frames (array) contained in frame_intervals (FrameIntervals)
+        mask = np.zeros(frames.shape, dtype=bool)
+        for fi in frame_intervals.get():
+            mask |= (frames >= fi[0]) & (frames <= fi[1])
+        return mask
+
+    def interpolate_object_data(self, uid, data_name, frame_value=None):
+        return self.interpolate_element_data(ElementType.object, uid, data_name, frame_value)
+
     ##################################################
     # Get / Read
     ##################################################
@@ -1609,6 +1960,230 @@ class VCD:
     def get_context_data_frame_intervals(self, uid, data_name):
         return self.get_element_data_frame_intervals(ElementType.context, uid, data_name)
 
+    def __get_element_data_track(self, element_type, uid_str, data_name):
+        # Returns the frame numbers and the element_data dicts of a dynamic element_data, reading only the frames
+        # listed in its element_data_pointer
+        frame_nums = []
+        element_datas = []
+        element = self.data['openlabel'][element_type.name + 's'][uid_str]
+        edp = element.get(element_type.name + '_data_pointers', {}).get(data_name)
+        if edp is None:
+            return frame_nums, element_datas
+        frames = self.data['openlabel'].get('frames', {})
+        for fi in edp['frame_intervals']:
+            for frame_num in range(fi['frame_start'], fi['frame_end'] + 1):
+                frame = frames.get(frame_num)
+                if frame is None:
+                    continue
+                element_in_frame = frame.get(element_type.name + 's', {}).get(uid_str)
+                if element_in_frame is None:
+                    continue
+                for element_data in element_in_frame.get(element_type.name + '_data', {}).get(edp['type'], []):
+                    if element_data['name'] == data_name:
+                        frame_nums.append(frame_num)
+                        element_datas.append(element_data)
+                        break
+        return frame_nums, element_datas
+
+    @staticmethod
+    def __as_values_array(element_datas):
+        # Stacks the 'val' of a list of element_data into a float array [N×k], or returns None if not numeric
+        try:
+            values = np.array([element_data['val'] for element_data in element_datas], dtype=float)
+        except (ValueError, TypeError):
+            warnings.warn("WARNING: element_data values are not numeric or have different lengths.")
+            return None
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)  # e.g. num or boolean
+        return values
+
+    def get_element_data_series(self, element_type, uid, data_name):
+        """
+        Returns the time series of a dynamic element_data (e.g. the bbox trajectory of an object) as arrays:
+        frames (int ndarray [N]) and values (float ndarray [N×k]), e.g. k=4 for bbox.
+        Only frames listed in the element_data_pointer are visited. Static element_data yields empty arrays.
+        Returns None if the element does not exist or the values are not numeric (e.g. text).
+        """
+        if not self.has(element_type, uid):
+            warnings.warn("WARNING: Asking element data from a non-existing Element.")
+            return None
+        frame_nums, element_datas = self.__get_element_data_track(element_type, UID(uid).as_str(), data_name)
+        if not element_datas:
+            return np.array([], dtype=int), np.empty((0, 0))
+        values = self.__as_values_array(element_datas)
+        if values is None:
+            return None
+        return np.array(frame_nums, dtype=int), values
+
+    def get_object_data_series(self, uid, data_name):
+        return self.get_element_data_series(ElementType.object, uid, data_name)
+
+    def get_action_data_series(self, uid, data_name):
+        return self.get_element_data_series(ElementType.action, uid, data_name)
+
+    def get_event_data_series(self, uid, data_name):
+        return self.get_element_data_series(ElementType.event, uid, data_name)
+
+    def get_context_data_series(self, uid, data_name):
+        return self.get_element_data_series(ElementType.context, uid, data_name)
+
+    def get_element_data_series_by_type(self, element_type, semantic_type, data_name):
+        """
+        Returns the time series of one element_data for all elements of a semantic type, as a ragged table:
+        uids (list [M]), offsets (int ndarray [M+1]), frames (int ndarray [T]) and values (float ndarray [T×k]).
+        Rows offsets[i]:offsets[i+1] of frames and values belong to uids[i].
+        Elements without this element_data are skipped.
+        """
+        uids = []
+        offsets = [0]
+        frame_nums = []
+        element_datas = []
+        for uid_str in self.get_elements_of_type(element_type, semantic_type):
+            frame_nums_uid, element_datas_uid = self.__get_element_data_track(element_type, uid_str, data_name)
+            if not element_datas_uid:
+                continue
+            uids.append(uid_str)
+            frame_nums.extend(frame_nums_uid)
+            element_datas.extend(element_datas_uid)
+            offsets.append(len(frame_nums))
+        if not element_datas:
+            return uids, np.array(offsets, dtype=int), np.array([], dtype=int), np.empty((0, 0))
+        values = self.__as_values_array(element_datas)
+        if values is None:
+            return None
+        return uids, np.array(offsets, dtype=int), np.array(frame_nums, dtype=int), values
+
+    def get_object_data_series_by_type(self, semantic_type, data_name):
+        return self.get_element_data_series_by_type(ElementType.object, semantic_type, data_name)
+
+    @staticmethod
+    def __find_element_data(element, element_type, data_name):
+        for val_array in element.get(element_type.name + '_data', {}).values():
+            for element_data in val_array:
+                if element_data['name'] == data_name:
+                    return element_data
+        return None
+
+    def get_element_datas_at_frame(self, element_type, frame_num, data_name, semantic_type=None):
+        """
+        Returns one element_data of all the elements at a frame as lists: uids [N] and element_data dicts [N] (e.g. to
+        read their attributes or coordinate_system). Only elements of semantic_type are returned, if given.
+        As in get_element_data, static element_data is used for elements in the frame without frame-specific one.
+        """
+        uids = []
+        element_datas = []
+        frame = self.get_frame(frame_num)
+        if frame is None:
+            return uids, element_datas
+        elements = self.data['openlabel'].get(element_type.name + 's', {})
+        for uid_str, element_in_frame in frame.get(element_type.name + 's', {}).items():
+            element = elements.get(uid_str)
+            if element is None:
+                continue
+            if semantic_type is not None and element['type'] != semantic_type:
+                continue
+            element_data = self.__find_element_data(element_in_frame, element_type, data_name)
+            if element_data is None:
+                element_data = self.__find_element_data(element, element_type, data_name)
+            if element_data is None:
+                continue
+            uids.append(uid_str)
+            element_datas.append(element_data)
+        return uids, element_datas
+
+    def get_element_data_at_frame(self, element_type, frame_num, data_name, semantic_type=None):
+        """
+        Returns one element_data of all the elements at a frame (e.g. all the bboxes to compute overlaps) as arrays:
+        uids (list [N]) and values (float ndarray [N×k]). Only elements of semantic_type are returned, if given.
+        As in get_element_data, static element_data is used for elements in the frame without frame-specific one.
+        Returns None if the values are not numeric (e.g. text).
+        """
+        uids, element_datas = self.get_element_datas_at_frame(element_type, frame_num, data_name, semantic_type)
+        if not element_datas:
+            return uids, np.empty((0, 0))
+        values = self.__as_values_array(element_datas)
+        if values is None:
+            return None
+        return uids, values
+
+    def get_object_data_at_frame(self, frame_num, data_name, semantic_type=None):
+        return self.get_element_data_at_frame(ElementType.object, frame_num, data_name, semantic_type)
+
+    def get_object_datas_at_frame(self, frame_num, data_name, semantic_type=None):
+        return self.get_element_datas_at_frame(ElementType.object, frame_num, data_name, semantic_type)
+
+    @staticmethod
+    def __is_interpolated(element_data):
+        for attr in element_data.get('attributes', {}).get('boolean', []):
+            if attr['name'] == 'interpolated':
+                return attr['val']
+        return False
+
+    def __get_element_data_keyframes(self, element_type, uid_str, data_name):
+        # Same as __get_element_data_track, but skipping interpolated entries
+        frame_nums, element_datas = self.__get_element_data_track(element_type, uid_str, data_name)
+        keep = [i for i, element_data in enumerate(element_datas) if not self.__is_interpolated(element_data)]
+        return [frame_nums[i] for i in keep], [element_datas[i] for i in keep]
+
+    @staticmethod
+    def __interpolate_element_data_values(data_type_name, frames_key, element_datas, frames):
+        # Returns the values at frames interpolated from keyframes, as an array with one row per frame
+        if data_type_name in ('num', 'text', 'boolean'):
+            idx = utils.interpolate_hold(frames_key, frames)
+            return np.array([element_datas[i]['val'] for i in idx.tolist()], dtype=object)
+        if data_type_name not in ('bbox', 'rbbox', 'point2d', 'point3d', 'vec', 'cuboid'):
+            warnings.warn("WARNING: Interpolation of " + data_type_name + " is not supported.")
+            return None
+        try:
+            values_key = np.array([element_data['val'] for element_data in element_datas], dtype=float)
+        except (ValueError, TypeError):
+            warnings.warn("WARNING: element_data values are not numeric or have different lengths.")
+            return None
+
+        if data_type_name == 'rbbox':
+            # Rotation (last value) is interpolated through the shortest angle
+            values_key[:, 4] = np.unwrap(values_key[:, 4])
+            return utils.interpolate_linear(frames_key, values_key, frames)
+        elif data_type_name == 'cuboid':
+            # Location and size are linearly interpolated, rotation is interpolated with slerp
+            values = utils.interpolate_linear(frames_key, values_key, frames)
+            if values_key.shape[1] == 10:
+                q_key = values_key[:, 3:7] / np.linalg.norm(values_key[:, 3:7], axis=1, keepdims=True)
+                values[:, 3:7] = utils.interpolate_slerp(frames_key, q_key, frames)
+            else:
+                R_key = utils.euler2R_batch(values_key[:, [5, 4, 3]])  # (rz, ry, rx)
+                q = utils.interpolate_slerp(frames_key, utils.R2q_batch(R_key), frames)
+                values[:, 3:6] = utils.R2rvec_batch(utils.q2R_batch(q))
+            return values
+        return utils.interpolate_linear(frames_key, values_key, frames)
+
+    def get_element_data_interpolated(self, element_type, uid, data_name, frame_value):
+        """
+        Returns (frames, values) of a dynamic element_data at the frames of frame_value, interpolated on read from
+        its keyframes (see interpolate_element_data). Nothing is written into the VCD.
+        Values are a float ndarray [N×k], or a list for text.
+        """
+        if not self.has(element_type, uid):
+            warnings.warn("WARNING: Asking element data from a non-existing Element.")
+            return None
+        edp = self.get_element_data_pointer(element_type, uid, data_name)
+        if edp is None:
+            return None
+        frames_key, element_datas = self.__get_element_data_keyframes(element_type, UID(uid).as_str(), data_name)
+        if not frames_key:
+            return None
+        fis = FrameIntervals(frame_value)
+        frames = np.concatenate([np.arange(fi[0], fi[1] + 1) for fi in fis.get()] + [np.array([], dtype=int)])
+        values = self.__interpolate_element_data_values(edp['type'], frames_key, element_datas, frames)
+        if values is None:
+            return None
+        if edp['type'] == 'text':
+            return frames, values.tolist()
+        return frames, np.array(values, dtype=float).reshape(frames.size, -1)
+
+    def get_object_data_interpolated(self, uid, data_name, frame_value):
+        return self.get_element_data_interpolated(ElementType.object, uid, data_name, frame_value)
+
     def get_num_elements(self, element_type):
         if self.has_elements(element_type):
             return len(self.data['openlabel'][element_type.name + 's'])
@@ -1663,6 +2238,59 @@ class VCD:
                 return True
         return False
 
+    def get_coordinate_systems_version(self):
+        # Number of calls to add_coordinate_system, useful to know if derived information needs to be recomputed
+        return self.__coordinate_systems_version
+
+    def get_transforms_version(self):
+        # Number of calls to add_transform, useful to know if derived information needs to be recomputed
+        return self.__transforms_version
+
+    def get_frame_data_version(self):
+        # Number of modifications of element_data at frames (any frame), useful to know if derived information needs
+        # to be recomputed (see track_frame_data_changes to know which frames). Note in-place changes to dicts
+        # returned by getters are not counted
+        return self.__frame_data_version
+
+    def get_static_data_version(self):
+        # Number of modifications of static element_data (any element), which are also part of the element_data of
+        # the frames of their elements
+        return self.__static_data_version
+
+    def track_frame_data_changes(self):
+        """
+        Returns a FrameChanges set, which receives the frame numbers whose element_data changes from now on (for
+        static element_data, all the frames of the element), until the set is no longer referenced. The consumer
+        clears it after reading it (e.g. spatial.SceneIndex3D, to rebuild only the frames that changed).
+        :return: FrameChanges
+        """
+        changes = FrameChanges()
+        self.__frame_data_changes[id(changes)] = changes
+        return changes
+
+    def get_frame_spatial_index(self, frame_num, element_type=ElementType.object, data_names=None,
+                                coordinate_system=None):
+        """
+        Returns a spatial.FrameSpatialIndex over the extents of the bbox, rbbox and poly2d element_data at a frame,
+        to query which elements contain points or intersect rectangles (e.g. index.query_point(x, y)).
+        Indexes are built on first use and kept (for the last spatial_index_cache_size frames) until the
+        element_data of the frame changes.
+        :param data_names: optional list of element_data names to index (e.g. ['box2D_left'])
+        :param coordinate_system: optional, to index only element_data of this coordinate system
+        :return: spatial.FrameSpatialIndex, or None if the frame does not exist
+        """
+        frame = self.get_frame(frame_num)
+        if frame is None:
+            return None
+        key = (element_type.name, tuple(data_names) if data_names is not None else None, coordinate_system)
+        cached = self.__spatial_indexes.setdefault(frame_num, {})  # removed when the frame changes (__touch_frame)
+        self.__spatial_indexes.move_to_end(frame_num)
+        while len(self.__spatial_indexes) > self.spatial_index_cache_size:
+            self.__spatial_indexes.popitem(last=False)
+        if key not in cached:
+            cached[key] = spatial.FrameSpatialIndex.from_frame(frame, element_type.name, data_names, coordinate_system)
+        return cached[key]
+
     def get_coordinate_systems(self):
         if 'coordinate_systems' in self.data['openlabel']:
             return copy.deepcopy(self.data['openlabel']['coordinate_systems'])
@@ -1771,6 +2399,7 @@ class VCD:
                     elements_in_frame = self.data['openlabel']['frames'][frame_num][element_type.name + 's']
                     if uid in elements_in_frame:
                         del elements_in_frame[uid_str]
+                        self.__touch_frame(frame_num)
                     if len(elements_in_frame) == 0:  # objects might have end up empty TODO: test this
                         del self.data['openlabel']['frames'][frame_num][element_type.name + 's']
                         if len(self.data['openlabel']['frames'][frame_num]) == 0:  # this frame may have ended up being empty
@@ -1778,6 +2407,9 @@ class VCD:
                             self.__rm_frame(frame_num)
 
         # Delete this element from summary
+        self.__touch_static(element)
+        for key in [key for key in self.__interpolation_frames if key[0:2] == (element_type.name, uid_str)]:
+            del self.__interpolation_frames[key]
         del elements[uid_str]
         if len(elements) == 0:
             del self.data['openlabel'][element_type.name + 's']
@@ -1820,6 +2452,7 @@ class VCD:
                 for f in range(fi[0], fi[1] + 1):
                     frame = self.data['openlabel']['frames'][f]
                     element = frame[element_type.name + 's'][uid.as_str()]
+                    self.__touch_frame(f)
                     # Delete only the element_data with the specified name
                     for prop in list(element[element_type.name + '_data']): # using list() here to make a copy of the keys, because there is a delete inside the loop
                         val_array = element[element_type.name + '_data'][prop]
@@ -1849,6 +2482,58 @@ class VCD:
                 fis_ed_new = temp
                 element[element_type.name + '_data_pointers'][element_data_name]['frame_intervals'] = fis_ed_new.get_dict()
 
+    def rm_interpolated_element_data(self, element_type, uid, data_name):
+        # Removes the entries written by interpolate_element_data, leaving only the keyframes
+        if not self.has(element_type, uid):
+            return
+        uid_str = UID(uid).as_str()
+        frame_nums, element_datas = self.__get_element_data_track(element_type, uid_str, data_name)
+        if not frame_nums:
+            return
+        edp = self.get_element_data_pointer(element_type, uid_str, data_name)
+        frames_keep = []
+        for frame_num, element_data in zip(frame_nums, element_datas):
+            if not self.__is_interpolated(element_data):
+                frames_keep.append(frame_num)
+                continue
+            element = self.data['openlabel']['frames'][frame_num][element_type.name + 's'][uid_str]
+            element_data_list = element[element_type.name + '_data'][edp['type']]
+            element_data_list.remove(element_data)
+            self.__touch_frame(frame_num)
+            if not element_data_list:
+                del element[element_type.name + '_data'][edp['type']]
+                if not element[element_type.name + '_data']:
+                    del element[element_type.name + '_data']
+
+        element = self.get_element(element_type, uid_str)
+        if not frames_keep:
+            del element[element_type.name + '_data_pointers'][data_name]
+        else:
+            edp['frame_intervals'] = utils.frame_intervals_from_frames(frames_keep)
+            if 'attributes' in edp:
+                edp['attributes'].pop('interpolated', None)
+                if not edp['attributes']:
+                    del edp['attributes']
+
+        # Frames where only the interpolation put the element (or anything in the VCD)
+        frames_element, frames_vcd = self.__interpolation_frames.pop((element_type.name, uid_str, data_name),
+                                                                     ([], []))
+        frames = self.data['openlabel'].get('frames', {})
+        for frame_num in frames_element:
+            frame = frames.get(int(frame_num))
+            if frame is None or frame.get(element_type.name + 's', {}).get(uid_str) != {}:
+                continue  # other content was added since
+            del frame[element_type.name + 's'][uid_str]
+            if not frame[element_type.name + 's']:
+                del frame[element_type.name + 's']
+            element['frame_intervals'] = utils.rm_frame_from_frame_intervals(element['frame_intervals'], int(frame_num))
+        for frame_num in frames_vcd:
+            if int(frame_num) in frames and not frames[int(frame_num)]:
+                self.__rm_frame(int(frame_num))
+
+    def rm_interpolated_object_data(self, uid, data_name):
+        self.rm_interpolated_element_data(ElementType.object, uid, data_name)
+
     def rm_element_data_from_frames(self, element_type, uid, frame_intervals):
         if not isinstance(uid, UID):
             uid = UID(uid)
@@ -1864,6 +2549,7 @@ class VCD:
                             if element_type.name + '_data' in element:
                                 # Delete all its former dyamic element_data entries at old fis
                                 del element[element_type.name + '_data']
+                                self.__touch_frame(f)
 
         # Clean-up data pointers of object_data that no longer exist!
         # Note, element_data_pointers are correctly updated, but there might be some now declared as static
@@ -1895,8 +2581,8 @@ class OpenLABEL(VCD):
     """
     This is the OpenLABEL class, which inherites from VCD class.
     """
-    def __init__(self, file_name=None, validation=False):
-        VCD.__init__(self, file_name, validation)
+    def __init__(self, file_name=None, validation=False, compact_frames=False, intern_strings=False):
+        VCD.__init__(self, file_name, validation, compact_frames, intern_strings)
 
 
 class ConverterVCD420toOpenLabel100:
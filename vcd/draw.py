@@ -208,7 +208,8 @@ class TopView:
         as dictionary: {"CAM_FRONT": img_front, "CAM_REAR": img_rear}
 
         The function pre-computes all the necessary variables to create the TopView, such as the homography from
-        image plane to world plane, or the camera region of interest, which is stored in scene.cameras dictionary
+        image plane to world plane, or the camera region of interest (cached by the scene per camera pose, see
+        scl.Scene.camera_roi_z0)
         :param imgs: dictionary of images
         :param frameNum: frame number
         :return: nothing
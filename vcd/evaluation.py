@@ -0,0 +1,345 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import multiprocessing
+import os
+import warnings
+import numpy as np
+from collections import namedtuple
+
+import vcd.overlap as overlap
+import vcd.scl as scl
+
+# Frame-by-frame evaluation of a prediction VCD against a ground-truth VCD (e.g. KITTI tracking files produced by
+# converters/kittiConverter), for one element_data of the objects (e.g. 'box2D_left' or 'box3D').
+# Each frame is matched independently (evaluate_frame), possibly in worker processes, and the per-frame results
+# are streamed into an Evaluation accumulator, which only keeps score histograms and counters, so memory does not
+# grow with the number of frames.
+# Objects are matched only with objects of the same semantic type (class).
+# Cuboids are compared in one coordinate system with z pointing up (e.g. 'vehicle-iso8855'), where both VCDs are
+# transformed (e.g. KITTI 'box3D' are in CAM_LEFT, with y pointing down), see overlap.iou_cuboid_bev.
+
+# Per frame and class:
+#   num_gt, scores and tp (per prediction, from a greedy matching in descending score order)
+#   gt_uids, pred_uids and the candidate pairs (pairs_gt, pairs_pred, pairs_iou) with IoU >= threshold, used to
+#   match tracks sequentially in Evaluation.add_frame
+FrameClassResult = namedtuple('FrameClassResult',
+                              ['num_gt', 'scores', 'tp', 'gt_uids', 'pred_uids', 'pairs_gt', 'pairs_pred',
+                               'pairs_iou'])
+FrameResult = namedtuple('FrameResult', ['frame_num', 'classes'])
+
+
+def get_element_data_type_name(vcd, data_name):
+    # Type name (e.g. 'bbox') of an object_data, from the object_data_pointers, or None if not found
+    for element in vcd.data['openlabel'].get('objects', {}).values():
+        edp = element.get('object_data_pointers', {}).get(data_name)
+        if edp is not None:
+            return edp['type']
+    return None
+
+
+def _get_frame_objects(vcd, frame_num, data_name, score_name):
+    # uids, semantic types, values (N×k), scores and object_data dicts of the objects with data_name at a frame
+    uids, object_datas = vcd.get_object_datas_at_frame(frame_num, data_name)
+    try:
+        values = np.array([object_data['val'] for object_data in object_datas], dtype=float)
+    except (ValueError, TypeError):
+        warnings.warn("WARNING: object_data values are not numeric or have different lengths.")
+        return None
+    if values.size == 0:
+        values = np.empty((0, 0))
+    objects = vcd.data['openlabel'].get('objects', {})
+    types = np.array([objects[uid]['type'] for uid in uids], dtype=object)
+    scores = np.ones(len(uids))
+    if score_name is not None:
+        for i, object_data in enumerate(object_datas):
+            for attribute in object_data.get('attributes', {}).get('num', []):
+                if attribute['name'] == score_name:
+                    scores[i] = attribute['val']
+                    break
+    return uids, types, values, scores, object_datas
+
+
+def _transform_cuboids(scene, frame_num, uids, values, object_datas, cs):
+    # Cuboids (values N×k) expressed in cs, grouped by their coordinate system: the one of the object_data, or of
+    # the object, or cs if none
+    objects = scene.vcd.data['openlabel'].get('objects', {})
+    cs_srcs = [object_data.get('coordinate_system') or objects[uid].get('coordinate_system') or cs
+               for uid, object_data in zip(uids, object_datas)]
+    values = values.copy()
+    for cs_src in set(cs_srcs):
+        if cs_src == cs:
+            continue
+        idx = [i for i, cs_i in enumerate(cs_srcs) if cs_i == cs_src]
+        values[idx] = scene.transform_cuboids(values[idx], cs_src, cs, frame_num)
+    return values
+
+
+def _match_greedy(iou_GxP, scores_P, iou_threshold):
+    # Greedy matching: predictions in descending score order take the free ground-truth object with highest IoU
+    gt_taken = np.zeros(iou_GxP.shape[0], dtype=bool)
+    tp = np.zeros(iou_GxP.shape[1], dtype=bool)
+    if iou_GxP.shape[0] == 0:
+        return tp
+    for p in np.argsort(-scores_P, kind='stable').tolist():
+        ious = np.where(gt_taken, -1.0, iou_GxP[:, p])
+        g = int(np.argmax(ious))
+        if ious[g] >= iou_threshold:
+            gt_taken[g] = True
+            tp[p] = True
+    return tp
+
+
+def evaluate_frame(vcd_gt, vcd_pred, frame_num, data_name, data_type_name, iou_threshold=0.5, data_name_pred=None,
+                   score_name=None, classes=None, bev=False, cs=None, scene_gt=None, scene_pred=None):
+    """
+    Matches the objects of a frame of two VCDs.
+    :param vcd_gt: ground-truth VCD
+    :param vcd_pred: prediction VCD
+    :param frame_num: frame number
+    :param data_name: name of the object_data to compare (e.g. 'box2D_left')
+    :param data_type_name: 'bbox', 'rbbox' or 'cuboid'
+    :param iou_threshold: minimum IoU of a match
+    :param data_name_pred: name of the object_data in vcd_pred, if different from data_name
+    :param score_name: name of the num attribute of the predicted object_data with the score (1.0 if None)
+    :param classes: list of semantic types to evaluate (all if None)
+    :param bev: for cuboids, use the bird's-eye-view IoU instead of the 3D IoU
+    :param cs: for cuboids (required), coordinate system with z pointing up where they are compared
+    :param scene_gt: scl.Scene of vcd_gt, to transform cuboids into cs (created if None)
+    :param scene_pred: scl.Scene of vcd_pred (created if None)
+    :return: FrameResult, with a FrameClassResult per class present in the frame
+    """
+    if data_type_name == 'cuboid' and cs is None:
+        warnings.warn("WARNING: cuboids can only be compared in a coordinate system with z pointing up (cs).")
+        return None
+    gt = _get_frame_objects(vcd_gt, frame_num, data_name, None)
+    pred = _get_frame_objects(vcd_pred, frame_num, data_name_pred or data_name, score_name)
+    if gt is None or pred is None:
+        return None
+    gt_uids, gt_types, gt_values, _, gt_object_datas = gt
+    pred_uids, pred_types, pred_values, pred_scores, pred_object_datas = pred
+    if data_type_name == 'cuboid':
+        gt_values = _transform_cuboids(scene_gt or scl.Scene(vcd_gt), frame_num, gt_uids, gt_values,
+                                       gt_object_datas, cs)
+        pred_values = _transform_cuboids(scene_pred or scl.Scene(vcd_pred), frame_num, pred_uids, pred_values,
+                                         pred_object_datas, cs)
+
+    class_names = set(gt_types.tolist()) | set(pred_types.tolist())
+    if classes is not None:
+        class_names &= set(classes)
+
+    results = {}
+    for class_name in sorted(class_names):
+        idx_gt = np.flatnonzero(gt_types == class_name)
+        idx_pred = np.flatnonzero(pred_types == class_name)
+        iou_GxP = overlap.iou(gt_values[idx_gt], pred_values[idx_pred], data_type_name, bev=bev)
+        scores = pred_scores[idx_pred]
+        tp = _match_greedy(iou_GxP, scores, iou_threshold)
+        pairs_gt, pairs_pred = np.nonzero(iou_GxP >= iou_threshold)
+        results[class_name] = FrameClassResult(len(idx_gt), scores, tp,
+                                               [gt_uids[i] for i in idx_gt.tolist()],
+                                               [pred_uids[i] for i in idx_pred.tolist()],
+                                               pairs_gt, pairs_pred, iou_GxP[pairs_gt, pairs_pred])
+    return FrameResult(frame_num, results)
+
+
+# Per worker process: (vcd_gt, vcd_pred, kwargs of evaluate_frame)
+_worker_args = None
+
+
+def _init_worker(vcd_gt, vcd_pred, kwargs):
+    global _worker_args
+    _worker_args = (vcd_gt, vcd_pred, kwargs)
+
+
+def _evaluate_frame_worker(frame_num):
+    vcd_gt, vcd_pred, kwargs = _worker_args
+    return evaluate_frame(vcd_gt, vcd_pred, frame_num, **kwargs)
+
+
+def _get_frame_nums(vcd_gt, vcd_pred):
+    # Frame numbers of both VCDs, in ascending order
+    fis = vcd_gt.get_frame_intervals().union(vcd_pred.get_frame_intervals()).get()
+    for frame_start, frame_end in sorted(fis):
+        for frame_num in range(frame_start, frame_end + 1):
+            yield frame_num
+
+
+def evaluate_frames(vcd_gt, vcd_pred, data_name, iou_threshold=0.5, data_name_pred=None, score_name=None,
+                    classes=None, bev=False, cs=None, processes=1, chunksize=64):
+    """
+    Generator of the FrameResult of all frames of two VCDs, in ascending frame order (see evaluate_frame).
+    With processes > 1, frames are matched in a pool of worker processes, which receive both VCDs once, and results
+    are yielded as they arrive (at most a few chunks of frames are kept in memory).
+    Cuboids are transformed into cs (e.g. 'vehicle-iso8855'), with one scl.Scene per VCD, created once.
+    :param processes: number of worker processes (os.cpu_count() if None); 1 (default) evaluates in this process
+    :param chunksize: number of frames sent to a worker at a time
+    """
+    data_type_name = get_element_data_type_name(vcd_gt, data_name)
+    if data_type_name is None:
+        warnings.warn("WARNING: the ground-truth VCD has no object_data named " + data_name)
+        return
+    if data_type_name == 'cuboid' and cs is None:
+        warnings.warn("WARNING: cuboids can only be compared in a coordinate system with z pointing up (cs).")
+        return
+    kwargs = {'data_name': data_name, 'data_type_name': data_type_name, 'iou_threshold': iou_threshold,
+              'data_name_pred': data_name_pred, 'score_name': score_name, 'classes': classes, 'bev': bev, 'cs': cs}
+    if data_type_name == 'cuboid':
+        kwargs['scene_gt'] = scl.Scene(vcd_gt)
+        kwargs['scene_pred'] = kwargs['scene_gt'] if vcd_pred is vcd_gt else scl.Scene(vcd_pred)
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    frame_nums = _get_frame_nums(vcd_gt, vcd_pred)
+    if processes <= 1:
+        for frame_num in frame_nums:
+            yield evaluate_frame(vcd_gt, vcd_pred, frame_num, **kwargs)
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(vcd_gt, vcd_pred, kwargs)) as pool:
+            for frame_result in pool.imap(_evaluate_frame_worker, frame_nums, chunksize):
+                yield frame_result
+
+
+class Evaluation:
+    """
+    Accumulator of FrameResult (see evaluate_frames), which computes:
+    - Detection metrics: precision, recall and average precision (AP), from histograms of the scores of true and
+      false positives, with num_bins bins in [0, 1] (scores are clipped to this range).
+    - Tracking metrics (CLEAR MOT): MOTA, MOTP (mean IoU of matches) and ID switches. Frames must be added in
+      ascending order: each ground-truth object keeps its previous match if their IoU is over the threshold, and
+      the rest are matched greedily by IoU. All predictions are used, regardless of their score.
+    Metrics are computed per class, or for all classes together if semantic_type is None.
+    """
+    def __init__(self, num_bins=1000):
+        self.num_bins = num_bins
+        self.num_frames = 0
+        self.__classes = {}
+
+    def __get_class(self, class_name):
+        if class_name not in self.__classes:
+            self.__classes[class_name] = {
+                'hist_tp': np.zeros(self.num_bins, dtype=np.int64),
+                'hist_fp': np.zeros(self.num_bins, dtype=np.int64),
+                'num_gt': 0, 'num_matches': 0, 'sum_iou': 0.0, 'fp': 0, 'fn': 0, 'id_switches': 0,
+                'last_match': {}
+            }
+        return self.__classes[class_name]
+
+    def get_classes(self):
+        return sorted(self.__classes.keys())
+
+    def add_frame(self, frame_result):
+        if frame_result is None:
+            return
+        self.num_frames += 1
+        for class_name, result in frame_result.classes.items():
+            acc = self.__get_class(class_name)
+            acc['num_gt'] += result.num_gt
+
+            # Detection
+            bins = np.clip((np.asarray(result.scores) * self.num_bins).astype(int), 0, self.num_bins - 1)
+            acc['hist_tp'] += np.bincount(bins[result.tp], minlength=self.num_bins)
+            acc['hist_fp'] += np.bincount(bins[~result.tp], minlength=self.num_bins)
+
+            # Tracking
+            last_match = acc['last_match']
+            order = np.argsort(-result.pairs_iou, kind='stable').tolist()
+            gt_matched = set()
+            pred_matched = set()
+            num_matches = 0
+            for keep_previous in (True, False):
+                for k in order:
+                    g = int(result.pairs_gt[k])
+                    p = int(result.pairs_pred[k])
+                    if g in gt_matched or p in pred_matched:
+                        continue
+                    gt_uid = result.gt_uids[g]
+                    pred_uid = result.pred_uids[p]
+                    previous = last_match.get(gt_uid)
+                    if keep_previous and previous != pred_uid:
+                        continue
+                    if previous is not None and previous != pred_uid:
+                        acc['id_switches'] += 1
+                    last_match[gt_uid] = pred_uid
+                    gt_matched.add(g)
+                    pred_matched.add(p)
+                    num_matches += 1
+                    acc['sum_iou'] += float(result.pairs_iou[k])
+            acc['num_matches'] += num_matches
+            acc['fn'] += result.num_gt - num_matches
+            acc['fp'] += len(result.pred_uids) - num_matches
+
+    def __get_accumulators(self, semantic_type):
+        if semantic_type is not None:
+            return [self.__classes[semantic_type]] if semantic_type in self.__classes else []
+        return list(self.__classes.values())
+
+    def get_pr_curve(self, semantic_type=None):
+        """
+        Precision-recall curve, for score thresholds from 1 down to 0 (one per histogram bin)
+        :return: thresholds, precision, recall (arrays of num_bins)
+        """
+        accs = self.__get_accumulators(semantic_type)
+        hist_tp = sum((acc['hist_tp'] for acc in accs), np.zeros(self.num_bins, dtype=np.int64))
+        hist_fp = sum((acc['hist_fp'] for acc in accs), np.zeros(self.num_bins, dtype=np.int64))
+        num_gt = sum(acc['num_gt'] for acc in accs)
+        tp_cum = np.cumsum(hist_tp[::-1])
+        fp_cum = np.cumsum(hist_fp[::-1])
+        thresholds = np.arange(self.num_bins - 1, -1, -1) / self.num_bins
+        precision = np.zeros(self.num_bins)
+        np.divide(tp_cum, tp_cum + fp_cum, out=precision, where=(tp_cum + fp_cum) > 0)
+        recall = tp_cum / num_gt if num_gt > 0 else np.zeros(self.num_bins)
+        return thresholds, precision, recall
+
+    def get_average_precision(self, semantic_type=None):
+        # Area under the precision-recall curve, with precision made monotonically decreasing
+        thresholds, precision, recall = self.get_pr_curve(semantic_type)
+        precision_envelope = np.maximum.accumulate(precision[::-1])[::-1]
+        return float(np.sum(np.diff(recall, prepend=0.0) * precision_envelope))
+
+    def get_metrics(self, semantic_type=None):
+        """
+        :return: dict with num_gt, tp, fp, fn, precision, recall, ap (detection, all scores) and mota, motp,
+        id_switches (tracking)
+        """
+        accs = self.__get_accumulators(semantic_type)
+        num_gt = sum(acc['num_gt'] for acc in accs)
+        tp = int(sum(acc['hist_tp'].sum() for acc in accs))
+        fp = int(sum(acc['hist_fp'].sum() for acc in accs))
+        num_matches = sum(acc['num_matches'] for acc in accs)
+        errors = sum(acc['fp'] + acc['fn'] + acc['id_switches'] for acc in accs)
+        return {
+            'num_gt': num_gt,
+            'tp': tp,
+            'fp': fp,
+            'fn': num_gt - tp,
+            'precision': tp / (tp + fp) if tp + fp > 0 else 0.0,
+            'recall': tp / num_gt if num_gt > 0 else 0.0,
+            'ap': self.get_average_precision(semantic_type),
+            'mota': 1.0 - errors / num_gt if num_gt > 0 else 0.0,
+            'motp': sum(acc['sum_iou'] for acc in accs) / num_matches if num_matches > 0 else 0.0,
+            'id_switches': sum(acc['id_switches'] for acc in accs)
+        }
+
+
+def evaluate(vcd_gt, vcd_pred, data_name, iou_threshold=0.5, data_name_pred=None, score_name=None, classes=None,
+             bev=False, cs=None, processes=1, chunksize=64, num_bins=1000):
+    """
+    Evaluates a prediction VCD against a ground-truth VCD, for all frames (see evaluate_frames and Evaluation)
+    :return: Evaluation, e.g. evaluation.get_metrics('Car')
+    """
+    evaluation = Evaluation(num_bins)
+    for frame_result in evaluate_frames(vcd_gt, vcd_pred, data_name, iou_threshold, data_name_pred, score_name,
+                                        classes, bev, cs, processes, chunksize):
+        evaluation.add_frame(frame_result)
+    return evaluation
@@ -0,0 +1,298 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import warnings
+import numpy as np
+
+import vcd.utils as utils
+
+# Overlap (IoU) between sets of geometries, vectorized with NumPy.
+# All functions receive two sets of N and M geometries (arrays or lists of lists, as the 'val' of the
+# corresponding element_data) and return an NxM matrix.
+# For large sets, chunk_size limits the number of columns (geometries of the second set) computed at once, which
+# bounds the memory used by the intermediate arrays.
+
+_EPS = 1e-9
+
+
+####################################################
+# Helpers
+####################################################
+def _as_array(values_NxK, k):
+    # List of N values (or array NxK) as a float array NxK
+    values_NxK = np.asarray(values_NxK, dtype=float)
+    if values_NxK.size == 0:
+        return values_NxK.reshape(0, k)
+    assert(values_NxK.ndim == 2)
+    assert(values_NxK.shape[1] == k)
+    return values_NxK
+
+
+def _chunked(func, values_a, values_b, chunk_size):
+    # Evaluates func(values_a, values_b) -> NxM in blocks of chunk_size columns
+    M = values_b.shape[0]
+    if chunk_size is None or chunk_size >= M:
+        return func(values_a, values_b)
+    assert(chunk_size > 0)
+    result_NxM = np.empty((values_a.shape[0], M))
+    for start in range(0, M, chunk_size):
+        result_NxM[:, start:start + chunk_size] = func(values_a, values_b[start:start + chunk_size])
+    return result_NxM
+
+
+def _iou_from_areas(inter_NxM, area_a_N, area_b_M):
+    union_NxM = area_a_N[:, np.newaxis] + area_b_M[np.newaxis, :] - inter_NxM
+    iou_NxM = np.zeros_like(inter_NxM)
+    np.divide(inter_NxM, union_NxM, out=iou_NxM, where=union_NxM > 0)
+    return iou_NxM
+
+
+def _cross2(u, v):
+    # z component of the cross product of 2D vectors (last axis)
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+####################################################
+# Convex polygons
+####################################################
+def rotated_rect_corners(centers_Nx2, sizes_Nx2, angles_N):
+    """
+    Corners of N rotated rectangles, in counter-clockwise order (for a right-handed x-y frame).
+    :param centers_Nx2: centers (x, y)
+    :param sizes_Nx2: sizes (w, h), along the rotated x and y axes
+    :param angles_N: rotation angles (rad), from the x axis to the y axis
+    :return: array Nx4x2
+    """
+    signs_4x2 = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) / 2
+    local_Nx4x2 = signs_4x2[np.newaxis, :, :] * sizes_Nx2[:, np.newaxis, :]
+    c = np.cos(angles_N)[:, np.newaxis]
+    s = np.sin(angles_N)[:, np.newaxis]
+    corners_Nx4x2 = np.empty_like(local_Nx4x2)
+    corners_Nx4x2[:, :, 0] = c * local_Nx4x2[:, :, 0] - s * local_Nx4x2[:, :, 1] + centers_Nx2[:, 0:1]
+    corners_Nx4x2[:, :, 1] = s * local_Nx4x2[:, :, 0] + c * local_Nx4x2[:, :, 1] + centers_Nx2[:, 1:2]
+    return corners_Nx4x2
+
+
+def _points_in_convex(points_PxKx2, polygons_PxVx2):
+    # Mask PxK of points inside (or on the border of) counter-clockwise convex polygons
+    edges_PxVx2 = np.roll(polygons_PxVx2, -1, axis=1) - polygons_PxVx2
+    cross_PxKxV = _cross2(edges_PxVx2[:, np.newaxis, :, :],
+                          points_PxKx2[:, :, np.newaxis, :] - polygons_PxVx2[:, np.newaxis, :, :])
+    return np.all(cross_PxKxV >= -_EPS, axis=2)
+
+
+def intersection_area_convex(polygons_a_PxVx2, polygons_b_PxVx2):
+    """
+    Area of the intersection of P pairs of convex polygons (e.g. rotated rectangles, V=4), given in
+    counter-clockwise order.
+    The vertices of the intersection are the vertices of each polygon inside the other one, and the crossings of
+    their edges: they are sorted by angle around their centroid and their area computed with the shoelace formula.
+    :param polygons_a_PxVx2: first polygon of each pair
+    :param polygons_b_PxVx2: second polygon of each pair
+    :return: array P of areas
+    """
+    P, V, _ = polygons_a_PxVx2.shape
+    if P == 0:
+        return np.zeros(0)
+
+    # Edge crossings, for all pairs of edges (a_i, b_j): a_i + t * ea_i = b_j + u * eb_j
+    edges_a_PxVx2 = np.roll(polygons_a_PxVx2, -1, axis=1) - polygons_a_PxVx2
+    edges_b_PxVx2 = np.roll(polygons_b_PxVx2, -1, axis=1) - polygons_b_PxVx2
+    r = edges_a_PxVx2[:, :, np.newaxis, :]
+    s = edges_b_PxVx2[:, np.newaxis, :, :]
+    qp = polygons_b_PxVx2[:, np.newaxis, :, :] - polygons_a_PxVx2[:, :, np.newaxis, :]
+    denom = _cross2(r, s)
+    parallel = np.abs(denom) <= _EPS
+    denom = np.where(parallel, 1.0, denom)
+    t = _cross2(qp, s) / denom
+    u = _cross2(qp, r) / denom
+    valid_crossings = ~parallel & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    crossings = polygons_a_PxVx2[:, :, np.newaxis, :] + t[..., np.newaxis] * r
+
+    points_PxKx2 = np.concatenate((polygons_a_PxVx2, polygons_b_PxVx2, crossings.reshape(P, V * V, 2)), axis=1)
+    valid_PxK = np.concatenate((_points_in_convex(polygons_a_PxVx2, polygons_b_PxVx2),
+                                _points_in_convex(polygons_b_PxVx2, polygons_a_PxVx2),
+                                valid_crossings.reshape(P, V * V)), axis=1)
+
+    # Sort the valid points by angle around their centroid, invalid ones last
+    count_P = np.count_nonzero(valid_PxK, axis=1)
+    centroid_Px2 = np.sum(points_PxKx2 * valid_PxK[..., np.newaxis], axis=1) / np.maximum(count_P, 1)[:, np.newaxis]
+    d = points_PxKx2 - centroid_Px2[:, np.newaxis, :]
+    angles_PxK = np.where(valid_PxK, np.arctan2(d[..., 1], d[..., 0]), np.inf)
+    order_PxK = np.argsort(angles_PxK, axis=1)
+    points_PxKx2 = np.take_along_axis(points_PxKx2, order_PxK[..., np.newaxis], axis=1)
+    valid_PxK = np.take_along_axis(valid_PxK, order_PxK, axis=1)
+
+    # Invalid points are collapsed on the first one, so they add no area
+    points_PxKx2 = np.where(valid_PxK[..., np.newaxis], points_PxKx2, points_PxKx2[:, 0:1, :])
+    area_P = 0.5 * np.sum(_cross2(points_PxKx2, np.roll(points_PxKx2, -1, axis=1)), axis=1)
+    area_P[count_P < 3] = 0.0
+    return np.maximum(area_P, 0.0)
+
+
+def _intersection_rotated_rects(centers_a_Nx2, sizes_a_Nx2, angles_a_N, centers_b_Mx2, sizes_b_Mx2, angles_b_M):
+    # Intersection areas NxM of two sets of rotated rectangles
+    # Only pairs whose circumscribed circles overlap are intersected as polygons
+    inter_NxM = np.zeros((centers_a_Nx2.shape[0], centers_b_Mx2.shape[0]))
+    radius_a_N = 0.5 * np.hypot(sizes_a_Nx2[:, 0], sizes_a_Nx2[:, 1])
+    radius_b_M = 0.5 * np.hypot(sizes_b_Mx2[:, 0], sizes_b_Mx2[:, 1])
+    diff_NxMx2 = centers_a_Nx2[:, np.newaxis, :] - centers_b_Mx2[np.newaxis, :, :]
+    dist_NxM = np.hypot(diff_NxMx2[..., 0], diff_NxMx2[..., 1])
+    ia, ib = np.nonzero(dist_NxM <= radius_a_N[:, np.newaxis] + radius_b_M[np.newaxis, :])
+    if ia.size == 0:
+        return inter_NxM
+    corners_a_Nx4x2 = rotated_rect_corners(centers_a_Nx2, np.abs(sizes_a_Nx2), angles_a_N)
+    corners_b_Mx4x2 = rotated_rect_corners(centers_b_Mx2, np.abs(sizes_b_Mx2), angles_b_M)
+    inter_NxM[ia, ib] = intersection_area_convex(corners_a_Nx4x2[ia], corners_b_Mx4x2[ib])
+    return inter_NxM
+
+
+####################################################
+# bbox and rbbox
+####################################################
+def _iou_bbox(bboxes_a_Nx4, bboxes_b_Mx4):
+    half_a = bboxes_a_Nx4[:, 2:4] / 2
+    half_b = bboxes_b_Mx4[:, 2:4] / 2
+    top_left = np.maximum((bboxes_a_Nx4[:, 0:2] - half_a)[:, np.newaxis, :],
+                          (bboxes_b_Mx4[:, 0:2] - half_b)[np.newaxis, :, :])
+    bottom_right = np.minimum((bboxes_a_Nx4[:, 0:2] + half_a)[:, np.newaxis, :],
+                              (bboxes_b_Mx4[:, 0:2] + half_b)[np.newaxis, :, :])
+    wh_NxMx2 = np.clip(bottom_right - top_left, 0, None)
+    inter_NxM = wh_NxMx2[..., 0] * wh_NxMx2[..., 1]
+    return _iou_from_areas(inter_NxM, bboxes_a_Nx4[:, 2] * bboxes_a_Nx4[:, 3], bboxes_b_Mx4[:, 2] * bboxes_b_Mx4[:, 3])
+
+
+def iou_bbox(bboxes_a, bboxes_b, chunk_size=None):
+    """
+    Intersection over union between two sets of bbox, in center-size form (x, y, w, h), as in types.bbox
+    :param bboxes_a: N bboxes (array Nx4 or list of lists)
+    :param bboxes_b: M bboxes (array Mx4 or list of lists)
+    :param chunk_size: if not None, the IoU is computed for chunk_size bboxes of bboxes_b at a time
+    :return: array NxM of IoU values
+    """
+    return _chunked(_iou_bbox, _as_array(bboxes_a, 4), _as_array(bboxes_b, 4), chunk_size)
+
+
+def _iou_rbbox(rbboxes_a_Nx5, rbboxes_b_Mx5):
+    inter_NxM = _intersection_rotated_rects(rbboxes_a_Nx5[:, 0:2], rbboxes_a_Nx5[:, 2:4], rbboxes_a_Nx5[:, 4],
+                                            rbboxes_b_Mx5[:, 0:2], rbboxes_b_Mx5[:, 2:4], rbboxes_b_Mx5[:, 4])
+    return _iou_from_areas(inter_NxM, np.abs(rbboxes_a_Nx5[:, 2] * rbboxes_a_Nx5[:, 3]),
+                           np.abs(rbboxes_b_Mx5[:, 2] * rbboxes_b_Mx5[:, 3]))
+
+
+def iou_rbbox(rbboxes_a, rbboxes_b, chunk_size=None):
+    """
+    Intersection over union between two sets of rbbox (x, y, w, h, alpha), as in types.rbbox, with (x, y) the center
+    and alpha the rotation (rad) from the x axis to the y axis of the image
+    :param rbboxes_a: N rbboxes (array Nx5 or list of lists)
+    :param rbboxes_b: M rbboxes (array Mx5 or list of lists)
+    :param chunk_size: if not None, the IoU is computed for chunk_size rbboxes of rbboxes_b at a time
+    :return: array NxM of IoU values
+    """
+    return _chunked(_iou_rbbox, _as_array(rbboxes_a, 5), _as_array(rbboxes_b, 5), chunk_size)
+
+
+####################################################
+# cuboid
+####################################################
+def _as_cuboids(cuboids_NxM):
+    cuboids_NxM = np.asarray(cuboids_NxM, dtype=float)
+    if cuboids_NxM.size == 0:
+        return cuboids_NxM.reshape(0, 9)
+    assert(cuboids_NxM.ndim == 2)
+    assert(cuboids_NxM.shape[1] in (9, 10))
+    return cuboids_NxM
+
+
+def _cuboids_bev(cuboids_NxM):
+    # Center (x, y, z), sizes (footprint and height) and yaw of N cuboids, from their poses: the axis of each cuboid
+    # closest to z is its vertical axis (e.g. the y axis, height, of KITTI cuboids transformed from the camera), and
+    # the yaw is the one of the next axis (cyclic order), whose size comes first in the footprint
+    P_Nx4x4 = utils.get_cuboid_poses_batch(cuboids_NxM)
+    k_up = np.argmax(np.abs(P_Nx4x4[:, 2, 0:3]), axis=1)
+    axes_Nx3 = (k_up[:, np.newaxis] + np.array([1, 2, 0])) % 3
+    rows = np.arange(len(k_up))[:, np.newaxis]
+    sizes_Nx3 = np.abs(cuboids_NxM[:, -3:])[rows, axes_Nx3]
+    k_yaw = axes_Nx3[:, 0]
+    yaw_N = np.arctan2(P_Nx4x4[rows[:, 0], 1, k_yaw], P_Nx4x4[rows[:, 0], 0, k_yaw])
+    return P_Nx4x4[:, 0:3, 3], sizes_Nx3, yaw_N
+
+
+def _intersection_cuboids(cuboids_a_NxK, cuboids_b_MxK, use_z):
+    centers_a, sizes_a, yaw_a = _cuboids_bev(cuboids_a_NxK)
+    centers_b, sizes_b, yaw_b = _cuboids_bev(cuboids_b_MxK)
+    inter_NxM = _intersection_rotated_rects(centers_a[:, 0:2], sizes_a[:, 0:2], yaw_a,
+                                            centers_b[:, 0:2], sizes_b[:, 0:2], yaw_b)
+    area_a_N = sizes_a[:, 0] * sizes_a[:, 1]
+    area_b_M = sizes_b[:, 0] * sizes_b[:, 1]
+    if use_z:
+        top = np.minimum((centers_a[:, 2] + sizes_a[:, 2] / 2)[:, np.newaxis],
+                         (centers_b[:, 2] + sizes_b[:, 2] / 2)[np.newaxis, :])
+        bottom = np.maximum((centers_a[:, 2] - sizes_a[:, 2] / 2)[:, np.newaxis],
+                            (centers_b[:, 2] - sizes_b[:, 2] / 2)[np.newaxis, :])
+        inter_NxM *= np.clip(top - bottom, 0, None)
+        area_a_N = area_a_N * sizes_a[:, 2]
+        area_b_M = area_b_M * sizes_b[:, 2]
+    return inter_NxM, area_a_N, area_b_M
+
+
+def _iou_cuboid_bev(cuboids_a_NxK, cuboids_b_MxK):
+    return _iou_from_areas(*_intersection_cuboids(cuboids_a_NxK, cuboids_b_MxK, use_z=False))
+
+
+def _iou_cuboid_3d(cuboids_a_NxK, cuboids_b_MxK):
+    return _iou_from_areas(*_intersection_cuboids(cuboids_a_NxK, cuboids_b_MxK, use_z=True))
+
+
+def iou_cuboid_bev(cuboids_a, cuboids_b, chunk_size=None):
+    """
+    Bird's-eye-view intersection over union between two sets of cuboids, (x, y, z, rx, ry, rz, sx, sy, sz) or
+    (x, y, z, qx, qy, qz, qw, sx, sy, sz), as in types.cuboid. Both sets must be in the same coordinate system, with
+    z pointing up (e.g. vehicle-iso8855, see scl.Scene.transform_cuboids): the axis of each cuboid closest to z is
+    taken as vertical, and the footprints (sizes along the other two axes) are rotated by the yaw of each cuboid and
+    intersected in the x-y plane.
+    :param cuboids_a: N cuboids (array NxK or list of lists)
+    :param cuboids_b: M cuboids (array MxK or list of lists)
+    :param chunk_size: if not None, the IoU is computed for chunk_size cuboids of cuboids_b at a time
+    :return: array NxM of IoU values
+    """
+    return _chunked(_iou_cuboid_bev, _as_cuboids(cuboids_a), _as_cuboids(cuboids_b), chunk_size)
+
+
+def iou_cuboid_3d(cuboids_a, cuboids_b, chunk_size=None):
+    """
+    3D intersection over union between two sets of cuboids (see iou_cuboid_bev): the bird's-eye-view intersection
+    times the overlap along z. Roll and pitch are not considered.
+    :param cuboids_a: N cuboids (array NxK or list of lists)
+    :param cuboids_b: M cuboids (array MxK or list of lists)
+    :param chunk_size: if not None, the IoU is computed for chunk_size cuboids of cuboids_b at a time
+    :return: array NxM of IoU values
+    """
+    return _chunked(_iou_cuboid_3d, _as_cuboids(cuboids_a), _as_cuboids(cuboids_b), chunk_size)
+
+
+def iou(values_a, values_b, data_type_name, chunk_size=None, bev=False):
+    """
+    Intersection over union for element_data of type 'bbox', 'rbbox' or 'cuboid' (3D, or bird's-eye-view if bev)
+    :return: array NxM of IoU values, or None if the type is not supported
+    """
+    if data_type_name == 'bbox':
+        return iou_bbox(values_a, values_b, chunk_size)
+    elif data_type_name == 'rbbox':
+        return iou_rbbox(values_a, values_b, chunk_size)
+    elif data_type_name == 'cuboid':
+        if bev:
+            return iou_cuboid_bev(values_a, values_b, chunk_size)
+        return iou_cuboid_3d(values_a, values_b, chunk_size)
+    warnings.warn("WARNING: IoU of " + data_type_name + " is not supported.")
+    return None
@@ -11,15 +11,23 @@ VCD is distributed under MIT License. See LICENSE.
 
 """
 
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
 import numpy as np
 import warnings
 import cv2 as cv
-from collections import deque, namedtuple
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 from numpy import float64
 
+import vcd.types as types
 import vcd.utils as utils
+import vcd.visibility as visibility
 import math
 
 from vcd.types import areaReference
@@ -145,6 +153,48 @@ inf = float('inf')
 Edge = namedtuple('Edge', 'start, end, cost')
 
 
+TransformCacheInfo = namedtuple('TransformCacheInfo', 'hits, misses, maxsize, currsize')
+CameraCacheInfo = namedtuple('CameraCacheInfo', 'hits, misses, maxsize, currsize')
+
+
+def get_remaps_cache_key(model, *arrays):
+    # Hash of the camera model and the arrays that define the remaps (e.g. K, distortion, K_und and size)
+    h = hashlib.sha1(model.encode())
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=float)
+        h.update(str(array.shape).encode())
+        h.update(array.tobytes())
+    return h.hexdigest()
+
+
+def load_remaps(cache_dir, key):
+    """
+    Loads remaps (undistortion maps) stored by save_remaps, memory-mapped (read-only) so processes using the same
+    cameras share the pages.
+    :return: map_x, map_y, or None, None if not found in cache_dir
+    """
+    path_x = os.path.join(cache_dir, key + '_x.npy')
+    path_y = os.path.join(cache_dir, key + '_y.npy')
+    if not (os.path.isfile(path_x) and os.path.isfile(path_y)):
+        return None, None
+    return np.load(path_x, mmap_mode='r'), np.load(path_y, mmap_mode='r')
+
+
+def save_remaps(cache_dir, key, map_x, map_y):
+    # Each file is written to a temporary file and then renamed, so concurrent processes never read partial files
+    # map_y is written first, as load_remaps only reads when both files exist
+    os.makedirs(cache_dir, exist_ok=True)
+    for suffix, remap in (('_y.npy', map_y), ('_x.npy', map_x)):
+        fd, path_tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, remap)
+            os.replace(path_tmp, os.path.join(cache_dir, key + suffix))
+        except BaseException:
+            os.remove(path_tmp)
+            raise
+
+
 def make_edge(start, end, cost=1):
     return Edge(start, end, cost)
 
@@ -200,13 +250,16 @@ class Graph:
         return neighbours
 
     def dijkstra(self, source, dest):
-        assert source in self.vertices, 'Such source node doesn\'t exist'
-        distances = {vertex: inf for vertex in self.vertices}
+        # vertices and neighbours are properties computed from the edges, so let's compute them only once
+        all_vertices = self.vertices
+        neighbours = self.neighbours
+        assert source in all_vertices, 'Such source node doesn\'t exist'
+        distances = {vertex: inf for vertex in all_vertices}
         previous_vertices = {
-            vertex: None for vertex in self.vertices
+            vertex: None for vertex in all_vertices
         }
         distances[source] = 0
-        vertices = self.vertices.copy()
+        vertices = all_vertices.copy()
 
         while vertices:
             current_vertex = min(
@@ -214,7 +267,7 @@ class Graph:
             vertices.remove(current_vertex)
             if distances[current_vertex] == inf:
                 break
-            for neighbour, cost in self.neighbours[current_vertex]:
+            for neighbour, cost in neighbours[current_vertex]:
                 alternative_route = distances[current_vertex] + cost
                 if alternative_route < distances[neighbour]:
                     distances[neighbour] = alternative_route
@@ -230,9 +283,63 @@ class Graph:
 
 
 class Scene:
-    def __init__(self, vcd):
+    def __init__(self, vcd, transform_cache_size=1024, camera_cache_size=64, remap_cache_dir=None,
+                 camera_pose_cache_size=256):
         self.vcd = vcd
-        self.cameras = dict()
+
+        # Directory where cameras store their remaps (undistortion maps), to be reused by other processes (optional)
+        self.remap_cache_dir = remap_cache_dir
+
+        # Camera objects, shared by all frames with the same intrinsics (see get_camera)
+        # Cameras defined at stream level are kept one per camera name, and cameras with frame-specific intrinsics
+        # are kept in an LRU cache, keyed by their content
+        self.__cameras_static = dict()
+        self.__camera_cache = OrderedDict()
+        self.__camera_cache_size = camera_cache_size
+        self.__camera_cache_hits = 0
+        self.__camera_cache_misses = 0
+
+        # LRU cache of composed transforms, keyed by (cs_src, cs_dst, frameNum), where frameNum is None for chains
+        # without frame-specific transforms in any of their edges (static chains)
+        # Cleared when coordinate systems or transforms are added to the VCD (see __update_transform_cache)
+        self.__transform_cache = OrderedDict()
+        self.__transform_cache_size = transform_cache_size
+        self.__transform_cache_version = None
+        self.__transform_cache_hits = 0
+        self.__transform_cache_misses = 0
+        self.__dynamic_edges = set()
+        self.__dynamic_chains = dict()
+
+        # Coordinate systems tree (parent pointers and depths), and chains already computed
+        # Rebuilt when coordinate systems are added to the VCD (see __update_cs_tree)
+        self.__cs_tree_version = None
+        self.__cs_parents = dict()
+        self.__cs_depths = dict()
+        self.__cs_chains = dict()
+
+        # LRU cache of the horizon line and ROI of cameras (see compute_horizon_line and camera_roi_z0), keyed by the
+        # content of the intrinsics and of the composed transform, so static rigs compute them once per sequence
+        self.__camera_pose_cache = OrderedDict()
+        self.__camera_pose_cache_size = camera_pose_cache_size
+
+    def __get_camera_pose_entry(self, camera_name, cs, frameNum):
+        # Entry (dict) of the camera pose cache, and composed transform from cs to the camera
+        transform_cs_cam, static = self.get_transform(cs, camera_name, frameNum)
+        stream_properties = self.__get_stream_properties(camera_name, frameNum)
+        intrinsics_key = None
+        if stream_properties is not None:
+            intrinsics_key = self.__get_intrinsics_key(stream_properties[1])
+        key = (camera_name, cs, intrinsics_key, np.asarray(transform_cs_cam, dtype=float).tobytes())
+        entry = self.__camera_pose_cache.get(key)
+        if entry is not None:
+            self.__camera_pose_cache.move_to_end(key)
+            return entry, transform_cs_cam
+        entry = dict()
+        if self.__camera_pose_cache_size > 0:
+            self.__camera_pose_cache[key] = entry
+            if len(self.__camera_pose_cache) > self.__camera_pose_cache_size:
+                self.__camera_pose_cache.popitem(last=False)
+        return entry, transform_cs_cam
 
     def camera_roi_z0(self, camera_name, cs, frameNum):
         """
@@ -242,6 +349,13 @@ class Scene:
         :param frameNum: frame num
         :return: polygon 2D
         """
+        # Perhaps already computed for this camera pose (and intrinsics)
+        entry, transform_cs_cam = self.__get_camera_pose_entry(camera_name, cs, frameNum)
+        if 'roi' not in entry:
+            entry['roi'] = self.__compute_camera_roi_z0(camera_name, cs, frameNum)
+        return entry['roi'].copy()  # the cached one is kept unmodified
+
+    def __compute_camera_roi_z0(self, camera_name, cs, frameNum):
         # Working on undistorted coordinates
         hline, points = self.compute_horizon_line(camera_name=camera_name, cs=cs, frameNum=frameNum)
         cam = self.get_camera(camera_name=camera_name, frameNum=frameNum)
@@ -417,19 +531,14 @@ class Scene:
         :param frameNum: frame number
         :return: line in general form (a, b, c), and array of points, all in undistorted domain
         """
-        if frameNum is None:
-            f = -1
-        else:
-            f = frameNum
-
-        # Perhaps already computed
-        # TODO check if we really need to store this computation
-        if camera_name in self.cameras:
-            if f in self.cameras[camera_name]:
-                if 'hline' in self.cameras[camera_name][f]:
-                    return self.cameras[camera_name][f]['hline']
-
-        # Compute
+        # Perhaps already computed for this camera pose (and intrinsics)
+        entry, transform_cs_cam = self.__get_camera_pose_entry(camera_name, cs, frameNum)
+        if 'hline' not in entry:
+            entry['hline'] = self.__compute_horizon_line(camera_name, transform_cs_cam, frameNum)
+        line, points = entry['hline']
+        return line.copy(), list(points)  # the cached ones are kept unmodified
+
+    def __compute_horizon_line(self, camera_name, transform_cs_cam, frameNum):
         cam = self.get_camera(camera_name=camera_name, frameNum=frameNum)
         width = cam.width
         height = cam.height
@@ -437,19 +546,11 @@ class Scene:
         # Select points in the infinite that belong to the Z=0 plane
         # Let's propose several infinite points in all 360º directions
         steps = 60
-        step = 2*np.pi / steps
-        points3d_inf = np.zeros((4, steps))
-        for s in range(0, steps):
-            angle = step*s
-            x = np.cos(angle)
-            y = np.sin(angle)
-            points3d_inf[0, s] = x
-            points3d_inf[1, s] = y
+        angles = np.arange(steps) * (2 * np.pi / steps)
+        points3d_inf = np.vstack((np.cos(angles), np.sin(angles), np.zeros((2, steps))))
 
         # Convert from cs to camera_cs
-        points3d_inf = self.transform_points3d_4xN(points3d_4xN=points3d_inf,
-                                                   cs_src=cs, cs_dst=camera_name,
-                                                   frameNum=frameNum)
+        points3d_inf = utils.transform_points3d_4xN(points3d_inf, transform_cs_cam)
 
         # Project in the camera (USING UNDISTORTED FRAME)
         points2d_inf, valid = cam.project_points3d(points3d_4xN=points3d_inf, apply_distortion=False)
@@ -508,86 +609,214 @@ class Scene:
             assert (len(points_horz) == 2 or len(
                 points_horz) == 0)  # a line can only intersect a rectangle in 2 points! (or none)
 
-        # Store for next time
-        self.cameras.setdefault(camera_name, {})
-        self.cameras[camera_name].setdefault(frameNum, {})
-        self.cameras[camera_name][frameNum]['hline'] = line, points_horz
-
         return line, points_horz
 
+    @staticmethod
+    def __get_intrinsics_key(stream_properties):
+        # Content of the intrinsics, usable as key to share Camera objects
+        for intrinsics_type in ('intrinsics_pinhole', 'intrinsics_fisheye', 'intrinsics_custom'):
+            if intrinsics_type in stream_properties:
+                return intrinsics_type, json.dumps(stream_properties[intrinsics_type], sort_keys=True)
+        return None
+
+    def __create_sensor(self, stream_properties, camera_name, description, uri, stream_type, compute_remaps):
+        if 'intrinsics_pinhole' in stream_properties:
+            return CameraPinhole(stream_properties['intrinsics_pinhole'], camera_name, description, uri, compute_remaps,
+                                 self.remap_cache_dir)
+        elif 'intrinsics_fisheye' in stream_properties:
+            return CameraFisheye(stream_properties['intrinsics_fisheye'], camera_name, description, uri, compute_remaps,
+                                 self.remap_cache_dir)
+        elif 'intrinsics_custom' in stream_properties and stream_type == 'lidar':
+            return Lidar(stream_properties['intrinsics_custom'], camera_name, description, uri)
+        return None
+
     def get_camera(self, camera_name, frameNum=None, compute_remaps=False):
         """
         This function explores the VCD content searching for the camera parameters of camera "camera_name", specific
         for frameNum if specified (or static information if None).
 
-        The function consults and updates a store of information self.cameras, to speed up some computations (so they
-        are carried out only once).
+        Camera objects are shared by all the frames with the same intrinsics, so the (costly) construction of the
+        camera is carried out only once. Frames without their own stream_properties use the camera defined at stream
+        level, while cameras with frame-specific intrinsics are kept in an LRU cache of size camera_cache_size.
 
         Returns an object of type Camera, which can be used to project points, undistort images, etc.
         :param camera_name: name of the camera
         :param frameNum: frame number (if None, static camera info is requested)
+        :param compute_remaps: if True, the undistortion maps of the camera are computed (if not already)
         :return: Camera object
         """
-        # Check if already computed
-        if frameNum is None:
-            f = -1
-        else:
-            f = frameNum
+        sensor = self.__get_sensor(camera_name, frameNum, compute_remaps)
+        if sensor is not None and sensor.is_camera():
+            return sensor
+        return None
 
-        if camera_name in self.cameras:
-            if f in self.cameras[camera_name]:
-                return self.cameras[camera_name][f]['cam']
+    def get_lidar(self, lidar_name, frameNum=None):
+        """
+        Same as get_camera, for a stream of type lidar with intrinsics_custom (see Lidar)
+        :param lidar_name: name of the lidar
+        :param frameNum: frame number (if None, static lidar info is requested)
+        :return: Lidar object
+        """
+        sensor = self.__get_sensor(lidar_name, frameNum, False)
+        if sensor is not None and sensor.is_lidar():
+            return sensor
+        return None
 
-        # Create camera m
-        camera = None
+    def __get_stream_properties(self, sensor_name, frameNum):
+        # Stream, stream_properties with the intrinsics (frame-specific if any) and whether they are the static ones
         root = self.vcd.get_root()
-        if 'streams' in root:
-            if camera_name in root['streams']:
-                uri = root['streams'][camera_name]['uri']
-                description = root['streams'][camera_name]['description']
-                if 'stream_properties' in root['streams'][camera_name]:
-                    sp = root['streams'][camera_name]['stream_properties']
-                    if 'intrinsics_pinhole' in sp:
-                        camera = CameraPinhole(sp['intrinsics_pinhole'], camera_name, description, uri, compute_remaps)
-                    elif 'intrinsics_fisheye' in sp:
-                        camera = CameraFisheye(sp['intrinsics_fisheye'], camera_name, description, uri, compute_remaps)
-        else:
+        if 'streams' not in root:
             return None
+        if sensor_name not in root['streams']:
+            return None
+        stream = root['streams'][sensor_name]
+        sp = stream.get('stream_properties', {})
+        is_static = True
 
         if frameNum is not None:
             vcd_frame = self.vcd.get_frame(frameNum)
+            if vcd_frame is not None:
+                frame_stream = vcd_frame.get('frame_properties', {}).get('streams', {}).get(sensor_name, {})
+                frame_sp = frame_stream.get('stream_properties', {})
+                if self.__get_intrinsics_key(frame_sp) is not None:
+                    sp = frame_sp
+                    is_static = False
+        return stream, sp, is_static
+
+    def __get_sensor(self, sensor_name, frameNum, compute_remaps):
+        # Camera or Lidar of a stream, shared through the caches described in get_camera
+        stream_properties = self.__get_stream_properties(sensor_name, frameNum)
+        if stream_properties is None:
+            return None
+        stream, sp, is_static = stream_properties
+        uri = stream['uri']
+        description = stream['description']
 
-            if 'frame_properties' in vcd_frame:
-                if 'streams' in vcd_frame['frame_properties']:
-                    if camera_name in vcd_frame['frame_properties']['streams']:
-                        if 'stream_properties' in vcd_frame['frame_properties']['streams'][camera_name]:
-                            sp = vcd_frame['frame_properties']['streams'][camera_name][
-                                'stream_properties']
-                        if 'intrinsics_pinhole' in sp:
-                            camera = CameraPinhole(sp['intrinsics_pinhole'], camera_name, description, uri, compute_remaps)
-                        elif 'intrinsics_fisheye' in sp:
-                            camera = CameraFisheye(sp['intrinsics_fisheye'], camera_name, description, uri, compute_remaps)
-
-        # Update store
-        self.cameras.setdefault(camera_name, {})
-        self.cameras[camera_name].setdefault(f, {})
-        self.cameras[camera_name][f]['cam'] = camera
-
-        return camera
-
-    def __get_transform_chain(self, cs_src, cs_dst):
-        # Create graph with the poses defined for each coordinate_system
-        # These are poses valid "statically"
-        lista = []
+        intrinsics_key = self.__get_intrinsics_key(sp)
+        if intrinsics_key is None:
+            return None
+        key = (sensor_name, description, uri) + intrinsics_key
+
+        # Check if already created (frame-specific intrinsics may be equal to the static ones)
+        sensor = None
+        static_entry = self.__cameras_static.get(sensor_name)
+        if static_entry is not None and static_entry[0] == key:
+            sensor = static_entry[1]
+        elif not is_static and key in self.__camera_cache:
+            sensor = self.__camera_cache[key]
+            self.__camera_cache.move_to_end(key)
+
+        if sensor is not None:
+            self.__camera_cache_hits += 1
+            if compute_remaps and sensor.is_camera():
+                sensor.compute_remaps()
+            return sensor
+
+        # Create sensor
+        self.__camera_cache_misses += 1
+        sensor = self.__create_sensor(sp, sensor_name, description, uri, stream.get('type'), compute_remaps)
+        if is_static:
+            self.__cameras_static[sensor_name] = key, sensor
+        elif self.__camera_cache_size > 0:
+            self.__camera_cache[key] = sensor
+            if len(self.__camera_cache) > self.__camera_cache_size:
+                self.__camera_cache.popitem(last=False)
+
+        return sensor
+
+    def get_camera_cache_info(self):
+        """
+        Returns the statistics of the cache of Camera objects (see get_camera).
+        currsize counts both the stream-level cameras and the frame-specific ones, while maxsize only bounds the latter.
+        :return: CameraCacheInfo(hits, misses, maxsize, currsize)
+        """
+        return CameraCacheInfo(self.__camera_cache_hits, self.__camera_cache_misses,
+                               self.__camera_cache_size, len(self.__cameras_static) + len(self.__camera_cache))
+
+    def __update_cs_tree(self):
+        # Coordinate systems form a tree (each one has at most one parent), so let's store parent pointers and depths
+        version = self.vcd.get_coordinate_systems_version()
+        if version == self.__cs_tree_version:
+            return
         root = self.vcd.get_root()
-        for cs_name, cs_body in root['coordinate_systems'].items():
-            for child in cs_body['children']:
-                lista.append((cs_name, child, 1))
-                lista.append((child, cs_name, 1))
+        coordinate_systems = root.get('coordinate_systems', {})
+        self.__cs_parents = {cs_name: cs_body.get('parent', '') for cs_name, cs_body in coordinate_systems.items()}
+        self.__cs_depths = dict()
+        for cs_name in coordinate_systems:
+            # Walk up until a coordinate system with known depth (or a root) is found
+            branch = []
+            cs = cs_name
+            while cs in self.__cs_parents and cs not in self.__cs_depths and cs not in branch:
+                branch.append(cs)
+                cs = self.__cs_parents[cs]
+            depth = self.__cs_depths.get(cs, -1)
+            for cs in reversed(branch):
+                depth += 1
+                self.__cs_depths[cs] = depth
+        self.__cs_chains = dict()
+        self.__cs_tree_version = version
 
-        graph = Graph(lista)
-        result = graph.dijkstra(cs_src, cs_dst)
-        return result
+    def __get_transform_chain(self, cs_src, cs_dst):
+        # Returns the sequence of coordinate systems from cs_src to cs_dst, going up to their lowest common ancestor
+        # and then down, or an empty tuple if they are not connected
+        self.__update_cs_tree()
+        chain = self.__cs_chains.get((cs_src, cs_dst))
+        if chain is not None:
+            return chain
+
+        parents = self.__cs_parents
+        depths = self.__cs_depths
+        up = [cs_src]
+        down = [cs_dst]
+        cs_a = cs_src
+        cs_b = cs_dst
+        while depths[cs_a] > depths[cs_b]:
+            cs_a = parents[cs_a]
+            up.append(cs_a)
+        while depths[cs_b] > depths[cs_a]:
+            cs_b = parents[cs_b]
+            down.append(cs_b)
+        while cs_a != cs_b:
+            cs_a = parents[cs_a]
+            cs_b = parents[cs_b]
+            if cs_a not in depths or cs_b not in depths:
+                # Reached the roots of two different trees
+                up = []
+                down = [None]
+                break
+            up.append(cs_a)
+            down.append(cs_b)
+        chain = tuple(up + down[-2::-1])  # the common ancestor is the last of both lists
+        self.__cs_chains[(cs_src, cs_dst)] = chain
+        return chain
+
+    def __update_transform_cache(self):
+        # Clears the cache of transforms if coordinate systems or transforms have been added to the VCD
+        version = (self.vcd.get_coordinate_systems_version(), self.vcd.get_transforms_version())
+        if version == self.__transform_cache_version:
+            return
+        self.__transform_cache.clear()
+        self.__dynamic_chains = dict()
+
+        # Names of frame-specific transforms (e.g. "vehicle-iso8855_to_odom") at any frame
+        self.__dynamic_edges = set()
+        for frame in self.vcd.get_root().get('frames', {}).values():
+            transforms = frame.get('frame_properties', {}).get('transforms')
+            if transforms:
+                self.__dynamic_edges.update(transforms.keys())
+        self.__transform_cache_version = version
+
+    def __is_dynamic_chain(self, chain):
+        # A chain is dynamic if any of its edges has frame-specific transforms
+        dynamic = self.__dynamic_chains.get(chain)
+        if dynamic is None:
+            dynamic = False
+            for cs_1, cs_2 in zip(chain[:-1], chain[1:]):
+                if cs_1 + "_to_" + cs_2 in self.__dynamic_edges or cs_2 + "_to_" + cs_1 in self.__dynamic_edges:
+                    dynamic = True
+                    break
+            self.__dynamic_chains[chain] = dynamic
+        return dynamic
 
     def get_transform(self, cs_src, cs_dst, frameNum=None):
         """
@@ -602,6 +831,7 @@ class Scene:
         :param cs_dst: destination coordinate frame (e.g. "VELO", or "CAM_LEFT")
         :param frameNum: frame number where to look for specific transform steps
         :return: the 4x4 transform matrix, and a boolean that specifies if the transform is static or not
+        The returned matrix is cached (see get_transform_cache_info), and is read-only.
         """
         assert (self.vcd.has_coordinate_system(cs_src))
         assert (self.vcd.has_coordinate_system(cs_dst))
@@ -611,9 +841,39 @@ class Scene:
             return np.eye(4), static
 
         # Get chain of transforms
+        self.__update_transform_cache()
         chain = self.__get_transform_chain(cs_src, cs_dst)
 
+        # Chains without frame-specific transforms are the same for all frames
+        if frameNum is not None and not self.__is_dynamic_chain(chain):
+            frameNum = None
+
+        key = (cs_src, cs_dst, frameNum)
+        entry = self.__transform_cache.get(key)
+        if entry is not None:
+            self.__transform_cache.move_to_end(key)
+            self.__transform_cache_hits += 1
+            return entry
+        self.__transform_cache_misses += 1
+
+        t_4x4, static = self.__compose_transform(chain, frameNum)
+        t_4x4.flags.writeable = False  # the same array is returned by subsequent calls
+        self.__transform_cache[key] = (t_4x4, static)
+        if len(self.__transform_cache) > self.__transform_cache_size:
+            self.__transform_cache.popitem(last=False)
+        return t_4x4, static
+
+    def get_transform_cache_info(self):
+        """
+        Returns the statistics of the cache of transforms used by get_transform
+        :return: TransformCacheInfo(hits, misses, maxsize, currsize)
+        """
+        return TransformCacheInfo(self.__transform_cache_hits, self.__transform_cache_misses,
+                                  self.__transform_cache_size, len(self.__transform_cache))
+
+    def __compose_transform(self, chain, frameNum):
         # Let's build the transform using atomic transforms (which exist in VCD)
+        static = True
         t_4x4 = np.identity(4, dtype=float)
         root = self.vcd.get_root()
         for counter, value in enumerate(chain):
@@ -680,6 +940,83 @@ class Scene:
 
         return t_4x4, static
 
+    def __get_static_edge_transform(self, cs_1, cs_2):
+        # Transform from cs_1 to cs_2 (adjacent in the tree) using the static pose_wrt_parent
+        coordinate_systems = self.vcd.get_root()['coordinate_systems']
+        if cs_2 == coordinate_systems[cs_1]['parent']:
+            return utils.get_transform_as_matrix4x4(coordinate_systems[cs_1]['pose_wrt_parent'])
+        elif cs_1 == coordinate_systems[cs_2]['parent']:
+            return utils.inv(utils.get_transform_as_matrix4x4(coordinate_systems[cs_2]['pose_wrt_parent']))
+        return np.identity(4)
+
+    def get_transforms(self, cs_src, cs_dst, frames):
+        """
+        Batch version of get_transform for several frames.
+        Static edges of the chain are composed once, and frame-specific edges are composed with batched matrix
+        multiplications (and a batched inverse for the edges defined in the opposite direction).
+        :param cs_src: source coordinate frame (e.g. "vehicle-iso8855")
+        :param cs_dst: destination coordinate frame (e.g. "odom")
+        :param frames: list, range or array of N frame numbers
+        :return: array Nx4x4 of transforms, one per frame
+        """
+        assert (self.vcd.has_coordinate_system(cs_src))
+        assert (self.vcd.has_coordinate_system(cs_dst))
+        frames = np.asarray(frames, dtype=int).reshape(-1)
+        n = frames.size
+        if cs_src == cs_dst:
+            return np.tile(np.identity(4), (n, 1, 1))
+
+        self.__update_transform_cache()
+        chain = self.__get_transform_chain(cs_src, cs_dst)
+        if not self.__is_dynamic_chain(chain):
+            t_4x4, static = self.get_transform(cs_src, cs_dst)
+            return np.tile(t_4x4, (n, 1, 1))
+
+        root_frames = self.vcd.get_root().get('frames', {})
+        frame_transforms = []
+        for frame_num in frames.tolist():
+            frame = root_frames.get(frame_num)
+            frame_transforms.append(frame.get('frame_properties', {}).get('transforms', {}) if frame else {})
+
+        t = np.identity(4)  # becomes Nx4x4 after the first frame-specific edge
+        for cs_1, cs_2 in zip(chain[:-1], chain[1:]):
+            t_name = cs_1 + "_to_" + cs_2
+            t_name_inv = cs_2 + "_to_" + cs_1
+            if t_name not in self.__dynamic_edges and t_name_inv not in self.__dynamic_edges:
+                t = self.__get_static_edge_transform(cs_1, cs_2) @ t
+                continue
+
+            # Frame-specific edge: read the transforms at each frame, or the static pose where missing
+            t_edge = np.empty((n, 4, 4))
+            is_inverse = np.zeros(n, dtype=bool)
+            is_missing = np.zeros(n, dtype=bool)
+            for i, transforms in enumerate(frame_transforms):
+                if t_name in transforms:
+                    t_edge[i] = utils.get_transform_as_matrix4x4(transforms[t_name]['transform_src_to_dst'])
+                elif t_name_inv in transforms:
+                    t_edge[i] = utils.get_transform_as_matrix4x4(transforms[t_name_inv]['transform_src_to_dst'])
+                    is_inverse[i] = True
+                else:
+                    is_missing[i] = True
+            if np.any(is_inverse):
+                t_edge[is_inverse] = np.linalg.inv(t_edge[is_inverse])
+            if np.any(is_missing):
+                t_edge[is_missing] = self.__get_static_edge_transform(cs_1, cs_2)
+            t = t_edge @ t
+
+        if t.ndim == 2:
+            t = np.tile(t, (n, 1, 1))
+        return t
+
+    def transform_points3d_4xN_frames(self, points3d_4xN, cs_src, cs_dst, frames):
+        """
+        Transforms 3D points from cs_src to cs_dst at several frames at once (see get_transforms)
+        :param points3d_4xN: array 4xM of points (the same points at all frames), or Nx4xM (points per frame)
+        :return: array Nx4xM of points in cs_dst, one 4xM block per frame
+        """
+        transforms_Nx4x4 = self.get_transforms(cs_src, cs_dst, frames)
+        return utils.transform_points3d_4xN_batch(points3d_4xN, transforms_Nx4x4)
+
     def transform_points3d_4xN(self, points3d_4xN, cs_src, cs_dst, frameNum=None):
         transform_src_dst, static = self.get_transform(cs_src, cs_dst, frameNum)
         if transform_src_dst is not None:
@@ -697,6 +1034,33 @@ class Scene:
         else:
             return cuboid_vals
 
+    def transform_cuboids(self, cuboids, cs_src, cs_dst, frameNum=None):
+        """
+        Transforms N cuboids (all 9 or all 10 values) from cs_src to cs_dst at once (see utils.transform_cuboids).
+        :param cuboids: list of N cuboid values, or array NxM
+        :return: array NxM of transformed cuboids
+        """
+        if len(cuboids) == 0:
+            return np.zeros((0, 9))
+        transform_src_dst, static = self.get_transform(cs_src, cs_dst, frameNum)
+        return utils.transform_cuboids(cuboids, transform_src_dst)
+
+    def project_cuboids(self, cuboids, cs_src, cs_cam, frameNum=None, apply_distortion=True):
+        """
+        Projects the 8 points of N cuboids (all 9 or all 10 values, expressed in cs_src) into a camera, with one
+        single call to the projection of the camera.
+        :param cuboids: list of N cuboid values, or array NxM
+        :return: array 3x8xN of 2D points (ordered as utils.generate_cuboid_points_ref_4x8), and boolean array 8xN of
+        valid points (e.g. not behind the camera)
+        """
+        n = len(cuboids)
+        if n == 0:
+            return np.zeros((3, 8, 0)), np.zeros((8, 0), dtype=bool)
+        points3d_4x8xN = utils.generate_cuboid_points_ref_4x8xN(cuboids)
+        points2d_3xN, idx_valid = self.project_points3d_4xN(points3d_4x8xN.reshape(4, 8 * n), cs_src, cs_cam,
+                                                            frameNum, apply_distortion=apply_distortion)
+        return points2d_3xN.reshape(3, 8, n), np.asarray(idx_valid, dtype=bool).reshape(8, n)
+
     def transform_plane(self, plane_abcd, cs_src, cs_dst, frameNum=None):
         transform_src_dst, static = self.get_transform(cs_src, cs_dst, frameNum)
         if transform_src_dst is not None:
@@ -705,7 +1069,8 @@ class Scene:
         else:
             return plane_abcd
 
-    def project_points3d_4xN(self, points3d_4xN, cs_src, cs_cam, frameNum=None, apply_distortion=True, remove_outside=False):
+    def project_points3d_4xN(self, points3d_4xN, cs_src, cs_cam, frameNum=None, apply_distortion=True, remove_outside=False,
+                             compact=False):
         """
         This function projects 3D points into a given camera, specifying the origin coordinate system of the points,
         and a certain frame number. Optionally, distortion can be applied or not (e.g. sometimes is useful to project
@@ -716,6 +1081,7 @@ class Scene:
         :param frameNum: frame number (if None, static camera info is seeked)
         :param apply_distortion: default to True, if False, projection is carried out into undistorted domain
         :param remove_outside: flag to invalidate points outside the limits of the image domain
+        :param compact: if True, only valid points are returned, with their indices (see Camera.project_points3d)
         :return: array of 3xN 2D points in image coordinates (distorted or undistorted according to apply_distortion),
         and array of boolean declaring points valid or not
         """
@@ -726,10 +1092,85 @@ class Scene:
             cam = self.get_camera(camera_name=cs_cam, frameNum=frameNum)
             points2d_3xN, idx_valid = cam.project_points3d(points3d_4xN=points3d_camera_cs_4xN,
                                                            apply_distortion=apply_distortion,
-                                                           remove_outside=remove_outside)
+                                                           remove_outside=remove_outside,
+                                                           compact=compact)
             return points2d_3xN, idx_valid
         return np.array([[]]), []
 
+    def project_points3d_multi(self, points3d_4xN, cs_src, cameras, frameNum=None, apply_distortion=True,
+                               remove_outside=False, compact=False, max_workers=None):
+        """
+        This function projects the same 3D points into several cameras (e.g. a lidar point cloud into all the cameras
+        of a rig). The points are transformed into all the cameras with one batched multiplication, and the
+        projections run in a thread pool (NumPy and OpenCV release the GIL).
+        :param points3d_4xN: array of 4xN 3D points in cs_src coordinate system
+        :param cs_src: name of coordinate system of the points
+        :param cameras: list of camera names
+        :param frameNum: frame number (if None, static camera info is seeked)
+        :param apply_distortion: default to True, if False, projection is carried out into undistorted domain
+        :param remove_outside: flag to invalidate points outside the limits of the image domain
+        :param compact: if True, only valid points are returned, with their indices (see Camera.project_points3d)
+        :param max_workers: number of threads (None for the default of ThreadPoolExecutor, 1 to run sequentially)
+        :return: dictionary {camera_name: (points2d_3xN, idx_valid)}, as returned by project_points3d_4xN
+        """
+        cameras = list(cameras)
+        if len(cameras) == 0:
+            return dict()
+        cams = [self.get_camera(camera_name=cs_cam, frameNum=frameNum) for cs_cam in cameras]
+        transforms_Cx4x4 = np.array([self.get_transform(cs_src, cs_cam, frameNum)[0] for cs_cam in cameras])
+        points3d_cams_Cx4xN = utils.transform_points3d_4xN_batch(points3d_4xN, transforms_Cx4x4)
+
+        def project(i):
+            if cams[i] is None:
+                return np.array([[]]), []
+            return cams[i].project_points3d(points3d_4xN=points3d_cams_Cx4xN[i],
+                                            apply_distortion=apply_distortion,
+                                            remove_outside=remove_outside,
+                                            compact=compact)
+
+        if max_workers == 1 or len(cameras) == 1:
+            results = [project(i) for i in range(0, len(cameras))]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(project, range(0, len(cameras))))
+        return dict(zip(cameras, results))
+
+    def project_points3d_range_image(self, points3d_4xN, cs_src, cs_lidar, frameNum=None, intensities_N=None):
+        """
+        This function renders 3D points of any coordinate system (e.g. a point cloud, or the points of a mesh) into the
+        range image of a lidar (see Lidar.range_image).
+        :param points3d_4xN: array of 4xN 3D points in cs_src coordinate system
+        :param cs_src: name of coordinate system of the points
+        :param cs_lidar: name of the lidar (stream and coordinate system)
+        :param frameNum: frame number (if None, static lidar info is seeked)
+        :param intensities_N: optional array of N intensities
+        :return: range image HxW, intensity image HxW (or None) and index image HxW, or None if the lidar or the
+        transform are not found
+        """
+        lidar = self.get_lidar(cs_lidar, frameNum)
+        if lidar is None:
+            return None
+        points3d_lidar_4xN = self.transform_points3d_4xN(points3d_4xN, cs_src, cs_lidar, frameNum)
+        if points3d_lidar_4xN is None:
+            return None
+        return lidar.range_image(points3d_lidar_4xN, intensities_N)
+
+    def reproject_range_image(self, range_HxW, cs_lidar, cs_dst, frameNum=None):
+        """
+        This function converts a range image of a lidar back into 3D points in cs_dst coordinate system (see
+        Lidar.reproject_range_image).
+        :return: array 4xM of 3D points and array M of flat pixel indices, or None if the lidar or the transform
+        are not found
+        """
+        lidar = self.get_lidar(cs_lidar, frameNum)
+        if lidar is None:
+            return None
+        points3d_lidar_4xM, idx = lidar.reproject_range_image(range_HxW)
+        points3d_dst_4xM = self.transform_points3d_4xN(points3d_lidar_4xM, cs_lidar, cs_dst, frameNum)
+        if points3d_dst_4xM is None:
+            return None
+        return points3d_dst_4xM, idx
+
     def reproject_points2d_3xN(self, points2d_3xN, plane, cs_cam, cs_dst, frameNum=None, apply_undistorsion=True):
         # This function calls a camera (cs_cam) to reproject points2d in the image plane into
         # a plane defined in the cs_dst.
@@ -747,6 +1188,142 @@ class Scene:
             return points3d_4xN_cs_dst, idx_valid
         return np.array([[]]), []
 
+    def compute_visibility(self, camera_name, frame_nums=None, data_names=None, scale=0.25, near=0.1, num_name=None,
+                           processes=1, chunksize=16):
+        """
+        Visibility ratios (fraction of the pixels not occluded by other objects) of the cuboids and meshes of the
+        objects of several frames in a camera, rendered into a depth buffer at reduced resolution (see
+        visibility.compute_visibility).
+        :param camera_name: name of the camera
+        :param frame_nums: frame numbers (all the frames of the VCD if None)
+        :param data_names: names of the cuboid and mesh object_data to render (all if None)
+        :param scale: resolution of the depth buffer with respect to the image
+        :param near: minimum depth of the rendered surfaces
+        :param num_name: if not None, the ratios are written into the VCD as num object_data with this name
+        :param processes: number of worker processes (os.cpu_count() if None); 1 (default) renders in this process
+        :param chunksize: number of frames sent to a worker at a time
+        :return: list of visibility.FrameVisibility
+        """
+        return visibility.compute_visibility(self, camera_name, frame_nums, data_names, scale, near, num_name,
+                                             processes, chunksize)
+
+    def compute_bboxes_from_cuboids(self, cs_cam, frameNum, data_name='box3D', semantic_types=None):
+        """
+        2D boxes of the cuboids of the objects at a frame, projected into a camera (with distortion) all at once,
+        and clipped to the image. Static cuboids are used for objects at the frame without a frame-specific one.
+        :param cs_cam: name of the camera
+        :param frameNum: frame number
+        :param data_name: name of the cuboid object_data
+        :param semantic_types: list of the semantic types of the objects to consider (all if None)
+        :return: list of N uids and array Nx4 of boxes (x, y, w, h) as in utils.bounding_rect, only for the cuboids
+        with a visible part in the image, or None if the frame or the camera do not exist
+        """
+        frame = self.vcd.get_frame(frameNum)
+        cam = self.get_camera(cs_cam, frameNum)
+        if frame is None or cam is None:
+            return None
+        objects = self.vcd.get_root().get('objects', {})
+        cuboids_by_cs = {}  # {(cs_src, number of values): ([uid], [cuboid values])}
+        for uid_str, object_in_frame in frame.get('objects', {}).items():
+            obj = objects.get(uid_str, {})
+            if semantic_types is not None and obj.get('type') not in semantic_types:
+                continue
+            for container in (object_in_frame, obj):
+                cuboid = next((object_data for object_data in container.get('object_data', {}).get('cuboid', [])
+                               if object_data['name'] == data_name), None)
+                if cuboid is not None:
+                    cs_src = cuboid.get('coordinate_system', obj.get('coordinate_system')) or cs_cam
+                    entry = cuboids_by_cs.setdefault((cs_src, len(cuboid['val'])), ([], []))
+                    entry[0].append(uid_str)
+                    entry[1].append(cuboid['val'])
+                    break
+
+        uids = []
+        rects = []
+        for (cs_src, _), (uids_cs, cuboids) in cuboids_by_cs.items():
+            points2d_3x8xN, idx_valid_8xN = self.project_cuboids(cuboids, cs_src, cs_cam, frameNum)
+            rects_Nx4, valid = utils.bounding_rects(points2d_3x8xN, idx_valid_8xN, (cam.width, cam.height))
+            uids.extend([uid for uid, is_valid in zip(uids_cs, valid.tolist()) if is_valid])
+            rects.append(rects_Nx4[valid])
+        return uids, np.vstack(rects) if rects else np.zeros((0, 4), dtype=np.intp)
+
+    def add_bboxes_from_cuboids(self, cameras, bbox_names=None, frame_nums=None, data_name='box3D',
+                                semantic_types=None, processes=1, chunksize=16):
+        """
+        Derives the 2D boxes of the cuboids of the objects at several frames in several cameras (see
+        compute_bboxes_from_cuboids), and writes them as bbox object_data, one series per object and camera (see
+        core.VCD.add_object_data_series). With processes > 1, frames are projected in a pool of worker processes, which
+        receive the scene once, and their results are merged in this process.
+        :param cameras: list of camera names
+        :param bbox_names: list with the name of the bbox of each camera (data_name + '_' + camera name if None)
+        :param frame_nums: frame numbers (all the frames of the VCD if None)
+        :param data_name: name of the cuboid object_data
+        :param semantic_types: list of the semantic types of the objects to consider (all if None)
+        :param processes: number of worker processes (os.cpu_count() if None); 1 (default) projects in this process
+        :param chunksize: number of frames sent to a worker at a time
+        :return: number of boxes written
+        """
+        cameras = list(cameras)
+        if bbox_names is None:
+            bbox_names = [data_name + '_' + cam_name for cam_name in cameras]
+        assert(len(bbox_names) == len(cameras))
+        if frame_nums is None:
+            frame_nums = [frame_num for frame_start, frame_end in sorted(self.vcd.get_frame_intervals().get())
+                          for frame_num in range(frame_start, frame_end + 1)]
+        if processes is None:
+            processes = os.cpu_count() or 1
+        args = (cameras, data_name, semantic_types)
+
+        if processes <= 1:
+            results = (_compute_frame_bboxes(self, frame_num, *args) for frame_num in frame_nums)
+            series = _merge_frame_bboxes(results, len(cameras))
+        else:
+            with multiprocessing.Pool(processes, initializer=_init_bboxes_worker, initargs=(self, args)) as pool:
+                series = _merge_frame_bboxes(pool.imap(_compute_frame_bboxes_worker, frame_nums, chunksize),
+                                             len(cameras))
+
+        count = 0
+        for c, cam_name in enumerate(cameras):
+            for uid, (frames, rects) in series[c].items():
+                self.vcd.add_object_data_series(uid, types.ObjectDataType.bbox, bbox_names[c], frames,
+                                                np.array(rects).reshape(-1, 4), coordinate_system=cam_name)
+                count += len(frames)
+        return count
+
+
+def _compute_frame_bboxes(scene, frame_num, cameras, data_name, semantic_types):
+    # (frame_num, [(uids, rects_Nx4) or None per camera])
+    return frame_num, [scene.compute_bboxes_from_cuboids(cam_name, frame_num, data_name, semantic_types)
+                       for cam_name in cameras]
+
+
+def _merge_frame_bboxes(results, num_cameras):
+    # Per camera: {uid: ([frame_num], [rect])}
+    series = [dict() for _ in range(num_cameras)]
+    for frame_num, results_cams in results:
+        for c, result in enumerate(results_cams):
+            if result is None:
+                continue
+            for uid, rect in zip(result[0], result[1].tolist()):
+                entry = series[c].setdefault(uid, ([], []))
+                entry[0].append(frame_num)
+                entry[1].append(rect)
+    return series
+
+
+# Per worker process of Scene.add_bboxes_from_cuboids: (scene, (cameras, data_name, semantic_types))
+_bboxes_worker_args = None
+
+
+def _init_bboxes_worker(scene, args):
+    global _bboxes_worker_args
+    _bboxes_worker_args = (scene, args)
+
+
+def _compute_frame_bboxes_worker(frame_num):
+    scene, args = _bboxes_worker_args
+    return _compute_frame_bboxes(scene, frame_num, *args)
+
 
 class Sensor:
     def __init__(self, name, description, uri, **properties):
@@ -778,9 +1355,38 @@ class Camera(Sensor):
         # They should render equal or very-similar results
         # OpenCV version might be faster (TBC)
         self.use_opencv = False
-        pass
+        self.__pixel_rays3d = {}  # {scale: rays3d_3xHxW}, see get_pixel_rays3d
 
-    def project_points3d(self, points3d_4xN, apply_distortion=True, remove_outside=False):
+    def get_pixel_rays3d(self, scale=1.0):
+        """
+        Rays of the pixel centers of the image resized by scale (e.g. 0.25 for a quarter of the width and height),
+        computed once per scale with reproject_points2d (distortion included).
+        Pixel (i, j) of the resized image has its center at ((j + 0.5) / scale - 0.5, (i + 0.5) / scale - 0.5) in the
+        original image.
+        :param scale: factor of the resized image
+        :return: array 3xHxW of rays in the camera coordinate system, with z = 1 (NaN for pixels without a valid ray
+        in front of the camera, e.g. beyond 90 degrees of a fisheye lens)
+        """
+        if scale not in self.__pixel_rays3d:
+            width = int(np.ceil(self.width * scale))
+            height = int(np.ceil(self.height * scale))
+            cols, rows = np.meshgrid((np.arange(width) + 0.5) / scale - 0.5, (np.arange(height) + 0.5) / scale - 0.5)
+            points2d_3xN = np.vstack((cols.reshape(-1), rows.reshape(-1), np.ones(width * height)))
+            points3d_4xN, idx_valid = self.reproject_points2d(points2d_3xN, (0.0, 0.0, 1.0, -1.0))
+            rays3d_3xN = np.full((3, width * height), np.nan)
+            rays3d_3xN[:, idx_valid] = points3d_4xN[0:3, idx_valid]
+
+            # Rays behind the camera are mirrored by the plane z = 1: keep only those projected back onto their pixel
+            # (far away, where the translation of a camera_matrix_3x4, e.g. a stereo baseline, is negligible)
+            points2d_rep_3xN, idx_valid_rep = self.project_points3d(np.vstack((rays3d_3xN * 1e4,
+                                                                               np.ones(width * height))))
+            with np.errstate(invalid='ignore'):
+                error = np.linalg.norm(points2d_rep_3xN[0:2, :] - points2d_3xN[0:2, :], axis=0)
+                rays3d_3xN[:, ~(error < 1.0)] = np.nan
+            self.__pixel_rays3d[scale] = rays3d_3xN.reshape(3, height, width)
+        return self.__pixel_rays3d[scale]
+
+    def project_points3d(self, points3d_4xN, apply_distortion=True, remove_outside=False, compact=False):
         pass
 
     def reproject_points2d(self, points2d_3xN, plane_cs):
@@ -799,7 +1405,8 @@ class CameraPinhole(Camera):
     Otherwise (5 or more), it is assumed to be traditional "radial" distortion, as in:
     https://docs.opencv.org/4.2.0/d9/d0c/group__calib3d.html
     '"""
-    def __init__(self, camera_intrinsics, name, description, uri, compute_remaps=False):
+    def __init__(self, camera_intrinsics, name, description, uri, compute_remaps=False, remap_cache_dir=None):
+        self.remap_cache_dir = remap_cache_dir
         self.K_3x4 = np.array(camera_intrinsics['camera_matrix_3x4']).reshape(3, 4)
         rows, cols, = self.K_3x4.shape
         assert (rows == 3 and cols == 4)
@@ -859,7 +1466,18 @@ class CameraPinhole(Camera):
             return False
         return True
 
+    def compute_remaps(self):
+        # Computes the undistortion maps, if not computed yet (they are used by undistort_image)
+        if self.is_distorted() and not self.__has_remaps():
+            self.__compute_remaps()
+
     def __compute_remaps(self):
+        if self.remap_cache_dir is not None:
+            key = get_remaps_cache_key('CameraPinhole', self.K_3x3, self.d_1xN, self.K_und_3x3, self.img_size_undist)
+            self.mapX_to_und_16SC2, self.mapY_to_und_16SC2 = load_remaps(self.remap_cache_dir, key)
+            if self.__has_remaps():
+                return
+
         start = time.time()
         self.mapX_to_und_16SC2, self.mapY_to_und_16SC2 = cv.initUndistortRectifyMap(self.K_3x3, self.d_1xN,
                                                                                     R=np.eye(3),
@@ -869,6 +1487,9 @@ class CameraPinhole(Camera):
         end = time.time()
         print("CameraPinhole(radial): Compute remaps for undistortion... ", end - start)
 
+        if self.remap_cache_dir is not None:
+            save_remaps(self.remap_cache_dir, key, self.mapX_to_und_16SC2, self.mapY_to_und_16SC2)
+
     def __test_undistortion(self, img, img_und):
         # Let's test if we project a 3D point into the distorted image
         # and into the undistorted image
@@ -1002,7 +1623,7 @@ class CameraPinhole(Camera):
 
         return rays3d_dist_3xN
 
-    def project_points3d(self, points3d_4xN, apply_distortion=True, remove_outside=False):
+    def project_points3d(self, points3d_4xN, apply_distortion=True, remove_outside=False, compact=False):
         """
         This function projects 3D points into 2D points using the camera projection.
         All coordinates as homogeneous coordinates, and all 3D elements expressed wrt the camera coordinate system.
@@ -1020,6 +1641,8 @@ class CameraPinhole(Camera):
         :param points3d_4xN: 3D points in camera cs, homogeneous coordinates
         :param apply_distortion: flag to determine whether to project into distorted or undistorted domain
         :param remove_outside: flag to remove points that fall outside the limits of the target image
+        :param compact: if True, only the valid points are returned (3xM), with their indices (M) instead of the
+        boolean array, which avoids filling a 3xN array with NaN
         :return: 2D points in image plane, as 3xN array, in hom. coordinates, and boolean array of valid
         """
 
@@ -1030,63 +1653,49 @@ class CameraPinhole(Camera):
             return np.array([[]]), []
 
         # 1.- Select only those z > 0 (in front of the camera)
-        idx_in_front = points3d_4xN[2, :] > 1e-8
-        idx_valid = idx_in_front
-        rays3d_3xN_filt = points3d_4xN[0:3, idx_valid]
-
-        # 2.- Distort rays3d if distorted        
-        rays3d_3xN = np.full([3, N], np.nan) # init with NaN       
-        rays3d_3xN[:, idx_valid] = rays3d_3xN_filt  # copy filtered points
+        idx = np.flatnonzero(points3d_4xN[2, :] > 1e-8)
+        rays3d_3xM = points3d_4xN[0:3, idx]
 
+        # 2.- Distort rays3d if distorted
         if self.is_distorted():
             # Cameras with distortion: need to first apply distortion model
-            if not self.is_fisheye:
+            if not self.is_fisheye and self.r_limit is not None:
                 # Pinhole distortion
-                if self.r_limit is not None:
-                    #rays3d_3xN_filt = rays3d_3xN_filt[0:3, :] / rays3d_3xN_filt[2, :]  # so (x', y', 1), convenient for dist.     (this is done inside distort_rays)   
-                    
-                    # Some cameras have a valid radius limit: extreme points are wierdly distorted, it is better to keep them as NaN
-                    for i in range(0, N):
-                        if idx_valid[i]:  # ignore those already filtered
-                            xp = rays3d_3xN[0, i] / rays3d_3xN[2, i]  # this is x'=x/z as in opencv docs
-                            yp = rays3d_3xN[1, i] / rays3d_3xN[2, i]  # this is y'=y/z
-                            r = np.sqrt(xp * xp + yp * yp)
-
-                            if r >= self.r_limit * 0.8:  # 0.8 to also remove very close to limit
-                                idx_valid[i] = False
-                                rays3d_3xN[:, i] = np.nan
-
-            if apply_distortion:
-                # Now distort (only non-nans)
-                rays3d_3xN_filt = rays3d_3xN[:, idx_valid]
-                rays3d_3xN_filt_dist = self.distort_rays3d(rays3d_3xN_filt) # no nan should go into it
-
-                # Add nans
-                #rays3d_3xN = np.full([3, N], np.nan)
-                rays3d_3xN[:, idx_valid] = rays3d_3xN_filt_dist
+                # Some cameras have a valid radius limit: extreme points are wierdly distorted, it is better to keep them as NaN
+                xp = rays3d_3xM[0, :] / rays3d_3xM[2, :]  # this is x'=x/z as in opencv docs
+                yp = rays3d_3xM[1, :] / rays3d_3xM[2, :]  # this is y'=y/z
+                r = np.sqrt(xp * xp + yp * yp)
+                inside_limit = ~(r >= self.r_limit * 0.8)  # 0.8 to also remove very close to limit
+                idx = idx[inside_limit]
+                rays3d_3xM = rays3d_3xM[:, inside_limit]
+
+            if apply_distortion and rays3d_3xM.shape[1] > 0:
+                rays3d_3xM = self.distort_rays3d(rays3d_3xM)
 
         # 3.- Project using calibration matrix
         if apply_distortion:
-            #points2d_3xN = self.K_3x3 @ rays3d_3xN    
-
-            #rays3d_3xN /= np.linalg.norm(rays3d_3xN)  # normalize to 1
-            rays3d_4xN = np.vstack((rays3d_3xN, np.ones(rays3d_3xN.shape[1])))
-            points2d_3xN = self.K_3x4 @ rays3d_4xN
-            points2d_3xN /= points2d_3xN[2,:]
-
-            if remove_outside:
-                points2d_3xN, idx_valid = utils.filter_outside(points2d_3xN, self.img_size_dist, idx_valid)
+            K_3x4 = self.K_3x4
+            img_size = self.img_size_dist
         else:
-            #points2d_3xN = self.K_und_3x3 @ rays3d_3xN
-            
-            #rays3d_3xN /= np.linalg.norm(rays3d_3xN)  # normalize to 1
-            rays3d_4xN = np.vstack((rays3d_3xN, np.ones(rays3d_3xN.shape[1])))
-            points2d_3xN = self.K_und_3x4 @ rays3d_4xN
-            points2d_3xN /= points2d_3xN[2,:]
-
-            if remove_outside:
-                points2d_3xN, idx_valid = utils.filter_outside(points2d_3xN, self.img_size_undist, idx_valid)
-
+            K_3x4 = self.K_und_3x4
+            img_size = self.img_size_undist
+        rays3d_4xM = np.vstack((rays3d_3xM, np.ones(rays3d_3xM.shape[1])))
+        points2d_3xM = K_3x4 @ rays3d_4xM
+        points2d_3xM /= points2d_3xM[2, :]
+
+        if remove_outside:
+            points2d_3xM, idx_inside = utils.filter_outside(points2d_3xM, img_size,
+                                                            np.ones(idx.size, dtype=bool), compact=True)
+            idx = idx[idx_inside]
+
+        if compact:
+            return points2d_3xM, idx
+
+        # Back to N points, with NaN for the invalid ones
+        points2d_3xN = np.full([3, N], np.nan)
+        points2d_3xN[:, idx] = points2d_3xM
+        idx_valid = np.zeros(N, dtype=bool)
+        idx_valid[idx] = True
         return points2d_3xN, idx_valid
 
     def reproject_points2d(self, points2d_3xN, plane_cs, apply_undistorsion = True):
@@ -1116,41 +1725,18 @@ class CameraPinhole(Camera):
         N = points2d_und_3xN.shape[1]
         if N == 0:
             return np.array([[]]), []
-        idx_valid = [True] * N
 
         # Get ray 3D (expressed in camera coordinate system)
         rays3d_3xN = self.get_rays3d(points2d_und_3xN, self.K_und_3x3)
 
-        # Use Plucker intersection line-plane
-        # Create Plucker line using 2 points: origin of camera and origin of camera + ray
-        P1 = np.vstack((0, 0, 0, 1))
-        P2array = np.vstack((rays3d_3xN, np.ones((1, N))))
-        # Plane equation in plucker coordinates (wrt to world)
-        P = np.asarray(plane_cs).reshape(4, 1)
-        # Line equation in plucker coordinates
-        p3dNx4 = np.array([])
-        count = 0
-        for P2 in P2array.T:
-            P2 = P2.reshape(4, 1)
-            L = np.matmul(P1, np.transpose(P2)) - np.matmul(P2, np.transpose(P1))
-            # Intersection is a 3D point
-            p3Dlcs = np.matmul(L, P)
-            if p3Dlcs[3][0] != 0:
-                p3Dlcs /= p3Dlcs[3][0]  # homogeneous
-            else:
-                # This is an infinite point: return direction vector instead
-                norm = np.linalg.norm(p3Dlcs[:3][0])
-                p3Dlcs /= norm
-                idx_valid[count] = False
-            p3dNx4 = np.append(p3dNx4, p3Dlcs)
-            count += 1
-        p3dNx4 = p3dNx4.reshape(p3dNx4.shape[0] // 4, 4)
-        p3d_4xN = np.transpose(p3dNx4)
+        # Use Plucker intersection line-plane (line from the origin of camera through the ray)
+        p3d_4xN, idx_valid = utils.intersect_rays3d_plane(rays3d_3xN, plane_cs)
         return p3d_4xN, idx_valid
 
 
 class CameraFisheye(Camera):
-    def __init__(self, camera_intrinsics, name, description, uri, compute_remaps=False):
+    def __init__(self, camera_intrinsics, name, description, uri, compute_remaps=False, remap_cache_dir=None):
+        self.remap_cache_dir = remap_cache_dir
         self.cx = camera_intrinsics['center_x']
         self.cy = camera_intrinsics['center_y']
         self.img_size_dist = (camera_intrinsics['width_px'], camera_intrinsics['height_px'])
@@ -1192,13 +1778,27 @@ class CameraFisheye(Camera):
             return False
         return True
 
+    def compute_remaps(self):
+        # Computes the undistortion maps, if not computed yet (they are used by undistort_image)
+        if self.is_distorted() and not self.__has_remaps():
+            self.__compute_remaps()
+
     def __compute_remaps(self):
+        if self.remap_cache_dir is not None:
+            key = get_remaps_cache_key('CameraFisheye', self.K_3x3, self.d_1x4, self.K_und_3x3, self.img_size_undist)
+            self.mapX_to_und_16SC2, self.mapY_to_und_16SC2 = load_remaps(self.remap_cache_dir, key)
+            if self.__has_remaps():
+                return
+
         start = time.time()
         self.mapX_to_und_16SC2, self.mapY_to_und_16SC2 = self.init_undistort_rectify_map(self.K_und_3x3,
                                                                                          self.img_size_undist)
         end = time.time()
         print("CameraFisheye: Compute remaps for undistortion... ", end - start)
 
+        if self.remap_cache_dir is not None:
+            save_remaps(self.remap_cache_dir, key, self.mapX_to_und_16SC2, self.mapY_to_und_16SC2)
+
     def __apply_polynomial(self, x, k1, k2, k3, k4):
         x2 = x * x
         x3 = x2 * x
@@ -1268,25 +1868,21 @@ class CameraFisheye(Camera):
             rays3d_und_3xN = np.array([[]])
             return rays3d_und_3xN
 
-        rays3d_und_3xN = np.zeros((3, N))
-        for i in range(0, N):
-            X = rays3d_dist_3xN[0, i]
-            Y = rays3d_dist_3xN[1, i]
-            rp = utils.norm([X, Y])
-            a = self.__apply_polynomial(rp, self.d_inv_1x4[0, 0],
-                                         self.d_inv_1x4[0, 1],
-                                         self.d_inv_1x4[0, 2],
-                                         self.d_inv_1x4[0, 3])
-            r = math.tan(a)
-            r_rp = np.float(r / rp)
-            if rp > 1e-8:
-                rays3d_und_3xN[0, i] = X * r_rp
-                rays3d_und_3xN[1, i] = Y * r_rp
-                rays3d_und_3xN[2, i] = 1
-            else:
-                rays3d_und_3xN[0, i] = 0
-                rays3d_und_3xN[1, i] = 0
-                rays3d_und_3xN[2, i] = 1
+        X = rays3d_dist_3xN[0, :]
+        Y = rays3d_dist_3xN[1, :]
+        rp = np.sqrt(X * X + Y * Y)
+        a = self.__apply_polynomial(rp, self.d_inv_1x4[0, 0],
+                                     self.d_inv_1x4[0, 1],
+                                     self.d_inv_1x4[0, 2],
+                                     self.d_inv_1x4[0, 3])
+        r = np.tan(a)
+
+        # Rays too close to the optical axis are set to (0, 0, 1)
+        valid = rp > 1e-8
+        r_rp = np.divide(r, rp, out=np.zeros(N), where=valid)
+        rays3d_und_3xN = np.ones((3, N))
+        rays3d_und_3xN[0, :] = np.where(valid, X * r_rp, 0.0)
+        rays3d_und_3xN[1, :] = np.where(valid, Y * r_rp, 0.0)
 
         return rays3d_und_3xN
 
@@ -1301,27 +1897,23 @@ class CameraFisheye(Camera):
             rays3d_dist_3xN = np.array([[]])
             return rays3d_dist_3xN
 
-        rays3d_dist_3xN = np.zeros((3, N))
-        for i in range(0, N):
-            X = rays3d_3xN[0, i]
-            Y = rays3d_3xN[1, i]
-            Z = rays3d_3xN[2, i]
-            r = utils.norm([X, Y])
-            a = math.atan2(r, Z)
-            rp = self.__apply_polynomial(a, self.d_1x4[0, 0], self.d_1x4[0, 1], self.d_1x4[0, 2], self.d_1x4[0, 3])
-            rp_r = np.float(rp/r)
-            if r > 1e-8:
-                rays3d_dist_3xN[0, i] = X*rp_r
-                rays3d_dist_3xN[1, i] = Y*rp_r
-                rays3d_dist_3xN[2, i] = 1
-            else:
-                rays3d_dist_3xN[0, i] = 0
-                rays3d_dist_3xN[1, i] = 0
-                rays3d_dist_3xN[2, i] = 1
+        X = rays3d_3xN[0, :]
+        Y = rays3d_3xN[1, :]
+        Z = rays3d_3xN[2, :]
+        r = np.sqrt(X * X + Y * Y)
+        a = np.arctan2(r, Z)
+        rp = self.__apply_polynomial(a, self.d_1x4[0, 0], self.d_1x4[0, 1], self.d_1x4[0, 2], self.d_1x4[0, 3])
+
+        # Rays too close to the optical axis are set to (0, 0, 1)
+        valid = r > 1e-8
+        rp_r = np.divide(rp, r, out=np.zeros(N), where=valid)
+        rays3d_dist_3xN = np.ones((3, N))
+        rays3d_dist_3xN[0, :] = np.where(valid, X * rp_r, 0.0)
+        rays3d_dist_3xN[1, :] = np.where(valid, Y * rp_r, 0.0)
 
         return rays3d_dist_3xN
 
-    def project_points3d(self, points3d_4xN, apply_distortion=True, remove_outside=False):
+    def project_points3d(self, points3d_4xN, apply_distortion=True, remove_outside=False, compact=False):
         """
         This function projects 3d points in camera coordinate system using the angle-of-incidence projection model.
         Any 3D point in space P=(X,Y,Z,1)^T has a radius with respect to the optical axis Z
@@ -1340,6 +1932,8 @@ class CameraFisheye(Camera):
         :param points3d_4xN: 3D points in camera coordinate system
         :param apply_distortion: boolean to obtain points in the distorted domain.
         :param remove_outside: filter out points that fall outside the limits of the image frame.
+        :param compact: if True, only the valid points are returned (3xM), with their indices (M) instead of the
+        boolean array
         :return: 2D points in image plane, as 3xN array, in hom. coordinates, and boolean array of valid
         """
         # 0.- Pre-filter
@@ -1349,41 +1943,36 @@ class CameraFisheye(Camera):
             return np.array([[]]), []
 
         # 1.- Select only those z > 0 (in front of the camera)
-        idx_in_front = points3d_4xN[2, :] > 1e-8
-        idx_valid = idx_in_front
+        idx = np.flatnonzero(points3d_4xN[2, :] > 1e-8)
+        rays3d_3xM = points3d_4xN[0:3, idx] / points3d_4xN[2, idx]  # so (x', y', 1), convenient for dist.
 
         # 2.- Distort rays3d if distorted
-        rays3d_3xN_filt = points3d_4xN[0:3, idx_valid]
-        rays3d_3xN_filt = rays3d_3xN_filt[0:3, :] / rays3d_3xN_filt[2, :]  # so (x', y', 1), convenient for dist.
-        rays3d_3xN = np.full([3, N], np.nan)
-        rays3d_3xN[:, idx_valid] = rays3d_3xN_filt
-
-        if apply_distortion:
-            # Now distort (only non-nans)
-            rays3d_3xN_filt = rays3d_3xN[:, idx_valid]
-            rays3d_3xN_filt_dist = self.distort_rays3d(rays3d_3xN_filt)  # no nan should go into it
-
-
-            # DEBUG
-            #temp = self.undistort_rays3d(rays3d_3xN_filt_dist)
-            #error = np.linalg.norm(rays3d_3xN_filt - temp)
-
-            # Add nans
-            rays3d_3xN = np.full([3, N], np.nan)
-            rays3d_3xN[:, idx_valid] = rays3d_3xN_filt_dist
+        if apply_distortion and self.is_distorted() and rays3d_3xM.shape[1] > 0:
+            rays3d_3xM = self.distort_rays3d(rays3d_3xM)
 
         # 3.- Project using calibration matrix
         if apply_distortion:
-            points2d_3xN = self.K_3x3.dot(rays3d_3xN)
-            if remove_outside:
-                points2d_3xN, idx_valid = utils.filter_outside(points2d_3xN, self.img_size_dist, idx_valid)
+            points2d_3xM = self.K_3x3.dot(rays3d_3xM)
+            img_size = self.img_size_dist
         else:
             if not self.__has_remaps():
                 self.__compute_remaps()
-            points2d_3xN = self.K_und_3x3.dot(rays3d_3xN)
-            if remove_outside:
-                points2d_3xN, idx_valid = utils.filter_outside(points2d_3xN, self.img_size_undist, idx_valid)
-
+            points2d_3xM = self.K_und_3x3.dot(rays3d_3xM)
+            img_size = self.img_size_undist
+
+        if remove_outside:
+            points2d_3xM, idx_inside = utils.filter_outside(points2d_3xM, img_size,
+                                                            np.ones(idx.size, dtype=bool), compact=True)
+            idx = idx[idx_inside]
+
+        if compact:
+            return points2d_3xM, idx
+
+        # Back to N points, with NaN for the invalid ones
+        points2d_3xN = np.full([3, N], np.nan)
+        points2d_3xN[:, idx] = points2d_3xM
+        idx_valid = np.zeros(N, dtype=bool)
+        idx_valid[idx] = True
         return points2d_3xN, idx_valid
 
     def init_undistort_rectify_map(self, K_und_3x3, img_size_undist):
@@ -1468,7 +2057,6 @@ class CameraFisheye(Camera):
         N = points2d_3xN.shape[1]
         if N == 0:
             return np.array([[]]), []
-        idx_valid = [True] * N
 
         # Undistort rays
         if apply_undistorsion:
@@ -1480,29 +2068,154 @@ class CameraFisheye(Camera):
             rays3d_dist_3xN = utils.inv(self.K_und_3x3).dot(points2d_3xN)
             rays3d_3xN = rays3d_dist_3xN
 
-        # Use Plucker intersection line-plane
-        # Create Plucker line using 2 points: origin of camera and origin of camera + ray
-        P1 = np.vstack((0, 0, 0, 1))
-        P2array = np.vstack((rays3d_3xN, np.ones((1, N))))
-        # Plane equation in plucker coordinates (wrt to world)
-        P = np.asarray(plane_cs).reshape(4, 1)
-        # Line equation in plucker coordinates
-        p3dNx4 = np.array([])
-        count = 0
-        for P2 in P2array.T:
-            P2 = P2.reshape(4, 1)
-            L = np.matmul(P1, np.transpose(P2)) - np.matmul(P2, np.transpose(P1))
-            # Intersection is a 3D point
-            p3Dlcs = np.matmul(L, P)
-            if p3Dlcs[3][0] != 0:
-                p3Dlcs /= p3Dlcs[3][0]  # homogeneous
-            else:
-                # This is an infinite point: return direction vector instead
-                norm = np.linalg.norm(p3Dlcs[:3][0])
-                p3Dlcs /= norm
-                idx_valid[count] = False
-            p3dNx4 = np.append(p3dNx4, p3Dlcs)
-            count += 1
-        p3dNx4 = p3dNx4.reshape(p3dNx4.shape[0] // 4, 4)
-        p3d_4xN = np.transpose(p3dNx4)
+        # Use Plucker intersection line-plane (line from the origin of camera through the ray)
+        p3d_4xN, idx_valid = utils.intersect_rays3d_plane(rays3d_3xN, plane_cs)
         return p3d_4xN, idx_valid
+
+
+class Lidar(Sensor):
+    """
+    The Lidar model is a spherical (range) image: each row is a beam, with its elevation angle, and each column an
+    azimuth step. The lidar coordinate system has x forward, y left and z up. Row 0 is the highest beam, and column
+    0 the highest azimuth (left), so the forward direction is at the center of a 360-degree image.
+
+    It is built from the intrinsics_custom of the stream_properties of a stream of type lidar:
+    - width_px: number of columns
+    - beam_elevations_deg: elevation angle of each beam (any order), or
+      vertical_fov_deg ([min, max]) and height_px, for evenly spaced beams
+    - horizontal_fov_deg: [min, max] azimuth (optional, default [-180, 180])
+    - min_range, max_range: limits of valid ranges (optional)
+    """
+    def __init__(self, lidar_intrinsics, name, description, uri):
+        Sensor.__init__(self, name, description, uri)
+        self.width = int(lidar_intrinsics['width_px'])
+        if 'beam_elevations_deg' in lidar_intrinsics:
+            elevations = np.sort(np.radians(np.array(lidar_intrinsics['beam_elevations_deg'], dtype=float)))[::-1]
+        else:
+            vfov = np.radians(np.array(lidar_intrinsics['vertical_fov_deg'], dtype=float))
+            elevations = np.linspace(vfov[1], vfov[0], int(lidar_intrinsics['height_px']))
+        assert(elevations.shape[0] >= 2)
+        self.elevations = elevations  # descending, one per row
+        self.height = elevations.shape[0]
+
+        hfov = np.radians(np.array(lidar_intrinsics.get('horizontal_fov_deg', [-180.0, 180.0]), dtype=float))
+        self.azimuth_min = hfov[0]
+        self.azimuth_max = hfov[1]
+        self.azimuth_step = (self.azimuth_max - self.azimuth_min) / self.width
+        self.is_360 = abs((self.azimuth_max - self.azimuth_min) - 2 * np.pi) < 1e-6
+        self.min_range = float(lidar_intrinsics.get('min_range', 0.0))
+        self.max_range = float(lidar_intrinsics.get('max_range', np.inf))
+        self.__rays3d_3xHxW = None
+
+    def get_rays3d(self):
+        """
+        Unit direction of the center of each pixel
+        :return: array 3xHxW
+        """
+        if self.__rays3d_3xHxW is None:
+            azimuths = self.azimuth_max - (np.arange(self.width) + 0.5) * self.azimuth_step
+            el = self.elevations[:, np.newaxis]
+            self.__rays3d_3xHxW = np.stack((np.cos(el) * np.cos(azimuths), np.cos(el) * np.sin(azimuths),
+                                            np.broadcast_to(np.sin(el), (self.height, self.width))))
+        return self.__rays3d_3xHxW
+
+    def project_points3d(self, points3d_4xN, remove_outside=False, compact=False):
+        """
+        Projects 3D points (in the lidar coordinate system) into the range image
+        :param points3d_4xN: array 4xN of 3D points
+        :param remove_outside: if True, points outside the field of view are invalid
+        :param compact: if True, only valid points are returned, with their indices
+        :return: array 3xN of image points (column, row, 1), with integer values at pixel centers (NaN if invalid),
+        and boolean array N of valid points (points with range within [min_range, max_range], and inside the image
+        if remove_outside). If compact, (3xM, indices M) of valid points instead.
+        """
+        N = points3d_4xN.shape[1]
+        xyz = points3d_4xN[0:3, :] / points3d_4xN[3, :]
+        ranges = np.linalg.norm(xyz, axis=0)
+        idx_valid = (ranges > 0) & (ranges >= self.min_range) & (ranges <= self.max_range)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            azimuths = np.arctan2(xyz[1], xyz[0])
+            elevations = np.arcsin(np.clip(xyz[2] / ranges, -1, 1))
+
+        u = (self.azimuth_max - azimuths) / self.azimuth_step - 0.5
+        if self.is_360:
+            u = np.mod(u + 0.5, self.width) - 0.5
+        # Rows by linear interpolation between beams (np.interp needs ascending abscissae)
+        rows = np.arange(self.height, dtype=float)
+        v = np.interp(elevations, self.elevations[::-1], rows[::-1], left=np.nan, right=np.nan)
+        # Half a row of margin above the first beam and below the last one
+        first = (self.elevations[0] - elevations) / (self.elevations[0] - self.elevations[1])
+        last = self.height - 1 + (self.elevations[-1] - elevations) / (self.elevations[-2] - self.elevations[-1])
+        v = np.where(np.isnan(v) & (first >= -0.5) & (first < 0), first, v)
+        v = np.where(np.isnan(v) & (last <= self.height - 0.5) & (last > self.height - 1), last, v)
+
+        if remove_outside:
+            idx_valid &= ~np.isnan(v) & (u >= -0.5) & (u < self.width - 0.5)
+
+        points2d_3xN = np.full((3, N), np.nan)
+        points2d_3xN[0, idx_valid] = u[idx_valid]
+        points2d_3xN[1, idx_valid] = v[idx_valid]
+        points2d_3xN[2, idx_valid] = 1.0
+        if compact:
+            idx = np.flatnonzero(idx_valid)
+            return points2d_3xN[:, idx], idx
+        return points2d_3xN, idx_valid
+
+    def __get_pixels(self, points3d_4xN):
+        # Flat pixel index of each point (or -1 if outside the image or invalid range) and range
+        points2d_3xN, idx_valid = self.project_points3d(points3d_4xN, remove_outside=True)
+        pixels = np.full(points3d_4xN.shape[1], -1, dtype=int)
+        cols = np.rint(points2d_3xN[0, idx_valid]).astype(int) % self.width
+        rows = np.rint(points2d_3xN[1, idx_valid]).astype(int)
+        pixels[idx_valid] = rows * self.width + cols
+        ranges = np.linalg.norm(points3d_4xN[0:3, :] / points3d_4xN[3, :], axis=0)
+        return pixels, ranges
+
+    def range_image(self, points3d_4xN, intensities_N=None):
+        """
+        Renders 3D points (in the lidar coordinate system) into a range image, keeping the nearest point at each pixel
+        :param points3d_4xN: array 4xN of 3D points
+        :param intensities_N: optional array N of intensities (e.g. reflectivity)
+        :return: range image HxW (inf where empty), intensity image HxW (0 where empty, or None if no intensities)
+        and index image HxW with the point at each pixel (-1 where empty)
+        """
+        pixels, ranges = self.__get_pixels(points3d_4xN)
+        valid = np.flatnonzero(pixels >= 0)
+        # Sort by pixel, then range: the first point of each pixel is the nearest one
+        order = valid[np.lexsort((ranges[valid], pixels[valid]))]
+        pixels_unique, first = np.unique(pixels[order], return_index=True)
+        nearest = order[first]
+
+        index_HxW = np.full(self.height * self.width, -1, dtype=int)
+        index_HxW[pixels_unique] = nearest
+        range_HxW = np.full(self.height * self.width, np.inf)
+        range_HxW[pixels_unique] = ranges[nearest]
+        intensity_HxW = None
+        if intensities_N is not None:
+            intensity_HxW = np.zeros(self.height * self.width)
+            intensity_HxW[pixels_unique] = np.asarray(intensities_N, dtype=float)[nearest]
+            intensity_HxW = intensity_HxW.reshape(self.height, self.width)
+        return range_HxW.reshape(self.height, self.width), intensity_HxW, index_HxW.reshape(self.height, self.width)
+
+    def reproject_range_image(self, range_HxW):
+        """
+        3D points (in the lidar coordinate system) of the pixels of a range image with a finite, positive range, along
+        the rays of the pixel centers
+        :param range_HxW: range image
+        :return: array 4xM of 3D points and array M of their flat pixel indices (row * width + column)
+        """
+        ranges = np.asarray(range_HxW, dtype=float).reshape(-1)
+        idx = np.flatnonzero(np.isfinite(ranges) & (ranges > 0))
+        rays3d_3xM = self.get_rays3d().reshape(3, -1)[:, idx]
+        return np.vstack((rays3d_3xM * ranges[idx], np.ones(idx.shape[0]))), idx
+
+    def get_visibility(self, points3d_4xN, range_HxW, tolerance=0.1):
+        """
+        Occlusion test against a range image: a point is visible if it is not farther than the range at its pixel
+        (plus tolerance). Points outside the image are not visible.
+        :return: boolean array N
+        """
+        pixels, ranges = self.__get_pixels(points3d_4xN)
+        visible = pixels >= 0
+        visible[visible] = ranges[visible] <= np.asarray(range_HxW).reshape(-1)[pixels[visible]] + tolerance
+        return visible
@@ -0,0 +1,495 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import numpy as np
+from collections import namedtuple
+
+import vcd.poly2d as poly
+import vcd.overlap as overlap
+
+# Spatial indexes of 2D geometries, to answer point and rectangle queries (e.g. which bboxes contain a pixel)
+# without scanning all the elements of a frame.
+# Query results are ragged, as offsets (int ndarray [K+1]) and indices (int ndarray): the items of query k are
+# indices[offsets[k]:offsets[k+1]], in ascending order.
+
+
+def _expand_ranges(starts_N, counts_N):
+    # For N ranges [starts, starts + counts), returns the owner of each element and the element itself
+    owners = np.repeat(np.arange(starts_N.shape[0]), counts_N)
+    firsts = np.cumsum(counts_N) - counts_N
+    return owners, starts_N[owners] + np.arange(owners.shape[0]) - firsts[owners]
+
+
+def _as_ragged(queries, items, num_queries):
+    # Sorts (query, item) pairs and returns them as offsets and indices
+    order = np.lexsort((items, queries))
+    counts = np.bincount(queries, minlength=num_queries)
+    offsets = np.zeros(num_queries + 1, dtype=int)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, items[order]
+
+
+class GridIndex:
+    """
+    Uniform grid over N axis-aligned extents (xmin, ymin, xmax, ymax).
+    Each extent is registered in the cells it covers, as a table sorted by cell, so a query only tests the items of
+    its cells. Extents covering more than max_cells_per_item cells are kept apart and tested in every query.
+    By default, the cell size is the median size of the extents.
+    """
+    def __init__(self, extents_Nx4, cell_size=None, max_cells_per_item=64):
+        self.extents = np.asarray(extents_Nx4, dtype=float).reshape(-1, 4)
+        N = self.extents.shape[0]
+        if cell_size is None:
+            sizes = np.maximum(self.extents[:, 2] - self.extents[:, 0], self.extents[:, 3] - self.extents[:, 1])
+            cell_size = float(np.median(sizes)) if N > 0 else 1.0
+        self.cell_size = cell_size if cell_size > 0 else 1.0
+        self.origin = self.extents[:, 0:2].min(axis=0) if N > 0 else np.zeros(2)
+
+        cells_min = self.__get_cells(self.extents[:, 0:2])
+        cells_max = self.__get_cells(self.extents[:, 2:4])
+        self.shape = tuple((cells_max.max(axis=0) + 1).tolist()) if N > 0 else (0, 0)
+        spans = cells_max - cells_min + 1
+        num_cells = spans[:, 0] * spans[:, 1]
+        large = num_cells > max_cells_per_item
+        self.__large_items = np.flatnonzero(large)
+
+        # (cell, item) table, sorted by cell
+        num_cells[large] = 0
+        items, local = _expand_ranges(np.zeros(N, dtype=int), num_cells)
+        cells_x = cells_min[items, 0] + local % spans[items, 0]
+        cells_y = cells_min[items, 1] + local // spans[items, 0]
+        cell_ids = cells_y * max(self.shape[0], 1) + cells_x
+        order = np.argsort(cell_ids, kind='stable')
+        self.__cell_ids = cell_ids[order]
+        self.__cell_items = items[order]
+
+    def __len__(self):
+        return self.extents.shape[0]
+
+    def __get_cells(self, points_Kx2):
+        return np.floor((points_Kx2 - self.origin) / self.cell_size).astype(int)
+
+    def __get_candidates(self, cells_min_Kx2, cells_max_Kx2):
+        # (query, item) pairs of the items registered in the cells of each query, plus the large items
+        K = cells_min_Kx2.shape[0]
+        if len(self) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        cells_min_Kx2 = np.maximum(cells_min_Kx2, 0)
+        cells_max_Kx2 = np.minimum(cells_max_Kx2, np.array(self.shape) - 1)
+        spans = np.maximum(cells_max_Kx2 - cells_min_Kx2 + 1, 0)
+        num_cells = spans[:, 0] * spans[:, 1]
+        # Queries covering more cells than items are tested against all the items
+        large = num_cells > len(self)
+        num_cells[large] = 0
+        queries, local = _expand_ranges(np.zeros(K, dtype=int), num_cells)
+        cell_ids = (cells_min_Kx2[queries, 1] + local // spans[queries, 0]) * self.shape[0] + \
+            cells_min_Kx2[queries, 0] + local % spans[queries, 0]
+        lo = np.searchsorted(self.__cell_ids, cell_ids, side='left')
+        hi = np.searchsorted(self.__cell_ids, cell_ids, side='right')
+        owners, pos = _expand_ranges(lo, hi - lo)
+        queries_large = np.repeat(np.flatnonzero(~large), self.__large_items.shape[0])
+        items_large = np.tile(self.__large_items, np.count_nonzero(~large))
+        queries_all = np.repeat(np.flatnonzero(large), len(self))
+        items_all = np.tile(np.arange(len(self)), np.count_nonzero(large))
+        return np.concatenate((queries[owners], queries_large, queries_all)), \
+            np.concatenate((self.__cell_items[pos], items_large, items_all))
+
+    def query_points(self, points_Kx2):
+        """
+        Items whose extent contains each point (borders included)
+        :param points_Kx2: array Kx2 of points (x, y)
+        :return: offsets [K+1], indices
+        """
+        points_Kx2 = np.asarray(points_Kx2, dtype=float).reshape(-1, 2)
+        cells = self.__get_cells(points_Kx2)
+        queries, items = self.__get_candidates(cells, cells)
+        p = points_Kx2[queries]
+        e = self.extents[items]
+        inside = (p[:, 0] >= e[:, 0]) & (p[:, 0] <= e[:, 2]) & (p[:, 1] >= e[:, 1]) & (p[:, 1] <= e[:, 3])
+        return _as_ragged(queries[inside], items[inside], points_Kx2.shape[0])
+
+    def query_extents(self, extents_Kx4):
+        """
+        Items whose extent intersects each query extent (xmin, ymin, xmax, ymax), borders included
+        :param extents_Kx4: array Kx4
+        :return: offsets [K+1], indices
+        """
+        extents_Kx4 = np.asarray(extents_Kx4, dtype=float).reshape(-1, 4)
+        queries, items = self.__get_candidates(self.__get_cells(extents_Kx4[:, 0:2]),
+                                               self.__get_cells(extents_Kx4[:, 2:4]))
+        # An item may be found in several cells of a query
+        pairs = np.unique(queries * max(len(self), 1) + items)
+        queries, items = pairs // max(len(self), 1), pairs % max(len(self), 1)
+        q = extents_Kx4[queries]
+        e = self.extents[items]
+        overlap_ = (q[:, 0] <= e[:, 2]) & (q[:, 2] >= e[:, 0]) & (q[:, 1] <= e[:, 3]) & (q[:, 3] >= e[:, 1])
+        return _as_ragged(queries[overlap_], items[overlap_], extents_Kx4.shape[0])
+
+
+####################################################
+# Extents of element_data
+####################################################
+def bbox_extents(bboxes_Nx4):
+    # (x, y, w, h) center-size, as in types.bbox, to (xmin, ymin, xmax, ymax)
+    bboxes_Nx4 = np.asarray(bboxes_Nx4, dtype=float).reshape(-1, 4)
+    half = np.abs(bboxes_Nx4[:, 2:4]) / 2
+    return np.hstack((bboxes_Nx4[:, 0:2] - half, bboxes_Nx4[:, 0:2] + half))
+
+
+def rbbox_extents(rbboxes_Nx5):
+    rbboxes_Nx5 = np.asarray(rbboxes_Nx5, dtype=float).reshape(-1, 5)
+    corners_Nx4x2 = overlap.rotated_rect_corners(rbboxes_Nx5[:, 0:2], rbboxes_Nx5[:, 2:4], rbboxes_Nx5[:, 4])
+    return np.hstack((corners_Nx4x2.min(axis=1), corners_Nx4x2.max(axis=1)))
+
+
+def poly2d_extent(poly2d_data):
+    # Extent of the 'val' of a poly2d element_data, decoding chain codes if needed
+    val = poly2d_data['val']
+    mode = poly2d_data.get('mode', 'MODE_POLY2D_ABSOLUTE')
+    if mode == 'MODE_POLY2D_SRF6DCC':
+        val = poly.getVecFromEncodedSRF6(int(val[0]), int(val[1]), int(val[2]), val[3])
+    elif mode == 'MODE_POLY2D_RS6FCC':
+        val = poly.getVecFromEncodedRS6(int(val[0]), int(val[1]), int(val[2]), int(val[3]), int(val[4]), val[5])
+    points = np.asarray(val, dtype=float).reshape(-1, 2)
+    if points.shape[0] == 0:
+        return None
+    return np.concatenate((points.min(axis=0), points.max(axis=0)))
+
+
+class FrameSpatialIndex:
+    """
+    Spatial index of the bbox, rbbox and poly2d element_data of the elements at a frame (see
+    core.VCD.get_frame_spatial_index), over their axis-aligned extents.
+    Each indexed element_data is an entry, with its uid and data name; queries return the uids of the matching
+    entries (once per uid, in ascending entry order).
+    """
+    def __init__(self, uids, data_names, extents_Nx4, cell_size=None):
+        self.uids = list(uids)
+        self.data_names = list(data_names)
+        self.grid = GridIndex(extents_Nx4, cell_size)
+
+    @classmethod
+    def from_frame(cls, frame, element_type_name='object', data_names=None, coordinate_system=None,
+                   cell_size=None):
+        # frame is the dict of a frame in data['openlabel']['frames']
+        entries = {'bbox': ([], [], []), 'rbbox': ([], [], []), 'poly2d': ([], [], [])}
+        for uid_str, element in frame.get(element_type_name + 's', {}).items():
+            for data_type_name, val_array in element.get(element_type_name + '_data', {}).items():
+                if data_type_name not in entries:
+                    continue
+                for element_data in val_array:
+                    if data_names is not None and element_data['name'] not in data_names:
+                        continue
+                    if coordinate_system is not None and element_data.get('coordinate_system') != coordinate_system:
+                        continue
+                    entries[data_type_name][0].append(uid_str)
+                    entries[data_type_name][1].append(element_data['name'])
+                    entries[data_type_name][2].append(element_data)
+
+        uids = []
+        names = []
+        extents = []
+        for data_type_name, (uids_type, names_type, element_datas) in entries.items():
+            if not element_datas:
+                continue
+            if data_type_name == 'bbox':
+                extents.append(bbox_extents([element_data['val'] for element_data in element_datas]))
+            elif data_type_name == 'rbbox':
+                extents.append(rbbox_extents([element_data['val'] for element_data in element_datas]))
+            else:
+                extents_poly = [poly2d_extent(element_data) for element_data in element_datas]
+                keep = [i for i, extent in enumerate(extents_poly) if extent is not None]
+                uids_type = [uids_type[i] for i in keep]
+                names_type = [names_type[i] for i in keep]
+                extents.append(np.array([extents_poly[i] for i in keep]).reshape(-1, 4))
+            uids.extend(uids_type)
+            names.extend(names_type)
+        extents = np.vstack(extents) if extents else np.zeros((0, 4))
+        return cls(uids, names, extents, cell_size)
+
+    def __len__(self):
+        return len(self.uids)
+
+    def __as_uids(self, offsets, indices):
+        result = []
+        for k in range(offsets.shape[0] - 1):
+            uids_k = []
+            for i in indices[offsets[k]:offsets[k + 1]].tolist():
+                if self.uids[i] not in uids_k:
+                    uids_k.append(self.uids[i])
+            result.append(uids_k)
+        return result
+
+    def query_points(self, points_Kx2):
+        """
+        :param points_Kx2: array Kx2 of points (x, y), e.g. pixels
+        :return: list of K lists of uids whose geometries contain each point
+        """
+        return self.__as_uids(*self.grid.query_points(points_Kx2))
+
+    def query_point(self, x, y):
+        return self.query_points([(x, y)])[0]
+
+    def query_rects(self, rects_Kx4):
+        """
+        :param rects_Kx4: array Kx4 of rectangles (x, y, w, h) in center-size form, as types.bbox
+        :return: list of K lists of uids whose geometries intersect each rectangle
+        """
+        return self.__as_uids(*self.grid.query_extents(bbox_extents(rects_Kx4)))
+
+    def query_rect(self, rect):
+        return self.query_rects([rect])[0]
+
+
+####################################################
+# 3D points, over one or several frames
+####################################################
+class PointIndex3D:
+    """
+    Uniform 3D grid over N points, optionally with a frame number each (e.g. the centers of the cuboids of a
+    sequence). Points are sorted by (cell, frame), so a query visits the cells around it and, in each cell, the
+    contiguous run of points of the requested frames.
+    """
+    def __init__(self, points_Nx3, frames_N=None, cell_size=10.0):
+        self.points = np.asarray(points_Nx3, dtype=float).reshape(-1, 3)
+        N = self.points.shape[0]
+        self.frames = np.zeros(N, dtype=int) if frames_N is None else np.asarray(frames_N, dtype=int).reshape(-1)
+        assert(self.frames.shape[0] == N)
+        assert(cell_size > 0)
+        self.cell_size = float(cell_size)
+        self.origin = self.points.min(axis=0) if N > 0 else np.zeros(3)
+        self.corner = self.points.max(axis=0) if N > 0 else np.zeros(3)
+        self.frame_min = int(self.frames.min()) if N > 0 else 0
+        self.num_frames = int(self.frames.max()) - self.frame_min + 1 if N > 0 else 1
+        cells = self.__get_cells(self.points)
+        self.shape = tuple((cells.max(axis=0) + 1).tolist()) if N > 0 else (0, 0, 0)
+        keys = self.__get_cell_ids(cells) * self.num_frames + (self.frames - self.frame_min)
+        self.__items = np.argsort(keys, kind='stable')
+        self.__keys = keys[self.__items]
+        self.__items_by_frame = np.argsort(self.frames, kind='stable')
+        self.__sorted_frames = self.frames[self.__items_by_frame]
+
+    def __len__(self):
+        return self.points.shape[0]
+
+    def __get_cells(self, points_Kx3):
+        return np.floor((points_Kx3 - self.origin) / self.cell_size).astype(np.int64)
+
+    def __get_cell_ids(self, cells_Kx3):
+        return (cells_Kx3[:, 2] * max(self.shape[1], 1) + cells_Kx3[:, 1]) * max(self.shape[0], 1) + cells_Kx3[:, 0]
+
+    def __get_frame_range(self, frame_start, frame_end):
+        frame_start = self.frame_min if frame_start is None else max(frame_start, self.frame_min)
+        frame_end = self.frame_min + self.num_frames - 1 if frame_end is None else \
+            min(frame_end, self.frame_min + self.num_frames - 1)
+        return frame_start - self.frame_min, frame_end - self.frame_min
+
+    def query_radius(self, center, radius, frame_start=None, frame_end=None):
+        """
+        Points within a distance of center, at frames [frame_start, frame_end] (all frames if None)
+        :return: indices and distances, sorted by distance
+        """
+        center = np.asarray(center, dtype=float).reshape(3)
+        f0, f1 = self.__get_frame_range(frame_start, frame_end)
+        if len(self) == 0 or f0 > f1:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        cells_min = np.maximum(self.__get_cells((center - radius)[np.newaxis, :])[0], 0)
+        cells_max = np.minimum(self.__get_cells((center + radius)[np.newaxis, :])[0], np.array(self.shape) - 1)
+        spans = np.maximum(cells_max - cells_min + 1, 0)
+        num_cells = int(np.prod(spans))
+        lo, hi = np.searchsorted(self.__sorted_frames, (f0 + self.frame_min, f1 + self.frame_min + 1))
+        if num_cells > hi - lo:
+            # More cells than points at these frames: test all these points
+            candidates = self.__items_by_frame[lo:hi]
+        else:
+            local = np.arange(num_cells)
+            cells = np.column_stack((local % spans[0], (local // spans[0]) % spans[1], local // (spans[0] * spans[1])))
+            cell_keys = self.__get_cell_ids(cells + cells_min) * self.num_frames
+            lo = np.searchsorted(self.__keys, cell_keys + f0, side='left')
+            hi = np.searchsorted(self.__keys, cell_keys + f1, side='right')
+            candidates = self.__items[_expand_ranges(lo, hi - lo)[1]]
+        distances = np.linalg.norm(self.points[candidates] - center, axis=1)
+        inside = distances <= radius
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.lexsort((candidates, distances))
+        return candidates[order], distances[order]
+
+    def query_knn(self, point, k, frame_start=None, frame_end=None):
+        """
+        k nearest points to point, at frames [frame_start, frame_end] (all frames if None)
+        The radius of the search is doubled from the cell size until k points are found.
+        :return: indices and distances (at most k), sorted by distance
+        """
+        point = np.asarray(point, dtype=float).reshape(3)
+        max_radius = np.linalg.norm(np.maximum(np.abs(point - self.origin), np.abs(point - self.corner)))
+        radius = self.cell_size
+        while True:
+            indices, distances = self.query_radius(point, radius, frame_start, frame_end)
+            if indices.shape[0] >= k or radius >= max_radius:
+                return indices[:k], distances[:k]
+            radius *= 2
+
+
+# Result of SceneIndex3D queries, as arrays of the same length
+Neighbors3D = namedtuple('Neighbors3D', ['frames', 'uids', 'data_names', 'points', 'distances'])
+
+
+class SceneIndex3D:
+    """
+    Spatio-temporal index of the cuboid centers and point3d values of the elements at the frames of a VCD (static
+    element_data included for the elements at each frame, as in core.VCD.get_element_data), all expressed in one
+    coordinate system (cs_dst) through scl.Scene.get_transforms, batched per source coordinate system. element_data
+    without coordinate_system use the one of their element, or are assumed in cs_dst.
+    Frames are read once; update() re-reads only the frames whose element_data or frame-specific transforms changed,
+    static element_data included (see core.VCD.track_frame_data_changes), or everything if coordinate systems (or
+    their static poses) changed. The entries of the re-read frames replace the old ones in the arrays (frames, uids,
+    names), but the grid (PointIndex3D) is always rebuilt from all the entries (a vectorized sort).
+    """
+    def __init__(self, scene, cs_dst, element_type_name='object', data_names=None, frame_start=None,
+                 frame_end=None, cell_size=10.0):
+        self.scene = scene
+        self.vcd = scene.vcd
+        self.cs_dst = cs_dst
+        self.element_type_name = element_type_name
+        self.data_names = data_names
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.cell_size = cell_size
+        self.__frames_read = set()
+        self.__clear()
+        self.__changes = self.vcd.track_frame_data_changes()
+        self.__versions = None
+        self.index = None
+        self.update()
+
+    def __clear(self):
+        # Entries (one per element_data), sorted by frame
+        self.frames = np.zeros(0, dtype=int)
+        self.uids = np.zeros(0, dtype=object)
+        self.names = np.zeros(0, dtype=object)
+        self.__points = np.zeros((0, 3))
+
+    def __get_frame_nums(self):
+        frame_nums = []
+        for fi_start, fi_end in self.vcd.get_frame_intervals().get():
+            if self.frame_start is not None:
+                fi_start = max(fi_start, self.frame_start)
+            if self.frame_end is not None:
+                fi_end = min(fi_end, self.frame_end)
+            frame_nums.extend(range(fi_start, fi_end + 1))
+        return frame_nums
+
+    def __read_frames(self, frame_nums):
+        # Extracts the points of these frames, grouped by source coordinate system, and transforms them in batch
+        # Returns the entries of these frames: frames, uids, names and points_Nx3
+        elements = self.vcd.get_root().get(self.element_type_name + 's', {})
+        by_cs = {}  # {cs_src: (frame_nums, uids, data_names, points)}
+        for frame_num in frame_nums:
+            frame = self.vcd.get_frame(frame_num)
+            if frame is None:
+                continue
+            for uid_str, element_in_frame in frame.get(self.element_type_name + 's', {}).items():
+                element = elements.get(uid_str, {})
+                cs_element = element.get('coordinate_system')
+                # Frame-specific element_data, or static element_data with other names (as in get_element_data)
+                element_datas = []
+                for container in (element_in_frame, element):
+                    names_found = set(element_data['name'] for element_data in element_datas)
+                    for data_type_name in ('cuboid', 'point3d'):
+                        for element_data in container.get(self.element_type_name + '_data', {}).get(
+                                data_type_name, []):
+                            if element_data['name'] not in names_found:
+                                element_datas.append(element_data)
+                for element_data in element_datas:
+                    if self.data_names is not None and element_data['name'] not in self.data_names:
+                        continue
+                    cs_src = element_data.get('coordinate_system', cs_element) or self.cs_dst
+                    entry = by_cs.setdefault(cs_src, ([], [], [], []))
+                    entry[0].append(frame_num)
+                    entry[1].append(uid_str)
+                    entry[2].append(element_data['name'])
+                    entry[3].append(element_data['val'][0:3])
+
+        frames = []
+        uids = []
+        names = []
+        points = [np.zeros((0, 3))]
+        for cs_src, (frames_cs, uids_cs, names_cs, points_cs) in by_cs.items():
+            points_4xN = np.vstack((np.array(points_cs, dtype=float).T, np.ones(len(points_cs))))
+            if cs_src != self.cs_dst:
+                frames_unique, idx = np.unique(frames_cs, return_inverse=True)
+                T_Fx4x4 = self.scene.get_transforms(cs_src, self.cs_dst, frames_unique)
+                points_4xN = np.einsum('nij,jn->in', T_Fx4x4[idx], points_4xN)
+            frames.extend(frames_cs)
+            uids.extend(uids_cs)
+            names.extend(names_cs)
+            points.append(points_4xN[0:3, :].T)
+        return np.array(frames, dtype=int), np.array(uids, dtype=object), np.array(names, dtype=object), \
+            np.vstack(points)
+
+    def update(self):
+        """
+        Re-reads the frames whose element_data changed since the last update, replaces their entries, and rebuilds
+        the grid
+        :return: number of frames read
+        """
+        # Frame-specific transforms (core.VCD.add_transform) mark their frame as changed, so only the coordinate
+        # systems (static poses) require reading everything
+        versions = (self.vcd.get_coordinate_systems_version(), self.vcd.get_frame_data_version(),
+                    self.vcd.get_static_data_version())
+        if versions == self.__versions:
+            return 0
+        if self.__versions is None or versions[0] != self.__versions[0]:
+            self.__frames_read = set()
+            self.__clear()
+        self.__versions = versions
+        frame_nums = self.__get_frame_nums()
+        frame_nums_set = set(frame_nums)
+        to_read = [f for f in frame_nums if f not in self.__frames_read or f in self.__changes]
+        to_drop = (self.__frames_read - frame_nums_set) | set(to_read)
+        self.__frames_read = frame_nums_set
+        self.__changes.clear()
+
+        # Entries of the frames kept, plus the ones read, sorted by frame
+        keep = ~np.isin(self.frames, np.fromiter(to_drop, dtype=int, count=len(to_drop)))
+        frames, uids, names, points = self.__read_frames(to_read)
+        frames = np.concatenate((self.frames[keep], frames))
+        order = np.argsort(frames, kind='stable')
+        self.frames = frames[order]
+        self.uids = np.concatenate((self.uids[keep], uids))[order]
+        self.names = np.concatenate((self.names[keep], names))[order]
+        self.__points = np.vstack((self.__points[keep], points))[order]
+        self.index = PointIndex3D(self.__points, self.frames, self.cell_size)
+        return len(to_read)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __as_neighbors(self, indices, distances):
+        return Neighbors3D(self.frames[indices], self.uids[indices], self.names[indices],
+                           self.index.points[indices], distances)
+
+    def query_radius(self, center, radius, frame_start=None, frame_end=None):
+        """
+        Entries within radius of center (in cs_dst), at frames [frame_start, frame_end], e.g. all objects within
+        30 m of the ego vehicle (center (0, 0, 0) with cs_dst 'vehicle-iso8855') between frames 1000 and 2000
+        :return: Neighbors3D, sorted by distance
+        """
+        return self.__as_neighbors(*self.index.query_radius(center, radius, frame_start, frame_end))
+
+    def query_knn(self, point, k, frame_num):
+        """
+        k nearest entries to point (in cs_dst) at a frame
+        :return: Neighbors3D, sorted by distance
+        """
+        return self.__as_neighbors(*self.index.query_knn(point, k, frame_num, frame_num))
@@ -11,6 +11,7 @@ VCD is distributed under MIT License. See LICENSE.
 
 """
 
+import sys
 import warnings
 import numpy as np
 import cv2 as cv
@@ -245,6 +246,70 @@ def rm_frame_from_frame_intervals(frame_intervals, frame_num):
     return fi_dict_new
 
 
+def frame_intervals_from_frames(frames):
+    """
+    Run-length encodes an array of frame numbers into an array of frame intervals (dicts).
+    :param frames: sorted array of unique frame numbers (e.g. [0, 1, 2, 5, 6])
+    :return: e.g. [{'frame_start': 0, 'frame_end': 2}, {'frame_start': 5, 'frame_end': 6}]
+    """
+    frames = np.asarray(frames, dtype=int)
+    if frames.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(frames) != 1)
+    starts = frames[np.concatenate(([0], breaks + 1))].tolist()
+    ends = frames[np.concatenate((breaks, [frames.size - 1]))].tolist()
+    return [{'frame_start': start, 'frame_end': end} for start, end in zip(starts, ends)]
+
+
+####################################################
+# INTERPOLATION
+####################################################
+def _interpolation_segments(frames_key, frames):
+    # For each frame, the index of the keyframe before it (or at it) and the weight of the next keyframe
+    frames_key = np.asarray(frames_key, dtype=float)
+    frames = np.asarray(frames, dtype=float)
+    if frames_key.size < 2:
+        return np.zeros(frames.shape, dtype=int), np.zeros(frames.shape)
+    idx = np.clip(np.searchsorted(frames_key, frames, side='right') - 1, 0, frames_key.size - 2)
+    t = (frames - frames_key[idx]) / (frames_key[idx + 1] - frames_key[idx])
+    return idx, np.clip(t, 0.0, 1.0)
+
+
+def interpolate_linear(frames_key, values_key, frames):
+    """
+    Linear interpolation of keyframe values (one row per keyframe) at the given frames.
+    Frames outside the keyframes hold the first or last value.
+    :param frames_key: sorted array [K] of keyframe numbers
+    :param values_key: array [K×k] of values at keyframes
+    :param frames: array [N] of frames to interpolate at
+    :return: array [N×k]
+    """
+    values_key = np.asarray(values_key, dtype=float)
+    idx, t = _interpolation_segments(frames_key, frames)
+    if values_key.shape[0] < 2:
+        return np.repeat(values_key[0:1], idx.size, axis=0)
+    t = t.reshape(-1, 1)
+    return values_key[idx] * (1 - t) + values_key[idx + 1] * t
+
+
+def interpolate_slerp(frames_key, q_key_Kx4, frames):
+    # Same as interpolate_linear, but for unit quaternions (x, y, z, w) using slerp
+    q_key_Kx4 = np.asarray(q_key_Kx4, dtype=float)
+    idx, t = _interpolation_segments(frames_key, frames)
+    if q_key_Kx4.shape[0] < 2:
+        return np.repeat(q_key_Kx4[0:1], idx.size, axis=0)
+    return slerp(q_key_Kx4[idx], q_key_Kx4[idx + 1], t)
+
+
+def interpolate_hold(frames_key, frames):
+    """
+    Returns, for each frame, the index of the last keyframe at or before it (or the first keyframe, if none)
+    This is a hold-last interpolation, suitable for values that can't be blended (e.g. text).
+    """
+    idx = np.searchsorted(np.asarray(frames_key), np.asarray(frames), side='right') - 1
+    return np.clip(idx, 0, None)
+
+
 ####################################################
 # ROTATION AND ODOMETRY UTILS
 ####################################################
@@ -288,6 +353,84 @@ def q2R(x, y, z, w):
                    [2 * xz - 2 * yw, 2 * yz + 2 * xw, 1 - 2 * x2 - 2 * y2]])
     return R1
 
+def q2R_batch(q_Nx4):
+    # Batch version of q2R for N quaternions (x, y, z, w) as rows, returns Nx3x3
+    q_Nx4 = np.asarray(q_Nx4, dtype=float)
+    x, y, z, w = q_Nx4[:, 0], q_Nx4[:, 1], q_Nx4[:, 2], q_Nx4[:, 3]
+    R_Nx3x3 = np.empty((q_Nx4.shape[0], 3, 3))
+    R_Nx3x3[:, 0, 0] = 1 - 2 * y * y - 2 * z * z
+    R_Nx3x3[:, 0, 1] = 2 * x * y - 2 * z * w
+    R_Nx3x3[:, 0, 2] = 2 * x * z + 2 * y * w
+    R_Nx3x3[:, 1, 0] = 2 * x * y + 2 * z * w
+    R_Nx3x3[:, 1, 1] = 1 - 2 * x * x - 2 * z * z
+    R_Nx3x3[:, 1, 2] = 2 * y * z - 2 * x * w
+    R_Nx3x3[:, 2, 0] = 2 * x * z - 2 * y * w
+    R_Nx3x3[:, 2, 1] = 2 * y * z + 2 * x * w
+    R_Nx3x3[:, 2, 2] = 1 - 2 * x * x - 2 * y * y
+    return R_Nx3x3
+
+
+def R2q_batch(R_Nx3x3):
+    # Converts N rotation matrices into N unit quaternions (x, y, z, w) as rows, with w >= 0
+    # Uses the largest of (w, x, y, z) to pivot, so it is stable for any rotation
+    R = np.asarray(R_Nx3x3, dtype=float)
+    n = R.shape[0]
+    trace = R[:, 0, 0] + R[:, 1, 1] + R[:, 2, 2]
+    # 4*w^2, 4*x^2, 4*y^2, 4*z^2
+    squares = np.stack((1 + trace,
+                        1 + 2 * R[:, 0, 0] - trace,
+                        1 + 2 * R[:, 1, 1] - trace,
+                        1 + 2 * R[:, 2, 2] - trace), axis=1)
+    pivot = np.argmax(squares, axis=1)
+    s = 2 * np.sqrt(np.maximum(squares[np.arange(n), pivot], 1e-12))  # 4 * pivot component
+
+    q = np.empty((n, 4))
+    i = pivot == 0  # w
+    q[i, 3] = s[i] / 4
+    q[i, 0] = (R[i, 2, 1] - R[i, 1, 2]) / s[i]
+    q[i, 1] = (R[i, 0, 2] - R[i, 2, 0]) / s[i]
+    q[i, 2] = (R[i, 1, 0] - R[i, 0, 1]) / s[i]
+    i = pivot == 1  # x
+    q[i, 0] = s[i] / 4
+    q[i, 3] = (R[i, 2, 1] - R[i, 1, 2]) / s[i]
+    q[i, 1] = (R[i, 0, 1] + R[i, 1, 0]) / s[i]
+    q[i, 2] = (R[i, 0, 2] + R[i, 2, 0]) / s[i]
+    i = pivot == 2  # y
+    q[i, 1] = s[i] / 4
+    q[i, 3] = (R[i, 0, 2] - R[i, 2, 0]) / s[i]
+    q[i, 0] = (R[i, 0, 1] + R[i, 1, 0]) / s[i]
+    q[i, 2] = (R[i, 1, 2] + R[i, 2, 1]) / s[i]
+    i = pivot == 3  # z
+    q[i, 2] = s[i] / 4
+    q[i, 3] = (R[i, 1, 0] - R[i, 0, 1]) / s[i]
+    q[i, 0] = (R[i, 0, 2] + R[i, 2, 0]) / s[i]
+    q[i, 1] = (R[i, 1, 2] + R[i, 2, 1]) / s[i]
+
+    q[q[:, 3] < 0] *= -1
+    return q
+
+
+def slerp(q0_Nx4, q1_Nx4, t_N):
+    # Spherical linear interpolation between pairs of unit quaternions (rows), at parameters t in [0, 1]
+    q0 = np.asarray(q0_Nx4, dtype=float)
+    q1 = np.array(q1_Nx4, dtype=float)
+    t = np.asarray(t_N, dtype=float).reshape(-1, 1)
+
+    # Take the shortest path
+    dot = np.sum(q0 * q1, axis=1)
+    q1[dot < 0] *= -1
+    dot = np.abs(dot).reshape(-1, 1)
+
+    # Almost parallel quaternions are linearly interpolated (and normalized), to avoid dividing by sin(0)
+    linear = dot > 0.9995
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.where(linear, 1.0, np.sin(theta))
+    w0 = np.where(linear, 1 - t, np.sin((1 - t) * theta) / sin_theta)
+    w1 = np.where(linear, t, np.sin(t * theta) / sin_theta)
+    q = w0 * q0 + w1 * q1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
 def create_pose(R, C):
     # Under SCL principles, P = (R C; 0 0 0 1), while T = (R^T -R^TC; 0 0 0 1)
     if C.shape[0] == 3:
@@ -307,6 +450,8 @@ def decompose_pose(pose_4x4):
 
 def interpolate_pose(poses_dict, timestamp):
     # Find two adjacent poses between the provided timestamp
+    # The translation is interpolated linearly, and the rotation with slerp, so the result is a rigid transform
+    # NOTE: for many timestamps, build a PoseTimeline once and query all timestamps at once
     keys = list(poses_dict.keys())
 
     # Returns the position where to insert x in list a, assuming it is sorted
@@ -321,27 +466,60 @@ def interpolate_pose(poses_dict, timestamp):
         # The provided timestamp is the largest value
         return None
     else:
-        pose_prev = poses_dict[keys[pos - 1]]
-        pose_next = poses_dict[keys[pos]]
-        diff_pose_between = pose_next - pose_prev
-        time_between = keys[pos] - keys[pos - 1]
-        time_dist = timestamp - keys[pos - 1]
-        time_factor = time_dist / time_between
-        diff_pose = diff_pose_between.dot(time_factor)
-        pose_interpolated = pose_prev + diff_pose
+        timeline = PoseTimeline(keys[pos - 1:pos + 1], [poses_dict[keys[pos - 1]], poses_dict[keys[pos]]])
+        pose_interpolated = timeline.interpolate(timestamp)[0]
     return pose_interpolated
 
 
+class PoseTimeline:
+    """
+    Sequence of poses (4x4) at sorted timestamps, stored as translations and quaternions (x, y, z, w), which
+    can be interpolated at many timestamps at once (e.g. to synchronize sensors running at different rates).
+    Translations are interpolated linearly and rotations with slerp.
+    """
+    def __init__(self, timestamps, poses_Nx4x4):
+        timestamps = np.asarray(timestamps, dtype=float).reshape(-1)
+        poses_Nx4x4 = np.asarray(poses_Nx4x4, dtype=float).reshape(-1, 4, 4)
+        assert(timestamps.size == poses_Nx4x4.shape[0])
+        assert(timestamps.size > 0)
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[order]
+        assert(np.all(np.diff(self.timestamps) > 0))  # no repeated timestamps
+        self.translations = poses_Nx4x4[order, 0:3, 3]
+        self.quaternions = R2q_batch(poses_Nx4x4[order, 0:3, 0:3])
+
+    @classmethod
+    def from_dict(cls, poses_dict):
+        # poses_dict is {timestamp: pose_4x4}, as used by interpolate_pose
+        return cls(list(poses_dict.keys()), list(poses_dict.values()))
+
+    def __len__(self):
+        return self.timestamps.size
+
+    def interpolate(self, timestamps, extrapolate=False):
+        """
+        Interpolates the poses at the given timestamps.
+        :param timestamps: a single timestamp, or an array of N timestamps (no need to be sorted)
+        :param extrapolate: if False, poses outside the timeline are NaN, otherwise they hold the first or last pose
+        :return: array Nx4x4 of poses
+        """
+        timestamps = np.asarray(timestamps, dtype=float).reshape(-1)
+        poses_Nx4x4 = np.zeros((timestamps.size, 4, 4))
+        poses_Nx4x4[:, 0:3, 0:3] = q2R_batch(interpolate_slerp(self.timestamps, self.quaternions, timestamps))
+        poses_Nx4x4[:, 0:3, 3] = interpolate_linear(self.timestamps, self.translations, timestamps)
+        poses_Nx4x4[:, 3, 3] = 1.0
+        if not extrapolate:
+            outside = (timestamps < self.timestamps[0]) | (timestamps > self.timestamps[-1])
+            poses_Nx4x4[outside] = np.nan
+        return poses_Nx4x4
+
+
 def inv(m):
     if m.ndim == 2:  # just an inversion of a square matrix
         return np.linalg.inv(m)
     else:
-        assert(m.ndim == 3)  # so batch for N matrices
-        m_inv = np.zeros(m.shape, dtype=m.dtype)
-        n = m.shape[2]
-        for i in range(0, n):
-            m_inv[:, :, i] = np.linalg.inv(m[:, :, i])
-        return m_inv
+        assert(m.ndim == 3)  # so batch for N matrices (as MxMxN)
+        return np.moveaxis(np.linalg.inv(np.moveaxis(m, 2, 0)), 0, 2)
 
 
 def identity(dim):
@@ -480,6 +658,93 @@ def euler2R(a, seq=EulerSeq.ZYX):
     return R
 
 
+# The batch functions below (*_batch) do not validate each item (e.g. with isR), for speed
+# Set debug_checks = True to enable these assertions
+debug_checks = False
+
+
+def isR_batch(R_Nx3x3):
+    # Batch version of isR, returns an array of N booleans
+    R_Nx3x3 = np.asarray(R_Nx3x3)
+    assert (R_Nx3x3.ndim == 3 and R_Nx3x3.shape[1:] == (3, 3))
+    I_ = np.matmul(np.transpose(R_Nx3x3, (0, 2, 1)), R_Nx3x3)
+    n = np.linalg.norm(np.identity(3) - I_, axis=(1, 2))
+    return n < 1e-4
+
+
+def _R_axis_batch(axis, angles_rad):
+    # Stack of N rotation matrices around axis ("X", "Y" or "Z"), as Rx, Ry, Rz
+    c = np.cos(angles_rad)
+    s = np.sin(angles_rad)
+    R = np.zeros((angles_rad.shape[0], 3, 3))
+    if axis == "X":
+        R[:, 0, 0] = 1
+        R[:, 1, 1] = c
+        R[:, 1, 2] = -s
+        R[:, 2, 1] = s
+        R[:, 2, 2] = c
+    elif axis == "Y":
+        R[:, 0, 0] = c
+        R[:, 0, 2] = s
+        R[:, 1, 1] = 1
+        R[:, 2, 0] = -s
+        R[:, 2, 2] = c
+    else:
+        R[:, 0, 0] = c
+        R[:, 0, 1] = -s
+        R[:, 1, 0] = s
+        R[:, 1, 1] = c
+        R[:, 2, 2] = 1
+    return R
+
+
+def euler2R_batch(a_Nx3, seq=EulerSeq.ZYX):
+    """
+    Batch version of euler2R: each row of a_Nx3 is (a[0], a[1], a[2]) as in euler2R, e.g. (rz, ry, rx) for ZYX.
+    :param a_Nx3: array of N rows of 3 angles (radians)
+    :param seq: EulerSeq
+    :return: array Nx3x3 of rotation matrices
+    """
+    assert(isinstance(seq, EulerSeq))
+    a_Nx3 = np.asarray(a_Nx3, dtype=float).reshape(-1, 3)
+    R_0 = _R_axis_batch(seq.name[0], a_Nx3[:, 0])
+    R_1 = _R_axis_batch(seq.name[1], a_Nx3[:, 1])
+    R_2 = _R_axis_batch(seq.name[2], a_Nx3[:, 2])
+    R = np.matmul(R_0, np.matmul(R_1, R_2))
+    if debug_checks:
+        assert (np.all(isR_batch(R)))
+    return R
+
+
+def R2rvec_batch(R_Nx3x3):
+    """
+    Batch version of R2rvec.
+    :param R_Nx3x3: array of N rotation matrices
+    :return: array Nx3, with rows (rx, ry, rz)
+    """
+    R = np.asarray(R_Nx3x3, dtype=float)
+    if debug_checks:
+        assert (np.all(isR_batch(R)))
+    sy = np.sqrt(R[:, 0, 0] * R[:, 0, 0] + R[:, 1, 0] * R[:, 1, 0])
+    singular = sy < 1e-6
+
+    rvec_Nx3 = np.empty((R.shape[0], 3))
+    rvec_Nx3[:, 0] = np.where(singular, np.arctan2(-R[:, 1, 2], R[:, 1, 1]), np.arctan2(R[:, 2, 1], R[:, 2, 2]))
+    rvec_Nx3[:, 1] = np.arctan2(-R[:, 2, 0], sy)
+    rvec_Nx3[:, 2] = np.where(singular, 0.0, np.arctan2(R[:, 1, 0], R[:, 0, 0]))
+    return rvec_Nx3
+
+
+def create_pose_batch(R_Nx3x3, C_Nx3):
+    # Batch version of create_pose, with N rotations and N positions (as rows), returns Nx4x4
+    R_Nx3x3 = np.asarray(R_Nx3x3, dtype=float)
+    P_Nx4x4 = np.zeros((R_Nx3x3.shape[0], 4, 4))
+    P_Nx4x4[:, 0:3, 0:3] = R_Nx3x3
+    P_Nx4x4[:, 0:3, 3] = np.asarray(C_Nx3, dtype=float).reshape(-1, 3)
+    P_Nx4x4[:, 3, 3] = 1.0
+    return P_Nx4x4
+
+
 def convert_oxts_to_pose(oxts):
     # With a cup of coffee, read:
     # https://support.oxts.com/hc/en-us/articles/115002859149-OxTS-Reference-Frames-and-ISO8855-Reference-Frames#R2
@@ -495,53 +760,31 @@ def convert_oxts_to_pose(oxts):
     # of the first frame
 
     assert(isinstance(oxts, list))
+    oxts = np.array([oxts_packet[0:6] for oxts_packet in oxts], dtype=float)
 
     # Compute scale from first lat value
-    lat = oxts[0][0]
+    lat = oxts[0, 0]
     scale = lat_to_scale(lat)
 
-    # Init pose
-    poses = []
-    Tr_0_inv = None
-    transform_wcs_to_geo_4x4 = None
-
-    # For all oxts packets do:
-    for oxts_packet in oxts:
-        # Translation vector
-        lon_utm, lat_utm = latlon_to_mercator(oxts_packet[0], oxts_packet[1], scale)
-        alt = oxts_packet[2]
-
-        # Rotation matrix (OXTS RT3000 user manual, page 71/92)
-        rx = oxts_packet[3]  # roll
-        ry = oxts_packet[4]  # pitch
-        rz = oxts_packet[5]  # heading
+    # Translation vectors
+    lon_utm, lat_utm = latlon_to_mercator(oxts[:, 0], oxts[:, 1], scale)
+    alt = oxts[:, 2]
 
-        rotation_lcs_wrt_geo_3x3 = euler2R([rz, ry, rx])
-        location_lcs_wrt_geo_3x1 = np.array([[lon_utm, lat_utm, alt]]).T
-        pose_lcs_wrt_geo_4x4 = create_pose(rotation_lcs_wrt_geo_3x3, location_lcs_wrt_geo_3x1)
-        transform_geo_to_lcs_4x4 = inv(pose_lcs_wrt_geo_4x4)
-
-        # debug test: check location of lcs expressed in lcs coordinates. Should be zero
-        #location_lcs_wrt_geo_4x1 = np.vstack((location_lcs_wrt_geo_3x1, np.array([[1.0]])))
-        #location_lcs_wrt_lcs = np.dot(transform_geo_to_lcs_4x4, location_lcs_wrt_geo_4x1)
-
-        if transform_wcs_to_geo_4x4 is None:
-            # First entry, let's create wcs as (0,0,0) at the position of lcs
-            transform_wcs_to_geo_4x4 = inv(transform_geo_to_lcs_4x4)
-
-        # So this is Identity for the first instant
-        transform_wcs_to_lcs_4x4 = np.dot(transform_geo_to_lcs_4x4, transform_wcs_to_geo_4x4)
-        pose_lcs_wrt_wcs_4x4 = inv(transform_wcs_to_lcs_4x4)
-        poses.append(pose_lcs_wrt_wcs_4x4)
+    # Rotation matrices (OXTS RT3000 user manual, page 71/92)
+    # Columns 3, 4 and 5 are roll, pitch and heading, so (rz, ry, rx) are columns (5, 4, 3)
+    rotation_lcs_wrt_geo_Nx3x3 = euler2R_batch(oxts[:, [5, 4, 3]])
+    location_lcs_wrt_geo_Nx3 = np.column_stack((lon_utm, lat_utm, alt))
+    pose_lcs_wrt_geo_Nx4x4 = create_pose_batch(rotation_lcs_wrt_geo_Nx3x3, location_lcs_wrt_geo_Nx3)
 
+    # The wcs is created as (0,0,0) at the position of the first lcs, so
+    # pose_lcs_wrt_wcs = inv(transform_wcs_to_lcs) = inv(transform_geo_to_lcs * transform_wcs_to_geo)
+    #                  = inv(pose_lcs0_wrt_geo) * pose_lcs_wrt_geo
+    # which is Identity for the first instant
+    transform_geo_to_wcs_4x4 = inv(pose_lcs_wrt_geo_Nx4x4[0])
+    pose_lcs_wrt_wcs_Nx4x4 = np.matmul(transform_geo_to_wcs_4x4, pose_lcs_wrt_geo_Nx4x4)
 
     # Convert to 4x4xN
-    n = len(poses)
-    poses_4x4xN = np.zeros((4, 4, n), dtype=np.float)
-
-    for count, pose in enumerate(poses):
-        poses_4x4xN[:, :, count] = pose
-
+    poses_4x4xN = np.moveaxis(pose_lcs_wrt_wcs_Nx4x4, 0, 2)
     return poses_4x4xN
 
 
@@ -594,6 +837,36 @@ def norm(ray):
     return math.sqrt(ray[0]*ray[0] + ray[1]*ray[1])
 
 
+def intersect_rays3d_plane(rays3d_3xN, plane):
+    """
+    Intersects N rays starting at the origin (e.g. a camera optical center) with a plane (a, b, c, d), such that
+    ax + by + cz + d = 0.
+    This is the closed form of the Plücker formulation L*plane, with L the line through (0, 0, 0, 1) and (ray, 1):
+    the intersection is (-d*ray, n·ray), with n = (a, b, c).
+    Rays parallel to the plane (n·ray = 0) intersect at the infinite: their direction is returned instead (unit norm)
+    and they are flagged as not valid.
+    :param rays3d_3xN: 3xN array of rays
+    :param plane: plane (a, b, c, d)
+    :return: 4xN array of 3D points in homogeneous coordinates, and boolean array of N valid points
+    """
+    a, b, c, d = np.asarray(plane, dtype=float).flatten()
+    N = rays3d_3xN.shape[1]
+    w = a * rays3d_3xN[0, :] + b * rays3d_3xN[1, :] + c * rays3d_3xN[2, :]
+    idx_valid = w != 0
+
+    points3d_4xN = np.empty((4, N))
+    points3d_4xN[0:3, :] = -d * rays3d_3xN
+    points3d_4xN[3, :] = w
+    points3d_4xN[:, idx_valid] /= w[idx_valid]
+
+    # Infinite points: direction vector
+    if not np.all(idx_valid):
+        directions_3xM = points3d_4xN[0:3, ~idx_valid]
+        norms = np.linalg.norm(directions_3xM, axis=0)
+        points3d_4xN[0:3, ~idx_valid] = directions_3xM / np.where(norms > 0, norms, 1.0)
+    return points3d_4xN, idx_valid
+
+
 ####################################################
 # RADIAL DISTORTION
 ####################################################
@@ -653,6 +926,16 @@ def transform_points3d_4xN(points3d_4xN, T_src_to_dst):
     return points3d_dst_4xN
 
 
+def transform_points3d_4xN_batch(points3d_4xN, T_src_to_dst_Nx4x4):
+    """
+    Transforms points with N transforms at once (e.g. the same transform at N frames)
+    :param points3d_4xN: array of 4xM points, common to all transforms, or Nx4xM array with points per transform
+    :param T_src_to_dst_Nx4x4: array of N 4x4 transforms
+    :return: Nx4xM array of transformed points
+    """
+    return np.matmul(T_src_to_dst_Nx4x4, points3d_4xN)
+
+
 def transform_cuboid(cuboid, T_ref_to_dst):
     # All transforms are assumed to be 4x4 matrices, in the form of numpy arrays
     if isinstance(cuboid, tuple):
@@ -728,6 +1011,73 @@ def generate_cuboid_points_ref_4x8(cuboid):
     return points_cuboid_lcs_4x8
 
 
+def _as_cuboids_array(cuboids_NxM):
+    # List of N cuboids (or array NxM) as a float array NxM
+    cuboids_NxM = np.asarray(cuboids_NxM, dtype=float)
+    if cuboids_NxM.size == 0:
+        return cuboids_NxM.reshape(0, 9)
+    assert(cuboids_NxM.ndim == 2)
+    return cuboids_NxM
+
+
+def get_cuboid_poses_batch(cuboids_NxM):
+    """
+    Poses (object wrt reference) of N cuboids, all in the same form: (x, y, z, rx, ry, rz, sx, sy, sz) or
+    (x, y, z, qx, qy, qz, qw, sx, sy, sz).
+    :param cuboids_NxM: array (or list of lists) of N cuboids, M=9 or M=10
+    :return: array Nx4x4 of poses
+    """
+    cuboids_NxM = _as_cuboids_array(cuboids_NxM)
+    if cuboids_NxM.shape[1] == 10:
+        R_Nx3x3 = q2R_batch(cuboids_NxM[:, 3:7])
+    else:
+        assert(cuboids_NxM.shape[1] == 9)
+        R_Nx3x3 = euler2R_batch(cuboids_NxM[:, [5, 4, 3]])  # (rz, ry, rx), as in generate_cuboid_points_ref_4x8
+    return create_pose_batch(R_Nx3x3, cuboids_NxM[:, 0:3])
+
+
+def generate_cuboid_points_ref_4x8xN(cuboids_NxM):
+    """
+    Batch version of generate_cuboid_points_ref_4x8, for N cuboids (see get_cuboid_poses_batch)
+    :param cuboids_NxM: array (or list of lists) of N cuboids, M=9 or M=10
+    :return: array 4x8xN, with the 8 points of each cuboid in the same order as generate_cuboid_points_ref_4x8
+    """
+    cuboids_NxM = _as_cuboids_array(cuboids_NxM)
+    P_obj_wrt_ref_Nx4x4 = get_cuboid_poses_batch(cuboids_NxM)
+
+    # Base structure using sizes (as generate_cuboid_points_object_4x8)
+    signs_3x8 = np.array([[-1, -1, 1, 1, -1, -1, 1, 1],
+                          [1, -1, -1, 1, 1, -1, -1, 1],
+                          [-1, -1, -1, -1, 1, 1, 1, 1]]) / 2
+    points_cuboid_Nx4x8 = np.ones((cuboids_NxM.shape[0], 4, 8))
+    points_cuboid_Nx4x8[:, 0:3, :] = signs_3x8 * cuboids_NxM[:, -3:, np.newaxis]
+
+    points_cuboid_ref_Nx4x8 = np.matmul(P_obj_wrt_ref_Nx4x4, points_cuboid_Nx4x8)
+    return np.transpose(points_cuboid_ref_Nx4x8, (1, 2, 0))
+
+
+def transform_cuboids(cuboids_NxM, T_ref_to_dst):
+    """
+    Batch version of transform_cuboid, for N cuboids expressed in the same coordinate system.
+    Unlike transform_cuboid, cuboids with quaternions (M=10) are returned with quaternions (with qw >= 0).
+    :param cuboids_NxM: array (or list of lists) of N cuboids, M=9 or M=10
+    :param T_ref_to_dst: 4x4 transform
+    :return: array NxM of transformed cuboids
+    """
+    cuboids_NxM = _as_cuboids_array(cuboids_NxM)
+    T_obj_to_ref_Nx4x4 = get_cuboid_poses_batch(cuboids_NxM)  # SCL principles
+    T_ref_to_dst = np.array(T_ref_to_dst).reshape(4, 4)
+    P_obj_wrt_dst_Nx4x4 = np.matmul(T_ref_to_dst, T_obj_to_ref_Nx4x4)
+
+    cuboids_transformed_NxM = cuboids_NxM.copy()
+    cuboids_transformed_NxM[:, 0:3] = P_obj_wrt_dst_Nx4x4[:, 0:3, 3]
+    if cuboids_NxM.shape[1] == 10:
+        cuboids_transformed_NxM[:, 3:7] = R2q_batch(P_obj_wrt_dst_Nx4x4[:, 0:3, 0:3])
+    else:
+        cuboids_transformed_NxM[:, 3:6] = R2rvec_batch(P_obj_wrt_dst_Nx4x4[:, 0:3, 0:3])
+    return cuboids_transformed_NxM
+
+
 def get_transform_as_matrix4x4(transform_data):
     # This function receives a VCD 4.3.1 (OpenLABEL 1.0) pose item, which may specify a transform as a matrix4x4, but also as a quaternion+traslation
     # or as a Euler rotation + traslation
@@ -785,9 +1135,48 @@ def bounding_rect(points2d_3xN):
     y_min = np.min(y)
     y_max = np.max(y)
 
-    return (np.int0(np.array([(x_min + x_max)/2, (y_min + y_max)/2, x_max - x_min, y_max - y_min]))).tolist()
+    return (np.intp(np.array([(x_min + x_max)/2, (y_min + y_max)/2, x_max - x_min, y_max - y_min]))).tolist()
 
-    #return (np.int0(np.array([x_min, y_min, x_max - x_min, y_max - y_min]))).tolist()
+    #return (np.intp(np.array([x_min, y_min, x_max - x_min, y_max - y_min]))).tolist()
+
+
+def bounding_rects(points2d_3xKxN, idx_valid_KxN=None, img_size=None):
+    """
+    Batch version of bounding_rect, for N sets of K points (e.g. the 8 projected points of N cuboids).
+    Invalid points (e.g. behind the camera) are not considered.
+    :param points2d_3xKxN: array 3xKxN of points
+    :param idx_valid_KxN: boolean array KxN of valid points (all valid if None)
+    :param img_size: optional (width, height) of an image to clip the rects to
+    :return: array Nx4 of (x, y, w, h) as in bounding_rect, and boolean array N of sets with any valid point (and,
+    if img_size, with a clipped rect of positive area)
+    """
+    n = points2d_3xKxN.shape[2]
+    if idx_valid_KxN is None:
+        idx_valid_KxN = np.ones(points2d_3xKxN.shape[1:], dtype=bool)
+    idx_valid_KxN = np.asarray(idx_valid_KxN, dtype=bool)
+    valid = np.any(idx_valid_KxN, axis=0)
+
+    # Only sets with valid points
+    idx_valid_KxM = idx_valid_KxN[:, valid]
+    x = points2d_3xKxN[0][:, valid]
+    y = points2d_3xKxN[1][:, valid]
+    x_min = np.min(np.where(idx_valid_KxM, x, np.inf), axis=0)
+    x_max = np.max(np.where(idx_valid_KxM, x, -np.inf), axis=0)
+    y_min = np.min(np.where(idx_valid_KxM, y, np.inf), axis=0)
+    y_max = np.max(np.where(idx_valid_KxM, y, -np.inf), axis=0)
+    if img_size is not None:
+        x_min = np.clip(x_min, 0, img_size[0])
+        x_max = np.clip(x_max, 0, img_size[0])
+        y_min = np.clip(y_min, 0, img_size[1])
+        y_max = np.clip(y_max, 0, img_size[1])
+        inside = (x_max > x_min) & (y_max > y_min)
+        valid[valid] = inside
+        x_min, x_max, y_min, y_max = x_min[inside], x_max[inside], y_min[inside], y_max[inside]
+
+    rects_Nx4 = np.zeros((n, 4), dtype=np.intp)
+    rects_Nx4[valid] = np.column_stack(((x_min + x_max) / 2, (y_min + y_max) / 2, x_max - x_min,
+                                        y_max - y_min)).astype(np.intp)
+    return rects_Nx4, valid
 
 
 def generate_grid(x_params, y_params, z_params):
@@ -823,21 +1212,43 @@ def from_OpenCV_Nx1xM_to_MxN(array_Nx1xM):
     return array_MxN
 
 
-def filter_outside(points2d_3xN, img_size, idx_valid):
+def filter_outside(points2d_3xN, img_size, idx_valid, compact=False):
+    """
+    Invalidates the points outside the limits of the image (x in [0, width), y in [0, height)).
+    :param points2d_3xN: 2D points as 3xN array, modified in place (points outside are set to NaN)
+    :param img_size: (width, height)
+    :param idx_valid: boolean array of N, modified in place if it is a numpy array
+    :param compact: if True, points2d_3xN is not modified, and only valid points are returned, with their indices
+    :return: points2d_3xN and idx_valid, or if compact, points2d_3xM with the M valid points and their M indices
+    """
     width, height = img_size
-    N = points2d_3xN.shape[1]
-    # Remove those outside the limits of the image (after distortion)
-    for i in range(0, N):
-        if idx_valid[i]:  # ignore those already filtered
-            x = points2d_3xN[0, i]
-            y = points2d_3xN[1, i]
-
-            if not (0 <= x < width and 0 <= y < height):
-                idx_valid[i] = False
-                points2d_3xN[:, i] = np.nan
+    x = points2d_3xN[0, :]
+    y = points2d_3xN[1, :]
+    idx_valid = np.asarray(idx_valid, dtype=bool)
+    inside = (0 <= x) & (x < width) & (0 <= y) & (y < height)
+    if compact:
+        idx = np.flatnonzero(idx_valid & inside)
+        return points2d_3xN[:, idx], idx
+    outside = idx_valid & ~inside
+    idx_valid[outside] = False
+    points2d_3xN[:, outside] = np.nan
     return points2d_3xN, idx_valid
 
 
+def intern_object_pairs(pairs, max_length=64):
+    """
+    Hook for json.load(object_pairs_hook=...) that interns keys and short string values.
+    Keys such as 'name', 'val' or 'coordinate_system', and values such as class names or data names
+    (e.g. 'box2D') then share a single string object across all frames and across all loaded files.
+    Long strings (e.g. base64 payloads) are kept as they are.
+    :param pairs: list of (key, value) decoded by json for one JSON object
+    :param max_length: string values up to this length are interned
+    :return: dict
+    """
+    return {sys.intern(key): sys.intern(value) if isinstance(value, str) and len(value) <= max_length else value
+            for key, value in pairs}
+
+
 def rgb_to_hex(rgb):
     return '%02x%02x%02x' % tuple(rgb)
 
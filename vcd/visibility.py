@@ -0,0 +1,291 @@
+"""
+VCD (Video Content Description) library v5.0.0
+
+Project website: http://vcd.vicomtech.org
+
+Copyright (C) 2021, Vicomtech (http://www.vicomtech.es/),
+(Spain) all rights reserved.
+
+VCD is a Python library to create and manage VCD content version 5.0.0.
+VCD is distributed under MIT License. See LICENSE.
+
+"""
+
+import multiprocessing
+import os
+import numpy as np
+from collections import namedtuple
+
+import vcd.types as types
+import vcd.utils as utils
+
+# Visibility (occlusion) of the objects of a frame in a camera of a scl.Scene.
+# The cuboids and meshes of all the objects of the frame are rendered into a depth buffer (Z-buffer) at reduced
+# resolution, by casting the rays of the pixel centers (scl.Camera.get_pixel_rays3d, so lens distortion is exact)
+# against the 6 planes of each cuboid (slab test, in the cuboid coordinate system) and the triangles of each mesh
+# area. Each object is only tested against the pixels inside the cone of its bounding sphere.
+# The visibility ratio of an object is the number of pixels where it is the nearest object, divided by the number
+# of pixels it covers when rendered alone (0 if it is not in the image, e.g. behind the camera, or if the camera is
+# inside it, e.g. the cuboid of the ego vehicle).
+
+# Per frame: uids of the objects with geometry, their visibility ratio, number of covered pixels and number of
+# visible pixels (at the reduced resolution)
+FrameVisibility = namedtuple('FrameVisibility', ['frame_num', 'uids', 'ratios', 'num_pixels', 'num_visible'])
+
+_EPS = 1e-12
+
+
+def _get_mesh_triangles(mesh):
+    # Vertices (Vx3) and triangles (Tx3 indices) of the areas of a mesh (fans of the polygons of the areas)
+    point_ids = list(mesh.get('point3d', {}).keys())
+    vertices = np.array([mesh['point3d'][pid]['val'] for pid in point_ids], dtype=float).reshape(-1, 3)
+    index = {pid: i for i, pid in enumerate(point_ids)}
+    lines = mesh.get('line_reference', {})
+    triangles = []
+    for area in mesh.get('area_reference', {}).values():
+        polygon = []
+        if area.get('reference_type') == 'line_reference':
+            for line_id in area.get('val', []):
+                for pid in lines[str(line_id)]['val']:
+                    if not polygon or polygon[-1] != index[str(pid)]:
+                        polygon.append(index[str(pid)])
+            if len(polygon) > 1 and polygon[0] == polygon[-1]:
+                polygon.pop()
+        else:
+            polygon = [index[str(pid)] for pid in area.get('val', [])]
+        for k in range(1, len(polygon) - 1):
+            triangles.append((polygon[0], polygon[k], polygon[k + 1]))
+    return vertices, np.array(triangles, dtype=int).reshape(-1, 3)
+
+
+def _get_frame_geometries(scene, camera_name, frame_num, data_names):
+    # uids and geometries of the objects at a frame, in the camera coordinate system:
+    # cuboids as (object index, pose 4x4 of the cuboid wrt the camera, sizes 3) and meshes as (object index,
+    # vertices Vx3, triangles Tx3). Static object_data are included, as in core.VCD.get_object_data.
+    vcd = scene.vcd
+    frame = vcd.get_frame(frame_num)
+    if frame is None:
+        return None
+    objects = vcd.get_root().get('objects', {})
+    uids = []
+    cuboids_by_cs = {}  # {(cs_src, number of values): ([object index], [cuboid values])}
+    meshes = []
+    for uid_str, object_in_frame in frame.get('objects', {}).items():
+        obj = objects.get(uid_str, {})
+        cs_object = obj.get('coordinate_system')
+        object_datas = []
+        for container in (object_in_frame, obj):
+            names_found = set(object_data['name'] for _, object_data in object_datas)
+            for data_type_name in ('cuboid', 'mesh'):
+                for object_data in container.get('object_data', {}).get(data_type_name, []):
+                    if object_data['name'] not in names_found:
+                        object_datas.append((data_type_name, object_data))
+        object_datas = [(data_type_name, object_data) for data_type_name, object_data in object_datas
+                        if data_names is None or object_data['name'] in data_names]
+        if not object_datas:
+            continue
+        i = len(uids)
+        uids.append(uid_str)
+        for data_type_name, object_data in object_datas:
+            cs_src = object_data.get('coordinate_system', cs_object) or camera_name
+            if data_type_name == 'cuboid':
+                entry = cuboids_by_cs.setdefault((cs_src, len(object_data['val'])), ([], []))
+                entry[0].append(i)
+                entry[1].append(object_data['val'])
+            else:
+                vertices, triangles = _get_mesh_triangles(object_data)
+                if triangles.shape[0] == 0:
+                    continue
+                T_src_cam, static = scene.get_transform(cs_src, camera_name, frame_num)
+                vertices = vertices @ T_src_cam[0:3, 0:3].T + T_src_cam[0:3, 3]
+                meshes.append((i, vertices, triangles))
+
+    cuboids = []
+    for (cs_src, _), (indices, values) in cuboids_by_cs.items():
+        values = np.array(values, dtype=float)
+        T_src_cam, static = scene.get_transform(cs_src, camera_name, frame_num)
+        poses_Nx4x4 = np.matmul(T_src_cam, utils.get_cuboid_poses_batch(values))
+        for k, i in enumerate(indices):
+            cuboids.append((i, poses_Nx4x4[k], values[k, -3:]))
+    return uids, cuboids, meshes
+
+
+def _get_candidates(rays_unit_Px3, center, radius):
+    # Pixels whose ray passes through the bounding sphere (all of them if the camera is inside it)
+    distance = np.linalg.norm(center)
+    if distance <= radius:
+        return np.arange(rays_unit_Px3.shape[0])
+    cos_limit = np.sqrt(1.0 - (radius / distance) ** 2)
+    with np.errstate(invalid='ignore'):
+        return np.flatnonzero(rays_unit_Px3 @ (center / distance) >= cos_limit)
+
+
+def _cast_cuboid(rays_Px3, rays_unit_Px3, pose_4x4, sizes, near):
+    # Pixels (indices of rays) hitting a cuboid from outside, and depth of the entry point (slab test)
+    candidates = _get_candidates(rays_unit_Px3, pose_4x4[0:3, 3], 0.5 * np.linalg.norm(sizes))
+    R_T = pose_4x4[0:3, 0:3].T
+    origin = -R_T @ pose_4x4[0:3, 3]  # camera center in the cuboid coordinate system
+    directions_3xC = R_T @ rays_Px3[candidates].T
+    half = 0.5 * np.asarray(sizes, dtype=float)[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (-half - origin[:, np.newaxis]) / directions_3xC
+        t2 = (half - origin[:, np.newaxis]) / directions_3xC
+        t_min = np.minimum(t1, t2)
+        t_max = np.maximum(t1, t2)
+        t_near = np.maximum(np.maximum(t_min[0], t_min[1]), t_min[2])
+        t_far = np.minimum(np.minimum(t_max[0], t_max[1]), t_max[2])
+        hit = (t_near <= t_far) & (t_near > near)
+    return candidates[hit], t_near[hit]
+
+
+def _cast_mesh(rays_Px3, rays_unit_Px3, vertices_Vx3, triangles_Tx3, near):
+    # Pixels hitting the triangles of a mesh, and depth of the nearest hit (ray-plane intersection inside each
+    # triangle, Moller-Trumbore)
+    center = 0.5 * (vertices_Vx3.min(axis=0) + vertices_Vx3.max(axis=0))
+    candidates = _get_candidates(rays_unit_Px3, center, np.max(np.linalg.norm(vertices_Vx3 - center, axis=1)))
+    directions_Cx3 = rays_Px3[candidates]
+    depth = np.full(candidates.shape[0], np.inf)
+    for v0, v1, v2 in vertices_Vx3[triangles_Tx3]:
+        e1 = v1 - v0
+        e2 = v2 - v0
+        p_Cx3 = np.cross(directions_Cx3, e2)
+        det = p_Cx3 @ e1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_det = 1.0 / det
+            u = (p_Cx3 @ -v0) * inv_det
+            q = np.cross(-v0, e1)
+            v = (directions_Cx3 @ q) * inv_det
+            t = (e2 @ q) * inv_det
+            hit = (np.abs(det) > _EPS) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > near)
+        depth[hit] = np.minimum(depth[hit], t[hit])
+    hit = np.isfinite(depth)
+    return candidates[hit], depth[hit]
+
+
+def render_depth(scene, camera_name, frame_num, data_names=None, scale=0.25, near=0.1):
+    """
+    Renders the cuboids and meshes of the objects of a frame into a depth buffer of a camera.
+    :param scene: scl.Scene
+    :param camera_name: name of the camera (stream and coordinate system)
+    :param frame_num: frame number
+    :param data_names: names of the cuboid and mesh object_data to render (all if None)
+    :param scale: resolution of the buffers with respect to the image (see scl.Camera.get_pixel_rays3d)
+    :param near: minimum depth of the rendered surfaces
+    :return: uids of the objects with geometry, depth buffer HxW (z in the camera coordinate system, inf where
+    empty), index buffer HxW (index into uids of the nearest object, -1 where empty) and number of pixels covered
+    by each object, or None if the frame or the camera do not exist
+    """
+    camera = scene.get_camera(camera_name, frame_num)
+    geometries = _get_frame_geometries(scene, camera_name, frame_num, data_names)
+    if camera is None or geometries is None:
+        return None
+    uids, cuboids, meshes = geometries
+    rays_3xHxW = camera.get_pixel_rays3d(scale)
+    height, width = rays_3xHxW.shape[1:]
+    rays_Px3 = rays_3xHxW.reshape(3, -1).T
+    rays_unit_Px3 = rays_Px3 / np.linalg.norm(rays_Px3, axis=1)[:, np.newaxis]
+
+    hits = [[] for _ in uids]
+    for i, pose_4x4, sizes in cuboids:
+        hits[i].append(_cast_cuboid(rays_Px3, rays_unit_Px3, pose_4x4, sizes, near))
+    for i, vertices_Vx3, triangles_Tx3 in meshes:
+        hits[i].append(_cast_mesh(rays_Px3, rays_unit_Px3, vertices_Vx3, triangles_Tx3, near))
+
+    depth = np.full(height * width, np.inf)
+    index = np.full(height * width, -1, dtype=int)
+    num_pixels = np.zeros(len(uids), dtype=int)
+    for i, hits_object in enumerate(hits):
+        if not hits_object:
+            continue
+        pixels = np.concatenate([pixels_g for pixels_g, _ in hits_object])
+        depths = np.concatenate([depths_g for _, depths_g in hits_object])
+        if len(hits_object) > 1:
+            # Union of the geometries of the object, nearest depth at each pixel
+            order = np.lexsort((depths, pixels))
+            pixels, first = np.unique(pixels[order], return_index=True)
+            depths = depths[order][first]
+        num_pixels[i] = pixels.shape[0]
+        closer = depths < depth[pixels]
+        depth[pixels[closer]] = depths[closer]
+        index[pixels[closer]] = i
+    return uids, depth.reshape(height, width), index.reshape(height, width), num_pixels
+
+
+def compute_frame_visibility(scene, camera_name, frame_num, data_names=None, scale=0.25, near=0.1):
+    """
+    Visibility ratios of the objects of a frame in a camera (see render_depth)
+    :return: FrameVisibility, or None if the frame or the camera do not exist
+    """
+    result = render_depth(scene, camera_name, frame_num, data_names, scale, near)
+    if result is None:
+        return None
+    uids, depth, index, num_pixels = result
+    num_visible = np.bincount(index[index >= 0], minlength=len(uids))
+    ratios = np.divide(num_visible, num_pixels, out=np.zeros(len(uids)), where=num_pixels > 0)
+    return FrameVisibility(frame_num, uids, ratios, num_pixels, num_visible)
+
+
+# Per worker process: (scene, camera_name, kwargs of compute_frame_visibility)
+_worker_args = None
+
+
+def _init_worker(scene, camera_name, kwargs):
+    global _worker_args
+    _worker_args = (scene, camera_name, kwargs)
+
+
+def _compute_frame_visibility_worker(frame_num):
+    scene, camera_name, kwargs = _worker_args
+    return compute_frame_visibility(scene, camera_name, frame_num, **kwargs)
+
+
+def _get_frame_nums(vcd):
+    for frame_start, frame_end in sorted(vcd.get_frame_intervals().get()):
+        for frame_num in range(frame_start, frame_end + 1):
+            yield frame_num
+
+
+def compute_visibility_frames(scene, camera_name, frame_nums=None, data_names=None, scale=0.25, near=0.1,
+                              processes=1, chunksize=16):
+    """
+    Generator of the FrameVisibility of several frames, in the order of frame_nums (see compute_frame_visibility).
+    With processes > 1, frames are rendered in a pool of worker processes, which receive the scene once.
+    :param frame_nums: frame numbers (all the frames of the VCD if None)
+    :param processes: number of worker processes (os.cpu_count() if None); 1 (default) renders in this process
+    :param chunksize: number of frames sent to a worker at a time
+    """
+    if frame_nums is None:
+        frame_nums = _get_frame_nums(scene.vcd)
+    kwargs = {'data_names': data_names, 'scale': scale, 'near': near}
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    if processes <= 1:
+        for frame_num in frame_nums:
+            yield compute_frame_visibility(scene, camera_name, frame_num, **kwargs)
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker,
+                                  initargs=(scene, camera_name, kwargs)) as pool:
+            for frame_visibility in pool.imap(_compute_frame_visibility_worker, frame_nums, chunksize):
+                yield frame_visibility
+
+
+def compute_visibility(scene, camera_name, frame_nums=None, data_names=None, scale=0.25, near=0.1, num_name=None,
+                       processes=1, chunksize=16):
+    """
+    Visibility ratios of the objects of several frames in a camera (see compute_visibility_frames), optionally
+    written into the VCD of the scene as num object_data at each frame.
+    :param num_name: name of the num object_data for the ratios (e.g. 'visibility_CAM_LEFT'), or None to not write
+    them
+    :return: list of FrameVisibility (frames that do not exist are skipped)
+    """
+    results = []
+    for frame_visibility in compute_visibility_frames(scene, camera_name, frame_nums, data_names, scale, near,
+                                                      processes, chunksize):
+        if frame_visibility is None:
+            continue
+        results.append(frame_visibility)
+        if num_name is not None:
+            for uid, ratio in zip(frame_visibility.uids, frame_visibility.ratios.tolist()):
+                scene.vcd.add_object_data(uid, types.num(num_name, ratio), frame_value=frame_visibility.frame_num)
+    return results